@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+存档检索窗口 - 在本地消息存档中按关键词、群组和时间范围检索，无需访问Telegram
+"""
+
+try:
+    import tkinter as tk
+    from tkinter import ttk, messagebox
+except ImportError:  # headless模式下没有图形界面
+    tk = ttk = messagebox = None
+
+from message_archive import format_result
+
+
+class ArchiveSearchWindow:
+    """消息存档检索对话框"""
+
+    def __init__(self, app):
+        self.app = app
+        self.archive = app.message_archive
+
+        self.window = tk.Toplevel(app.root)
+        self.window.title("消息检索")
+        self.window.geometry("800x500")
+        self.window.transient(app.root)
+
+        self.query_var = tk.StringVar()
+        self.chat_var = tk.StringVar()
+        self.days_var = tk.StringVar(value="7")
+        self.result_var = tk.StringVar()
+        self.results = []
+
+        self._build()
+
+    def _build(self):
+        frame = ttk.Frame(self.window, padding="10")
+        frame.pack(fill=tk.BOTH, expand=True)
+
+        form = ttk.Frame(frame)
+        form.pack(fill=tk.X)
+
+        ttk.Label(form, text="关键词:").grid(row=0, column=0, sticky=tk.W)
+        query_entry = ttk.Entry(form, textvariable=self.query_var, width=30)
+        query_entry.grid(row=0, column=1, padx=5)
+        query_entry.bind('<Return>', lambda event: self.search())
+
+        ttk.Label(form, text="群组:").grid(row=0, column=2, sticky=tk.W)
+        chat_entry = ttk.Entry(form, textvariable=self.chat_var, width=20)
+        chat_entry.grid(row=0, column=3, padx=5)
+        chat_entry.bind('<Return>', lambda event: self.search())
+
+        ttk.Label(form, text="最近天数:").grid(row=0, column=4, sticky=tk.W)
+        ttk.Entry(form, textvariable=self.days_var, width=6).grid(row=0, column=5, padx=5)
+
+        ttk.Button(form, text="检索", command=self.search).grid(row=0, column=6, padx=5)
+
+        list_frame = ttk.Frame(frame)
+        list_frame.pack(fill=tk.BOTH, expand=True, pady=10)
+
+        scrollbar = ttk.Scrollbar(list_frame)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.listbox = tk.Listbox(list_frame, yscrollcommand=scrollbar.set)
+        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.config(command=self.listbox.yview)
+        self.listbox.bind('<Double-Button-1>', lambda event: self.show_selected())
+
+        ttk.Label(frame, textvariable=self.result_var).pack(anchor=tk.W)
+
+        if not self.archive.running:
+            self.result_var.set("提示: 消息存档未开启（配置 archive_enabled），只能检索已有的存档")
+
+        query_entry.focus_set()
+
+    def search(self):
+        query = self.query_var.get().strip()
+        chat = self.chat_var.get().strip()
+        if not query and not chat:
+            messagebox.showwarning("警告", "请输入关键词或群组", parent=self.window)
+            return
+
+        days = self.days_var.get().strip()
+        try:
+            days = float(days) if days else None
+        except ValueError:
+            messagebox.showwarning("警告", "最近天数必须是数字", parent=self.window)
+            return
+
+        try:
+            self.results = self.archive.search(query, chat=chat or None, days=days, limit=200)
+        except Exception as e:
+            messagebox.showerror("错误", f"检索失败:\n{str(e)}", parent=self.window)
+            return
+
+        self.listbox.delete(0, tk.END)
+        for item in self.results:
+            self.listbox.insert(tk.END, format_result(item))
+        self.result_var.set(f"共 {len(self.results)} 条, 用时 {self.archive.last_query_ms:.1f}ms")
+
+    def show_selected(self):
+        """在日志中输出选中消息的全文"""
+        selection = self.listbox.curselection()
+        if not selection:
+            return
+        item = self.results[selection[0]]
+        self.app.log_message(f"🔎 {format_result(item)}")
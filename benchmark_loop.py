@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+事件循环基准测试 - 比较默认asyncio循环和uvloop处理消息的吞吐与延迟
+模拟真实链路：本地TCP回环接收消息帧 -> 每条消息一个处理协程（去重、过滤、关键词匹配）
+-> 放入转发队列 -> 投递协程取出
+
+用法: python benchmark_loop.py [--messages 50000] [--rounds 3]
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import struct
+import time
+
+from loop_backend import new_event_loop, uvloop_available
+from filter_plan import FilterPlan
+from dedup_store import DedupStore
+from forward_queue import ForwardQueue
+
+
+BENCH_CONFIG = {
+    'filter_links': True,
+    'filter_buttons': True,
+    'filter_forwarded': True,
+    'filter_keywords': '广告,推广,返利,代理,兼职',
+    'target_keywords': '招聘,求职,出售,收购,合作,测试',
+    'forward_to': '@bench',
+}
+
+SAMPLE_TEXTS = [
+    "今天的天气不错，大家出来聚餐吗",
+    "招聘Python开发工程师，远程办公，薪资面议",
+    "出售二手显卡一张，有意私聊",
+    "兼职推广，日结返利，有意者联系",
+    "这条消息包含链接 https://example.com 请查看",
+    "测试消息，请忽略",
+]
+
+
+class BenchMessage:
+    """模拟Telethon消息对象中过滤用到的属性"""
+
+    __slots__ = ('id', 'chat_id', 'text', 'reply_markup', 'media', 'document', 'photo', 'forward', 'received_at')
+
+    def __init__(self, message_id, chat_id, text, received_at):
+        self.id = message_id
+        self.chat_id = chat_id
+        self.text = text
+        self.reply_markup = None
+        self.media = None
+        self.document = None
+        self.photo = None
+        self.forward = None
+        self.received_at = received_at
+
+
+class BenchRoot:
+    def after(self, ms, func=None, *args):
+        return None
+
+
+class BenchApp:
+    """转发队列需要的最小应用对象"""
+
+    def __init__(self):
+        self.root = BenchRoot()
+        self.clients = {}
+
+    def log_message(self, message, level=None):
+        pass
+
+
+async def run_pipeline(message_count):
+    """运行一轮基准测试，返回 (耗时秒, 延迟列表)"""
+    plan = FilterPlan.from_config(BENCH_CONFIG)
+    dedup = DedupStore(ttl=3600, max_entries=message_count * 2)
+    latencies = []
+    done = asyncio.Event()
+    handled = 0
+
+    async def deliver(message, phone):
+        latencies.append(time.perf_counter() - message.received_at)
+        await asyncio.sleep(0)
+
+    app = BenchApp()
+    forward_queue = ForwardQueue(app, deliver, workers=4, maxsize=message_count)
+    await forward_queue.start()
+
+    async def handle(message):
+        nonlocal handled
+        try:
+            if dedup.check_and_add((message.chat_id, message.id)):
+                return
+            if not plan.should_forward(message, None):
+                return
+            if not plan.contains_target_keywords(message.text):
+                return
+            forward_queue.put(message, 'bench')
+        finally:
+            handled += 1
+            if handled == message_count:
+                done.set()
+
+    async def on_connection(reader, writer):
+        # 每条消息一个协程，与Telethon为每个更新调度处理器的方式相同
+        while True:
+            try:
+                header = await reader.readexactly(4)
+            except asyncio.IncompleteReadError:
+                break
+            payload = await reader.readexactly(struct.unpack('!I', header)[0])
+            data = json.loads(payload)
+            message = BenchMessage(data['id'], data['chat_id'], data['text'], time.perf_counter())
+            asyncio.ensure_future(handle(message))
+        writer.close()
+
+    server = await asyncio.start_server(on_connection, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+
+    started_at = time.perf_counter()
+    _, writer = await asyncio.open_connection('127.0.0.1', port)
+    for i in range(message_count):
+        payload = json.dumps({
+            'id': i,
+            'chat_id': -1000000000000 - (i % 50),
+            'text': SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)],
+        }, ensure_ascii=False).encode('utf-8')
+        writer.write(struct.pack('!I', len(payload)) + payload)
+        if i % 1000 == 0:
+            await writer.drain()
+    await writer.drain()
+
+    await done.wait()
+    await forward_queue.queue.join()
+    elapsed = time.perf_counter() - started_at
+
+    writer.close()
+    server.close()
+    await server.wait_closed()
+    await forward_queue.stop()
+    return elapsed, latencies
+
+
+def benchmark(backend, message_count, rounds):
+    """在指定后端上运行多轮，返回结果字典"""
+    results = []
+    actual = backend
+    for _ in range(rounds):
+        loop, actual = new_event_loop(backend)
+        try:
+            asyncio.set_event_loop(loop)
+            results.append(loop.run_until_complete(run_pipeline(message_count)))
+        finally:
+            loop.close()
+
+    best_elapsed, latencies = min(results, key=lambda item: item[0])
+    latencies.sort()
+    return {
+        'backend': actual,
+        'throughput': message_count / best_elapsed,
+        'p50': statistics.median(latencies) * 1000 if latencies else 0.0,
+        'p99': latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else 0.0,
+        'forwarded': len(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比较asyncio与uvloop的消息处理性能")
+    parser.add_argument('--messages', type=int, default=50000, help="每轮消息数量")
+    parser.add_argument('--rounds', type=int, default=3, help="每个后端运行轮数（取最快一轮）")
+    args = parser.parse_args()
+
+    backends = ['asyncio']
+    if uvloop_available():
+        backends.append('uvloop')
+    else:
+        print("未安装uvloop（pip install uvloop），只测试默认asyncio循环")
+
+    print(f"每轮 {args.messages} 条消息, {args.rounds} 轮取最快\n")
+    print(f"{'后端':<10}{'吞吐(条/秒)':>14}{'p50延迟(ms)':>14}{'p99延迟(ms)':>14}{'转发条数':>10}")
+    baseline = None
+    for backend in backends:
+        result = benchmark(backend, args.messages, args.rounds)
+        line = (f"{result['backend']:<10}{result['throughput']:>14.0f}{result['p50']:>14.2f}"
+                f"{result['p99']:>14.2f}{result['forwarded']:>10}")
+        if baseline is None:
+            baseline = result['throughput']
+        else:
+            line += f"   ({result['throughput'] / baseline:.2f}x)"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+群组预过滤模块 - 在注册事件处理器时就确定要监听的群组
+由Telethon在构建事件后直接丢弃无关群组的更新，不再为它们调度协程
+加入/退出群组时增量更新，无需重新注册处理器
+"""
+
+
+class ChatFilter:
+    """单个账号的监听群组集合（带标记的chat_id）"""
+
+    def __init__(self):
+        self.known = {}       # 带标记的chat_id -> (标题, 用户名, 原始ID)
+        self.allowed = set()  # 当前允许的带标记chat_id
+        self.builder = None   # 已绑定的事件构建器
+
+    def __len__(self):
+        return len(self.allowed)
+
+    def _admits(self, marked_id, plan):
+        """判断一个已知群组是否应该监听"""
+        title, username, raw_id = self.known[marked_id]
+        if not plan.is_monitored_chat(title, username, raw_id, marked_id):
+            return False
+        return not plan.is_in_whitelist(title, username, raw_id)
+
+    def load_dialogs(self, dialogs, plan):
+        """从对话列表构建监听集合"""
+        self.known.clear()
+        for dialog in dialogs:
+            if dialog.is_group or dialog.is_channel:
+                entity = dialog.entity
+                self.known[dialog.id] = (dialog.title, getattr(entity, 'username', None), entity.id)
+        self.rebuild(plan)
+
+    def rebuild(self, plan):
+        """白名单或过滤计划变化后，根据已知群组重新计算（不访问网络）"""
+        self.allowed = {marked_id for marked_id in self.known if self._admits(marked_id, plan)}
+        self._sync_builder()
+
+    def bind(self, builder):
+        """绑定已解析的事件构建器，之后的增量更新直接作用于它的群组集合"""
+        self.builder = builder
+        self._sync_builder()
+
+    def _sync_builder(self):
+        builder = self.builder
+        if builder is not None and builder.resolved and builder.chats is not None:
+            builder.chats.clear()
+            builder.chats.update(self.allowed)
+
+    def add(self, marked_id, title, username, raw_id, plan):
+        """加入群组 - 返回是否开始监听"""
+        self.known[marked_id] = (title, username, raw_id)
+        if not self._admits(marked_id, plan):
+            self.remove(marked_id, forget=False)
+            return False
+
+        self.allowed.add(marked_id)
+        if self.builder is not None and self.builder.resolved:
+            self.builder.chats.add(marked_id)
+        return True
+
+    def remove(self, marked_id, forget=True):
+        """退出群组 - 停止监听"""
+        if forget:
+            self.known.pop(marked_id, None)
+        self.allowed.discard(marked_id)
+        if self.builder is not None and self.builder.resolved:
+            self.builder.chats.discard(marked_id)
+
+    def initial_chats(self):
+        """注册事件处理器时使用的群组列表"""
+        return list(self.allowed)
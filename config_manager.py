@@ -1,56 +1,121 @@
-#!/usr/bin/env python3
-# -*- coding: utf-8 -*-
-"""
-配置管理模块 - 处理配置文件的加载和保存
-"""
-
-import json
-import os
-
-
-class ConfigManager:
-    def __init__(self, config_file="config.json"):
-        self.config_file = config_file
-
-    def load_config(self):
-        """加载配置文件"""
-        try:
-            if os.path.exists(self.config_file):
-                with open(self.config_file, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-                    return config
-            else:
-                return {}
-        except Exception as e:
-            print(f"加载配置失败: {e}")
-            return {}
-
-    def save_config(self, config):
-        """保存配置文件"""
-        try:
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(config, f, ensure_ascii=False, indent=2)
-            return True
-        except Exception as e:
-            raise Exception(f"保存配置失败: {e}")
-
-    def get_default_config(self):
-        """获取默认配置"""
-        return {
-            'api_id': '',
-            'api_hash': '',
-            'bot_token': '',
-            'use_proxy': True,
-            'proxy_host': '127.0.0.1',
-            'proxy_port': '7890',
-            'proxy_type': 'HTTP',
-            'filter_username': False,
-            'filter_links': False,
-            'filter_buttons': False,
-            'filter_media': False,
-            'filter_forwarded': False,
-            'filter_keywords': '',
-            'target_keywords': '',
-            'forward_to': '',
-            'whitelist_groups': ''
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+配置管理模块 - 处理配置文件的加载和保存
+"""
+
+import json
+import os
+
+
+class ConfigManager:
+    def __init__(self, config_file="config.json"):
+        self.config_file = config_file
+
+    def load_config(self):
+        """加载配置文件"""
+        try:
+            if os.path.exists(self.config_file):
+                with open(self.config_file, 'r', encoding='utf-8') as f:
+                    config = json.load(f)
+                    return config
+            else:
+                return {}
+        except Exception as e:
+            print(f"加载配置失败: {e}")
+            return {}
+
+    def save_config(self, config):
+        """保存配置文件"""
+        try:
+            with open(self.config_file, 'w', encoding='utf-8') as f:
+                json.dump(config, f, ensure_ascii=False, indent=2)
+            return True
+        except Exception as e:
+            raise Exception(f"保存配置失败: {e}")
+
+    def get_default_config(self):
+        """获取默认配置"""
+        return {
+            'api_id': '',
+            'api_hash': '',
+            'bot_token': '',
+            'use_proxy': True,
+            'proxy_host': '127.0.0.1',
+            'proxy_port': '7890',
+            'proxy_type': 'HTTP',
+            'filter_username': False,
+            'filter_links': False,
+            'filter_buttons': False,
+            'filter_media': False,
+            'filter_forwarded': False,
+            'filter_keywords': '',
+            'target_keywords': '',
+            'forward_to': '',
+            'whitelist_groups': '',
+            'dedup_ttl': 3600,
+            'dedup_max_entries': 100000,
+            'dedup_content_hash': False,
+            'dedup_content_ttl': 600,
+            'forward_workers': 4,
+            'forward_queue_size': 1000,
+            'forward_overflow': 'drop',
+            'forward_spill_max_attempts': 3,
+            'send_max_attempts': 5,
+            'send_defer_after': 5.0,
+            'digest_mode': False,  # 分片模式下只合并Bot发送的文字消息，相册不合并成媒体组
+            'digest_window': 2.0,
+            'digest_max_messages': 20,
+            'entity_cache_ttl': 3600,
+            'entity_cache_size': 5000,
+            'monitor_chats': '',
+            'log_level': 'INFO',
+            'log_max_lines': 5000,
+            'log_flush_interval': 100,
+            'event_log_enabled': True,
+            'event_log_dir': 'logs',
+            'event_log_max_mb': 10,
+            'event_log_rotate_hours': 24,
+            'event_log_backups': 7,
+            'headless_accounts': [],
+            'headless_stats_interval': 300,
+            'session_load_concurrency': 10,
+            'session_load_timeout': 30,
+            'shard_count': 0,
+            'shard_heartbeat_interval': 10,
+            'shard_heartbeat_timeout': 60,
+            'shard_restart_max_delay': 300,
+            'event_loop': 'asyncio',
+            'reconnect_base_delay': 1.0,
+            'reconnect_max_delay': 300,
+            'health_snapshot_interval': 30,
+            'gap_recovery_batch': 100,
+            'gap_recovery_max_messages': 500,
+            'gap_recovery_rate': 1.0,
+            'gap_recovery_burst': 5,
+            'forward_ledger_enabled': True,
+            'forward_ledger_path': 'data/forwarded.db',
+            'forward_ledger_days': 7,
+            'archive_enabled': False,
+            'archive_path': 'data/archive.db',
+            'archive_days': 30,
+            'proxy_scan_ports': '7890-7893,8080,8081,1080,1081,3128,8888,9090',
+            'proxy_scan_target': 'api.telegram.org:443',
+            'proxy_probe_timeout': 3,
+            'proxy_scan_deadline': 10,
+            'proxy_scan_concurrency': 64,
+            'proxy_pool': [],
+            'proxy_probe_interval': 60,
+            'reconnect_connect_timeout': 30,
+            'diagnosis_cache_ttl': 300,
+            'diagnosis_timeout': 10,
+            'dc_probe_enabled': True,
+            'dc_probe_samples': 3,
+            'dc_probe_window': 20,
+            'dc_probe_interval': 300,
+            'dc_allow_direct': False,
+            'http_pool_connections': 10,
+            'http_pool_maxsize': 10,
+            'bot_pool_size': 16,
+            'bot_pool_timeout': 10
         }
\ No newline at end of file
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据中心延迟模块 - 测量到Telegram各数据中心(DC)的TCP握手往返时间和抖动
+分别测量直连和经过每个代理的路径，保留最近若干次样本组成滚动延迟表，
+账号连接时按其所在DC选择延迟最低的路径（代理）
+"""
+
+import asyncio
+import statistics
+import time
+from collections import deque
+
+from proxy_probe import HANDSHAKES, tcp_connect
+
+
+# Telegram生产环境各数据中心的IPv4地址
+DC_ADDRESSES = {
+    1: ('149.154.175.53', 443),
+    2: ('149.154.167.51', 443),
+    3: ('149.154.175.100', 443),
+    4: ('149.154.167.91', 443),
+    5: ('91.108.56.130', 443),
+}
+
+DIRECT = 'direct'
+
+
+def path_key(proxy_config):
+    """路径名称：直连为"direct"，代理为"socks5://host:port" """
+    if not proxy_config:
+        return DIRECT
+    return f"{proxy_config['proxy_type']}://{proxy_config['addr']}:{proxy_config['port']}"
+
+
+class PathStats:
+    """一条路径到一个DC的滚动样本"""
+
+    __slots__ = ('samples', 'updated_at')
+
+    def __init__(self, window):
+        self.samples = deque(maxlen=window)  # 往返时间（秒），失败为None
+        self.updated_at = 0.0
+
+    def add(self, rtt):
+        self.samples.append(rtt)
+        self.updated_at = time.monotonic()
+
+    def successes(self):
+        return [rtt for rtt in self.samples if rtt is not None]
+
+    def loss(self):
+        return 1 - len(self.successes()) / len(self.samples) if self.samples else 1.0
+
+    def median(self):
+        values = self.successes()
+        return statistics.median(values) if values else None
+
+    def jitter(self):
+        values = self.successes()
+        return statistics.pstdev(values) if len(values) > 1 else 0.0
+
+    def score(self):
+        """越小越好 - 中位数 + 抖动，丢包按每10%加100ms惩罚"""
+        median = self.median()
+        if median is None:
+            return None
+        return median + self.jitter() + self.loss()
+
+
+class DcLatency:
+    """各路径到各DC的延迟表 - 探测在全局事件循环中运行"""
+
+    def __init__(self, app, samples=3, window=20, interval=300, timeout=3.0, concurrency=16):
+        self.app = app
+        self.samples = max(1, int(samples))
+        self.window = max(self.samples, int(window))
+        self.interval = max(30.0, float(interval))
+        self.timeout = float(timeout)
+        self.concurrency = max(1, int(concurrency))
+
+        self.table = {}  # (路径, dc_id) -> PathStats
+        self._prober = None
+        self.rounds = 0
+
+    @classmethod
+    def from_config(cls, app, config):
+        return cls(
+            app,
+            samples=config.get('dc_probe_samples', 3),
+            window=config.get('dc_probe_window', 20),
+            interval=config.get('dc_probe_interval', 300),
+            timeout=config.get('proxy_probe_timeout', 3),
+        )
+
+    def stats(self, path, dc_id):
+        return self.table.get((path, dc_id))
+
+    async def _sample(self, proxy_config, dc_id):
+        """一次TCP握手（经代理时为代理到DC的CONNECT握手），返回往返时间或None"""
+        host, port = DC_ADDRESSES[dc_id]
+        try:
+            if not proxy_config:
+                return await tcp_connect(host, port, self.timeout)
+            handshake = HANDSHAKES[proxy_config['proxy_type'].upper()]
+            return await handshake(proxy_config['addr'], proxy_config['port'], (host, port), self.timeout)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+            return None
+
+    async def probe(self, paths, samples=None):
+        """测量所有路径到所有DC的延迟 - paths为[代理配置或None(直连)]
+
+        同一路径同一DC的样本依次测量（用于计算抖动），不同组合并发
+        """
+        samples = samples or self.samples
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def measure(proxy_config, dc_id):
+            key = (path_key(proxy_config), dc_id)
+            stats = self.table.get(key)
+            if stats is None:
+                stats = self.table[key] = PathStats(self.window)
+            async with semaphore:
+                for _ in range(samples):
+                    stats.add(await self._sample(proxy_config, dc_id))
+
+        unique = {path_key(proxy_config): proxy_config for proxy_config in paths}
+        await asyncio.gather(*(measure(proxy_config, dc_id)
+                               for proxy_config in unique.values() for dc_id in DC_ADDRESSES))
+        self.rounds += 1
+
+    def best_path(self, dc_id, candidates):
+        """在候选路径名称中选出到该DC得分最低的一个，没有测量数据时返回None"""
+        best = None
+        best_score = None
+        for path in candidates:
+            stats = self.table.get((path, dc_id))
+            score = stats.score() if stats is not None else None
+            if score is not None and (best_score is None or score < best_score):
+                best, best_score = path, score
+        return best
+
+    def ensure_probing(self, get_paths):
+        """在全局事件循环中启动定时探测（只启动一次）- get_paths返回当前要测量的路径"""
+        if self._prober is None and self.app.global_loop.is_running():
+            self._prober = asyncio.run_coroutine_threadsafe(self._probe_loop(get_paths), self.app.global_loop)
+
+    def stop(self):
+        if self._prober is not None:
+            self._prober.cancel()
+            self._prober = None
+
+    async def _probe_loop(self, get_paths):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.probe(get_paths())
+            except Exception as e:
+                self.app.log_message(f"❗ DC延迟探测失败: {str(e)}")
+
+    def format_stats(self):
+        """格式化延迟表用于日志，返回多行文本列表（每个DC一行）"""
+        lines = []
+        for dc_id in DC_ADDRESSES:
+            parts = []
+            for (path, dc), stats in sorted(self.table.items()):
+                if dc != dc_id:
+                    continue
+                median = stats.median()
+                if median is None:
+                    parts.append(f"{path} 不可达")
+                else:
+                    part = f"{path} {median * 1000:.0f}±{stats.jitter() * 1000:.0f}ms"
+                    loss = stats.loss()
+                    if loss:
+                        part += f" (丢失 {loss:.0%})"
+                    parts.append(part)
+            if parts:
+                lines.append(f"DC{dc_id}: " + ", ".join(parts))
+        return lines
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+去重存储模块 - 有界、带过期时间的已处理消息记录
+键为整数元组，超过TTL自动过期，超过容量按LRU淘汰
+"""
+
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def content_fingerprint(message):
+    """计算消息内容指纹（文本 + 媒体ID），用于识别不同群组里的相同转载
+
+    没有可识别内容时返回None
+    """
+    text = _WHITESPACE_RE.sub(' ', (message.text or message.message or '')).strip().lower()
+
+    media_id = 0
+    media = message.photo or message.document
+    if media is not None:
+        media_id = getattr(media, 'id', 0) or 0
+
+    if not text and not media_id:
+        return None
+
+    digest = hashlib.blake2b(text.encode('utf-8'), digest_size=8)
+    digest.update(media_id.to_bytes(8, 'little', signed=True))
+    return (int.from_bytes(digest.digest(), 'little'),)
+
+
+class DedupStore:
+    """有界去重表 - TTL过期 + LRU淘汰 + 固定容量上限"""
+
+    def __init__(self, ttl=3600, max_entries=100000):
+        self.ttl = float(ttl)
+        self.max_entries = max(1, int(max_entries))
+
+        self._entries = OrderedDict()  # key -> 过期时间（monotonic）
+        self._lock = threading.Lock()
+
+        # 统计
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._lookup(key, time.monotonic())
+
+    def check_and_add(self, key):
+        """检查键是否已存在，不存在则记录 - 返回True表示重复"""
+        now = time.monotonic()
+        with self._lock:
+            if self._lookup(key, now):
+                self.hits += 1
+                return True
+
+            self.misses += 1
+            self._entries[key] = now + self.ttl
+            self._purge(now)
+            return False
+
+    def add(self, key):
+        """直接记录一个键（不计入命中统计）"""
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = now + self.ttl
+            self._entries.move_to_end(key)
+            self._purge(now)
+
+    def discard(self, key):
+        """移除一个键"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """清空记录和统计"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.expired = self.evicted = 0
+
+    def _lookup(self, key, now):
+        """查找键 - 命中时移到队尾，已过期的直接删除"""
+        expires_at = self._entries.get(key)
+        if expires_at is None:
+            return False
+        if expires_at <= now:
+            del self._entries[key]
+            self.expired += 1
+            return False
+        self._entries.move_to_end(key)
+        return True
+
+    def _purge(self, now):
+        """清理队首的过期记录，并把容量限制在上限以内"""
+        entries = self._entries
+        while entries:
+            key, expires_at = next(iter(entries.items()))
+            if expires_at > now:
+                break
+            del entries[key]
+            self.expired += 1
+
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+            self.evicted += 1
+
+    def get_stats(self):
+        """获取统计信息"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits / total) if total else 0.0,
+                'expired': self.expired,
+                'evicted': self.evicted,
+            }
+
+    def format_stats(self):
+        """格式化统计信息用于日志"""
+        stats = self.get_stats()
+        return (f"{stats['size']}/{stats['max_entries']} 条, 命中率 {stats['hit_rate']:.1%} "
+                f"({stats['hits']}/{stats['hits'] + stats['misses']}), "
+                f"过期 {stats['expired']}, 淘汰 {stats['evicted']}")
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合并发送模块 - Bot转发的批量/摘要模式
+在时间窗口内匹配到的多条消息合并成一条发送（不超过4096字符），
+同一相册（grouped_id相同）的多条媒体消息合并成一次send_media_group
+"""
+
+import asyncio
+
+import telegram
+
+from send_scheduler import is_retryable
+
+
+# Telegram单条消息/媒体说明的长度限制
+MAX_MESSAGE_LENGTH = 4096
+MAX_CAPTION_LENGTH = 1024
+MAX_MEDIA_GROUP_SIZE = 10
+# Bot API上传文件的大小限制
+MAX_UPLOAD_SIZE = 50 * 1024 * 1024
+
+DIGEST_SEPARATOR = "\n\n━━━━━━━━━━\n\n"
+
+
+def pack_digest_indexed(entries, limit=MAX_MESSAGE_LENGTH, separator=DIGEST_SEPARATOR):
+    """把多条文本打包成不超过长度限制的消息，返回 [(消息文本, 包含的条目下标集合)]
+
+    单条超长的条目会被切开，出现在多条消息中
+    """
+    chunks = []
+    current = ''
+    indexes = set()
+    for index, entry in enumerate(entries):
+        # 单条超长的内容先切开
+        pieces = [entry[i:i + limit] for i in range(0, len(entry), limit)] or ['']
+        for piece in pieces:
+            if not current:
+                current = piece
+            elif len(current) + len(separator) + len(piece) <= limit:
+                current = current + separator + piece
+            else:
+                chunks.append((current, indexes))
+                current = piece
+                indexes = set()
+            indexes.add(index)
+    if current:
+        chunks.append((current, indexes))
+    return chunks
+
+
+def pack_digest(entries, limit=MAX_MESSAGE_LENGTH, separator=DIGEST_SEPARATOR):
+    """把多条文本打包成若干条不超过长度限制的消息"""
+    return [chunk for chunk, _ in pack_digest_indexed(entries, limit, separator)]
+
+
+class DigestBatcher:
+    """按目标群缓冲Bot消息，窗口到期或条数达到上限时合并发送"""
+
+    # 相册的各条消息几乎同时到达，等待这么久后认为相册已收齐
+    ALBUM_SETTLE_DELAY = 1.0
+    # 合并消息因临时错误发送失败时，其中的条目放回缓冲重新发送的最多次数
+    MAX_BATCH_RETRIES = 2
+
+    def __init__(self, app, scheduler, window=2.0, max_messages=20):
+        self.app = app
+        self.scheduler = scheduler
+        self.window = max(0.1, float(window))
+        self.max_messages = max(1, int(max_messages))
+
+        self._pending = {}       # forward_to -> [(文本, ref, 已失败次数)]
+        self._timers = {}        # forward_to -> 定时刷新任务
+        self._albums = {}        # grouped_id -> {'forward_to', 'header', 'items': [(message, phone, ref)]}
+        self._album_timers = {}  # grouped_id -> 定时刷新任务
+
+        # 统计
+        self.merged_messages = 0
+        self.sent_batches = 0
+        self.sent_albums = 0
+        self.requeued = 0
+        self.given_up = 0
+
+    def add_text(self, forward_to, text, ref=None, attempts=0):
+        """加入一条待合并的文本消息 - ref为转发记录定位信息，发送成功后才写入转发记录"""
+        entries = self._pending.setdefault(forward_to, [])
+        entries.append((text, ref, attempts))
+
+        if len(entries) >= self.max_messages:
+            # 条数达到上限，立即取出这一批发送，后续消息进入新的一批
+            self._cancel(self._timers, forward_to)
+            asyncio.ensure_future(self._send_batch(forward_to, self._pending.pop(forward_to)))
+        elif forward_to not in self._timers:
+            self._timers[forward_to] = asyncio.ensure_future(self._flush_later(forward_to))
+
+    def add_album_item(self, forward_to, header, message, phone, ref=None):
+        """加入一条相册中的媒体消息 - ref同add_text"""
+        album = self._albums.get(message.grouped_id)
+        if album is None:
+            album = {'forward_to': forward_to, 'header': header, 'items': []}
+            self._albums[message.grouped_id] = album
+        album['items'].append((message, phone, ref))
+
+        # 每来一条都重新计时，等相册收齐再发
+        self._cancel(self._album_timers, message.grouped_id)
+        self._album_timers[message.grouped_id] = asyncio.ensure_future(self._flush_album_later(message.grouped_id))
+
+    @staticmethod
+    def _cancel(timers, key):
+        task = timers.pop(key, None)
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
+
+    async def _flush_later(self, forward_to):
+        await asyncio.sleep(self.window)
+        self._timers.pop(forward_to, None)
+        await self.flush(forward_to)
+
+    async def _flush_album_later(self, grouped_id):
+        await asyncio.sleep(self.ALBUM_SETTLE_DELAY)
+        self._album_timers.pop(grouped_id, None)
+        await self.flush_album(grouped_id)
+
+    async def flush(self, forward_to):
+        """合并发送某个目标群的缓冲消息"""
+        entries = self._pending.pop(forward_to, None)
+        if entries:
+            await self._send_batch(forward_to, entries)
+
+    async def _send_batch(self, forward_to, entries):
+        """把一批文本打包后发送 - 条目所在的消息全部发出后才写入它的转发记录
+
+        因临时错误发送失败的条目放回缓冲，随下一批重新发送
+        """
+        failed = {}  # 条目下标 -> 是否为临时错误
+        for chunk, indexes in pack_digest_indexed([text for text, _, _ in entries]):
+            try:
+                await self.scheduler.send(
+                    'bot', 'bot', forward_to,
+                    lambda text=chunk: self.app.bot.send_message(chat_id=forward_to, text=text)
+                )
+                self.sent_batches += 1
+            except Exception as e:
+                for index in indexes:
+                    failed[index] = failed.get(index, True) and is_retryable(e)
+                error_msg = str(e)
+                self.app.root.after(0, lambda msg=error_msg: self.app.log_message(f"❌ 合并发送失败: {msg}"))
+
+        sent = [entry for index, entry in enumerate(entries) if index not in failed]
+        self._mark_sent([ref for _, ref, _ in sent], 'digest')
+        self.merged_messages += len(sent)
+        if sent:
+            self.app.root.after(0, lambda n=len(sent): self.app.log_message(f"📦 已合并发送 {n} 条消息"))
+
+        given_up = 0
+        for index in sorted(failed):
+            text, ref, attempts = entries[index]
+            if failed[index] and attempts < self.MAX_BATCH_RETRIES:
+                self.requeued += 1
+                self.add_text(forward_to, text, ref, attempts + 1)
+            else:
+                given_up += 1
+        if given_up:
+            self.given_up += given_up
+            self.app.root.after(0, lambda n=given_up: self.app.log_message(f"⚠️ 合并发送放弃 {n} 条消息"))
+
+    async def flush_album(self, grouped_id):
+        """把一个相册作为send_media_group发送 - 无法经Bot发送的媒体改由账号逐条直接转发"""
+        album = self._albums.pop(grouped_id, None)
+        if not album:
+            return
+
+        items = sorted(album['items'], key=lambda item: item[0].id)
+        forward_to = album['forward_to']
+
+        caption_text = next((m.text for m, _, _ in items if m.text), '')
+        caption = f"{album['header']}\n\n{caption_text}" if caption_text else album['header']
+        as_documents = any(m.document and not (m.photo or m.video) for m, _, _ in items)
+
+        media = []   # [(InputMedia, 条目)]
+        direct = []  # 无法经Bot发送的条目（超过上传限制、下载或发送失败），由账号逐条直接转发
+        for item in items:
+            message, phone, ref = item
+            client = self.app.clients.get(phone)
+            if client is None:
+                continue
+            # 先检查大小，避免把超过Bot上传限制的大文件整个读进内存
+            size = message.file.size if message.file is not None else None
+            if size and size > MAX_UPLOAD_SIZE:
+                direct.append(item)
+                continue
+            try:
+                data = await client.download_media(message, file=bytes)
+                if data is None:
+                    raise ValueError("媒体下载失败")
+                item_caption = caption[:MAX_CAPTION_LENGTH] if not media else None
+                if as_documents:
+                    media.append((telegram.InputMediaDocument(data, caption=item_caption), item))
+                elif message.video:
+                    media.append((telegram.InputMediaVideo(data, caption=item_caption), item))
+                else:
+                    media.append((telegram.InputMediaPhoto(data, caption=item_caption), item))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._log_album_error(e)
+                direct.append(item)
+
+        sent = 0
+        for start in range(0, len(media), MAX_MEDIA_GROUP_SIZE):
+            group = media[start:start + MAX_MEDIA_GROUP_SIZE]
+            try:
+                await self.scheduler.send(
+                    'bot', 'bot', forward_to,
+                    lambda group=group: self.app.bot.send_media_group(
+                        chat_id=forward_to, media=[input_media for input_media, _ in group])
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._log_album_error(e)
+                direct.extend(item for _, item in group)
+                continue
+            sent += len(group)
+            self._mark_sent([ref for _, (_, _, ref) in group], 'album')
+
+        forwarded = 0
+        for message, phone, ref in direct:
+            client = self.app.clients[phone]
+            try:
+                await self.scheduler.send(
+                    'user', phone, forward_to,
+                    lambda client=client, message=message: client.forward_messages(forward_to, message)
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._log_album_error(e)
+                continue
+            forwarded += 1
+            self._mark_sent([ref], 'album')
+
+        if sent or forwarded:
+            self.sent_albums += 1
+        if sent:
+            self.app.root.after(0, lambda n=sent: self.app.log_message(f"🖼️ 相册已合并发送 ({n} 个媒体)"))
+        if forwarded:
+            self.app.root.after(0, lambda n=forwarded: self.app.log_message(
+                f"🖼️ 相册中 {n} 个媒体无法经Bot发送，已由账号逐条直接转发"))
+
+    def _log_album_error(self, error):
+        error_msg = str(error) or type(error).__name__
+        self.app.root.after(0, lambda: self.app.log_message(f"❌ 相册发送失败: {error_msg}"))
+
+    def _mark_sent(self, refs, route):
+        for ref in refs:
+            if ref is not None:
+                self.app.mark_forwarded(ref, route)
+
+    async def flush_all(self):
+        """立即发送所有缓冲内容（停止监控时调用）"""
+        for timers in (self._timers, self._album_timers):
+            for task in timers.values():
+                task.cancel()
+            timers.clear()
+
+        for forward_to in list(self._pending):
+            await self.flush(forward_to)
+        for grouped_id in list(self._albums):
+            await self.flush_album(grouped_id)
+
+    def format_stats(self):
+        """格式化统计信息用于日志"""
+        pending = sum(len(entries) for entries in self._pending.values())
+        return (f"合并 {self.merged_messages} 条 -> {self.sent_batches} 次发送, 相册 {self.sent_albums} 个, "
+                f"重新发送 {self.requeued} 条, 放弃 {self.given_up} 条, "
+                f"待发送 {pending} 条 / {len(self._albums)} 个相册")
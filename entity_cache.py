@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+实体缓存模块 - 按peer ID缓存群组/用户实体，避免重复的get_chat/get_sender网络请求
+每个账号一个缓存，带TTL和容量上限，启动时从对话列表预热
+"""
+
+import time
+from collections import OrderedDict
+
+
+class EntityCache:
+    """单个账号的实体缓存 - 命中时不访问网络"""
+
+    def __init__(self, ttl=3600, max_entries=5000):
+        self.ttl = float(ttl)
+        self.max_entries = max(1, int(max_entries))
+        self._entries = OrderedDict()  # peer_id -> (实体, 过期时间)
+
+        # 统计
+        self.hits = 0
+        self.misses = 0
+        self.fetches = 0  # 未命中且消息上也没有实体，只能走网络
+        self.warmed = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, peer_id):
+        """查询缓存，过期或不存在返回None"""
+        item = self._entries.get(peer_id)
+        if item is None:
+            return None
+        entity, expires_at = item
+        if expires_at <= time.monotonic():
+            del self._entries[peer_id]
+            return None
+        self._entries.move_to_end(peer_id)
+        return entity
+
+    def put(self, peer_id, entity):
+        """写入缓存"""
+        if peer_id is None or entity is None:
+            return
+        self._entries[peer_id] = (entity, time.monotonic() + self.ttl)
+        self._entries.move_to_end(peer_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, peer_id):
+        """移除某个实体（例如群组改名后）"""
+        self._entries.pop(peer_id, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    async def get_chat(self, message):
+        """获取消息所在的群组/频道实体"""
+        peer_id = message.chat_id
+        entity = self.get(peer_id)
+        if entity is not None:
+            self.hits += 1
+            return entity
+
+        self.misses += 1
+        # 更新中通常已经带了实体，没有时才需要网络请求
+        entity = message.chat
+        if entity is None:
+            self.fetches += 1
+            entity = await message.get_chat()
+        self.put(peer_id, entity)
+        return entity
+
+    async def get_sender(self, message):
+        """获取消息发送者实体"""
+        peer_id = message.sender_id
+        if peer_id is None:
+            return None
+
+        entity = self.get(peer_id)
+        if entity is not None:
+            self.hits += 1
+            return entity
+
+        self.misses += 1
+        entity = message.sender
+        # min实体缺少用户名等信息，需要补全
+        if entity is None or getattr(entity, 'min', False):
+            self.fetches += 1
+            entity = await message.get_sender()
+        self.put(peer_id, entity)
+        return entity
+
+    async def warm(self, client, limit=None):
+        """从对话列表预热缓存，返回预热的实体数量"""
+        dialogs = [dialog async for dialog in client.iter_dialogs(limit=limit)]
+        return self.warm_dialogs(dialogs)
+
+    def warm_dialogs(self, dialogs):
+        """用已获取的对话列表预热缓存"""
+        count = 0
+        for dialog in dialogs:
+            if dialog.is_group or dialog.is_channel:
+                self.put(dialog.id, dialog.entity)
+                count += 1
+        self.warmed += count
+        return count
+
+    def get_stats(self):
+        """获取统计信息"""
+        total = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'fetches': self.fetches,
+            'warmed': self.warmed,
+            'hit_rate': (self.hits / total) if total else 0.0,
+        }
+
+    def format_stats(self):
+        """格式化统计信息用于日志"""
+        stats = self.get_stats()
+        return (f"{stats['size']}/{stats['max_entries']} 个实体, 命中率 {stats['hit_rate']:.1%} "
+                f"(命中 {stats['hits']}, 未命中 {stats['misses']}, 网络请求 {stats['fetches']}), "
+                f"预热 {stats['warmed']}")
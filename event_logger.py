@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+事件日志模块 - 把消息处理过程写成JSON Lines文件，便于重启后分析吞吐和延迟
+生产者只把事件放进队列（不阻塞事件循环），由后台线程批量写入，
+文件按大小和时间轮转，只保留最近若干个
+"""
+
+import glob
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+
+class EventLogger:
+    """结构化事件日志 - 后台线程写入 + 按大小/时间轮转"""
+
+    def __init__(self, directory='logs', filename='events.jsonl', max_bytes=10 * 1024 * 1024,
+                 rotate_interval=86400, backup_count=7, flush_interval=1.0, max_pending=100000):
+        self.directory = directory
+        self.filename = filename
+        self.path = os.path.join(directory, filename)
+        self.max_bytes = max(1024, int(max_bytes))
+        self.rotate_interval = max(60, float(rotate_interval))
+        self.backup_count = max(1, int(backup_count))
+        self.flush_interval = max(0.1, float(flush_interval))
+        self.max_pending = max(1000, int(max_pending))
+
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self.running = False
+
+        self._file = None
+        self._size = 0
+        self._rollover_at = 0.0
+
+        # 统计
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+        self.errors = 0
+
+    @classmethod
+    def from_config(cls, config):
+        """从配置创建事件日志"""
+        return cls(
+            directory=config.get('event_log_dir', 'logs'),
+            max_bytes=config.get('event_log_max_mb', 10) * 1024 * 1024,
+            rotate_interval=config.get('event_log_rotate_hours', 24) * 3600,
+            backup_count=config.get('event_log_backups', 7),
+        )
+
+    def start(self):
+        """启动后台写入线程"""
+        if self.running:
+            return
+        self.running = True
+        self._thread = threading.Thread(target=self._run, name='event-logger', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """停止写入线程，写完队列中剩余的事件"""
+        if not self.running:
+            return
+        self.running = False
+        self._queue.put(None)
+        self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def record(self, event, **fields):
+        """记录一个事件 - 只入队，不做任何I/O；积压过多时丢弃"""
+        if not self.running:
+            return
+        if self._queue.qsize() >= self.max_pending:
+            self.dropped += 1
+            return
+        self._queue.put((time.time(), event, fields))
+
+    def _run(self):
+        """后台线程 - 批量取出事件并写入文件"""
+        last_flush = time.monotonic()
+        stopping = False
+
+        while not stopping:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = False
+
+            batch = []
+            while item is not False:
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    item = False
+
+            try:
+                if batch:
+                    self._write(batch)
+                now = time.monotonic()
+                if self._file is not None and (stopping or now - last_flush >= self.flush_interval):
+                    self._file.flush()
+                    last_flush = now
+            except Exception as e:
+                self.errors += 1
+                print(f"写入事件日志失败: {e}")
+                self._close()
+
+        self._close()
+
+    def _write(self, batch):
+        if self._file is None:
+            self._open()
+
+        for created, event, fields in batch:
+            record = {'ts': round(created, 3), 'event': event}
+            record.update(fields)
+            line = json.dumps(record, ensure_ascii=False, default=str) + '\n'
+
+            # 写入的是带缓冲的文件对象，逐行写不会产生逐行系统调用
+            self._file.write(line)
+            self._size += len(line.encode('utf-8'))
+            self.written += 1
+
+            if self._size >= self.max_bytes:
+                self._rotate()
+
+        if time.time() >= self._rollover_at:
+            self._rotate()
+
+    def _open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._file = open(self.path, 'a', encoding='utf-8', buffering=64 * 1024)
+        self._size = os.path.getsize(self.path)
+        self._rollover_at = time.time() + self.rotate_interval
+
+    def _close(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+    def _rotate(self):
+        """把当前文件改名为带时间戳的备份，删除超出数量的旧文件"""
+        self._close()
+
+        stem, ext = os.path.splitext(self.filename)
+        suffix = datetime.now().strftime('%Y%m%d-%H%M%S')
+        backup = os.path.join(self.directory, f"{stem}-{suffix}{ext}")
+        if os.path.exists(backup):
+            backup = os.path.join(self.directory, f"{stem}-{suffix}-{self.rotations}{ext}")
+        os.replace(self.path, backup)
+        self.rotations += 1
+
+        backups = sorted(glob.glob(os.path.join(self.directory, f"{stem}-*{ext}")), key=os.path.getmtime)
+        for old in backups[:-self.backup_count]:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+        self._open()
+
+    def format_stats(self):
+        """格式化统计信息用于日志"""
+        state = '运行中' if self.running else '已停止'
+        return (f"{state}, 已写入 {self.written} 条, 待写入 {self._queue.qsize()} 条, "
+                f"丢弃 {self.dropped} 条, 轮转 {self.rotations} 次, 错误 {self.errors} 次")
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+过滤计划模块 - 把界面上的过滤配置编译成只读快照
+消息处理热路径只读取快照上的普通属性，不再访问Tk变量
+"""
+
+from keyword_matcher import KeywordMatcher, parse_keywords
+from whitelist_index import WhitelistIndex
+
+
+# 链接过滤使用的特征串
+LINK_MARKERS = ('http', 't.me', 'www.')
+
+
+class FilterPlan:
+    """编译后的过滤配置快照 - 创建后不可修改，整体替换即可生效"""
+
+    __slots__ = (
+        'filter_username', 'filter_links', 'filter_buttons', 'filter_media', 'filter_forwarded',
+        'filter_matcher', 'target_matcher', 'whitelist', 'forward_to', 'dedup_content',
+        'monitor_chats',
+    )
+
+    def __init__(self, filter_username=False, filter_links=False, filter_buttons=False,
+                 filter_media=False, filter_forwarded=False, filter_keywords='',
+                 target_keywords='', whitelist_groups='', forward_to='', dedup_content=False,
+                 monitor_chats=''):
+        set_attr = object.__setattr__
+        set_attr(self, 'filter_username', bool(filter_username))
+        set_attr(self, 'filter_links', bool(filter_links))
+        set_attr(self, 'filter_buttons', bool(filter_buttons))
+        set_attr(self, 'filter_media', bool(filter_media))
+        set_attr(self, 'filter_forwarded', bool(filter_forwarded))
+        set_attr(self, 'filter_matcher', KeywordMatcher.from_text(filter_keywords))
+        set_attr(self, 'target_matcher', KeywordMatcher.from_text(target_keywords))
+        set_attr(self, 'whitelist', WhitelistIndex(parse_keywords(whitelist_groups)))
+        set_attr(self, 'forward_to', (forward_to or '').strip())
+        set_attr(self, 'dedup_content', bool(dedup_content))
+        # 显式监听列表（可选），格式与白名单相同：ID、@用户名或标题片段
+        set_attr(self, 'monitor_chats', WhitelistIndex(parse_keywords(monitor_chats)))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("FilterPlan是只读快照，请重新编译后整体替换")
+
+    @classmethod
+    def from_config(cls, config):
+        """从配置字典编译过滤计划"""
+        return cls(
+            filter_username=config.get('filter_username', False),
+            filter_links=config.get('filter_links', False),
+            filter_buttons=config.get('filter_buttons', False),
+            filter_media=config.get('filter_media', False),
+            filter_forwarded=config.get('filter_forwarded', False),
+            filter_keywords=config.get('filter_keywords', ''),
+            target_keywords=config.get('target_keywords', ''),
+            whitelist_groups=config.get('whitelist_groups', ''),
+            forward_to=config.get('forward_to', ''),
+            dedup_content=config.get('dedup_content_hash', False),
+            monitor_chats=config.get('monitor_chats', ''),
+        )
+
+    def is_in_whitelist(self, chat_title, chat_username, chat_id):
+        """检查是否在白名单中（需要跳过的群组）"""
+        return self.whitelist.contains(chat_title, chat_username, chat_id)
+
+    def is_monitored_chat(self, chat_title, chat_username, chat_id, marked_id=None):
+        """检查群组是否在显式监听列表中 - 未设置监听列表时监听所有群组"""
+        if not self.monitor_chats:
+            return True
+        if marked_id is not None and marked_id in self.monitor_chats.ids:
+            return True
+        return self.monitor_chats.contains(chat_title, chat_username, chat_id)
+
+    def should_forward(self, message, sender):
+        """检查消息是否应该转发 - sender为已解析的发送者实体"""
+        # 检查发送者用户名过滤
+        if self.filter_username:
+            if sender and hasattr(sender, 'username') and sender.username:
+                return False
+
+        # 检查链接过滤
+        if self.filter_links:
+            text = message.text or ''
+            if any(marker in text for marker in LINK_MARKERS):
+                return False
+
+        # 检查按钮过滤
+        if self.filter_buttons:
+            if message.reply_markup:
+                return False
+
+        # 检查媒体过滤
+        if self.filter_media:
+            if message.media or message.document or message.photo:
+                return False
+
+        # 检查转发消息过滤
+        if self.filter_forwarded:
+            if message.forward:
+                return False
+
+        # 检查过滤关键词
+        if self.filter_matcher and message.text:
+            if self.filter_matcher.search(message.text) is not None:
+                return False
+
+        return True
+
+    def contains_target_keywords(self, text):
+        """检查是否包含目标关键词 - 支持中英文"""
+        if not text:
+            return False
+
+        if not self.target_matcher:
+            return True  # 如果没有设置关键词，则转发所有消息
+
+        # 一次扫描完成所有关键词匹配（不区分大小写）
+        return self.target_matcher.search(text) is not None
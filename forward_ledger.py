@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+转发记录模块 - 把已转发的消息持久化到SQLite（WAL模式），重启或停止/开始监控后不会重复转发
+启动时把保留期内的记录载入内存索引，热路径只查内存字典；
+写入只入队，由后台线程批量提交，并定期删除过期记录
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS forwarded (
+    chat_id INTEGER NOT NULL,
+    message_id INTEGER NOT NULL,
+    forwarded_at REAL NOT NULL,
+    route TEXT NOT NULL,
+    PRIMARY KEY (chat_id, message_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS forwarded_at_idx ON forwarded (forwarded_at);
+"""
+
+
+class ForwardLedger:
+    """已转发消息记录 - 内存索引 + SQLite批量写入"""
+
+    def __init__(self, path='data/forwarded.db', retention=7 * 86400, flush_interval=1.0,
+                 prune_interval=3600):
+        self.path = path
+        self.retention = max(60, float(retention))
+        self.flush_interval = max(0.1, float(flush_interval))
+        self.prune_interval = max(60, float(prune_interval))
+
+        self._index = {}  # (chat_id, message_id) -> 转发时间
+        self._lock = threading.Lock()
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self.running = False
+
+        # 统计
+        self.loaded = 0
+        self.hits = 0
+        self.written = 0
+        self.pruned = 0
+        self.errors = 0
+
+    @classmethod
+    def from_config(cls, config):
+        """从配置创建转发记录"""
+        return cls(
+            path=config.get('forward_ledger_path', 'data/forwarded.db'),
+            retention=config.get('forward_ledger_days', 7) * 86400,
+        )
+
+    def __len__(self):
+        return len(self._index)
+
+    def _connect(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # 多个分片进程可能共用同一个文件，写锁冲突时等待而不是报错
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(SCHEMA)
+        return conn
+
+    def start(self):
+        """载入保留期内的记录并启动后台写入线程"""
+        if self.running:
+            return
+        cutoff = time.time() - self.retention
+        try:
+            conn = self._connect()
+            try:
+                rows = conn.execute(
+                    'SELECT chat_id, message_id, forwarded_at FROM forwarded WHERE forwarded_at >= ?', (cutoff,))
+                index = {(chat_id, message_id): forwarded_at for chat_id, message_id, forwarded_at in rows}
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            self.errors += 1
+            print(f"载入转发记录失败: {e}")
+            index = {}
+
+        with self._lock:
+            index.update(self._index)
+            self._index = index
+        self.loaded = len(index)
+
+        self.running = True
+        self._thread = threading.Thread(target=self._run, name='forward-ledger', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """停止写入线程，提交队列中剩余的记录"""
+        if not self.running:
+            return
+        self.running = False
+        self._queue.put(None)
+        self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def contains(self, chat_id, message_id):
+        """是否已转发过 - 只查内存索引"""
+        if (chat_id, message_id) in self._index:
+            self.hits += 1
+            return True
+        return False
+
+    def record(self, chat_id, message_id, route):
+        """记录一条已转发的消息 - 更新内存索引后入队，不做I/O"""
+        now = time.time()
+        with self._lock:
+            self._index[(chat_id, message_id)] = now
+        if self.running:
+            self._queue.put((chat_id, message_id, now, route))
+
+    def _run(self):
+        """后台线程 - 批量提交记录，定期删除过期记录"""
+        conn = None
+        next_prune = time.monotonic() + self.prune_interval
+        stopping = False
+
+        while not stopping:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = False
+
+            batch = []
+            while item is not False:
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    item = False
+
+            try:
+                if conn is None:
+                    conn = self._connect()
+                if batch:
+                    with conn:
+                        conn.executemany(
+                            'INSERT OR REPLACE INTO forwarded (chat_id, message_id, forwarded_at, route) '
+                            'VALUES (?, ?, ?, ?)', batch)
+                    self.written += len(batch)
+                if time.monotonic() >= next_prune:
+                    self._prune(conn)
+                    next_prune = time.monotonic() + self.prune_interval
+            except sqlite3.Error as e:
+                self.errors += 1
+                print(f"写入转发记录失败: {e}")
+                if conn is not None:
+                    conn.close()
+                    conn = None
+
+        if conn is not None:
+            conn.close()
+
+    def _prune(self, conn):
+        """删除保留期之外的记录（数据库和内存索引）"""
+        cutoff = time.time() - self.retention
+        with conn:
+            self.pruned += conn.execute('DELETE FROM forwarded WHERE forwarded_at < ?', (cutoff,)).rowcount
+        with self._lock:
+            self._index = {key: forwarded_at for key, forwarded_at in self._index.items() if forwarded_at >= cutoff}
+
+    def format_stats(self):
+        """格式化统计信息用于日志"""
+        state = '运行中' if self.running else '已停止'
+        return (f"{state}, 索引 {len(self._index)} 条 (启动载入 {self.loaded}), 拦截 {self.hits} 次, "
+                f"已写入 {self.written} 条, 待写入 {self._queue.qsize()} 条, "
+                f"清理 {self.pruned} 条, 错误 {self.errors} 次")
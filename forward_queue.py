@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+转发队列模块 - 把消息匹配和消息投递解耦
+匹配成功的消息放入有界队列，由多个投递协程并发转发
+队列满时按配置丢弃或暂存到磁盘，空闲后再补发
+发送通道长时间限流时消息延后重新入队，投递协程不在原地等待
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import time
+
+from send_scheduler import SendDeferred, is_retryable
+
+
+class ForwardQueue:
+    """有界异步转发队列 + 投递协程池"""
+
+    def __init__(self, app, deliver, workers=4, maxsize=1000, overflow='drop',
+                 spill_file='forward_spill.jsonl', spill_max_attempts=3):
+        self.app = app
+        self.deliver = deliver            # async def deliver(message, phone)
+        self.worker_count = max(1, int(workers))
+        self.maxsize = max(1, int(maxsize))
+        self.overflow = overflow if overflow in ('drop', 'spill') else 'drop'
+        self.spill_file = spill_file
+        self.spill_max_attempts = max(1, int(spill_max_attempts))  # 投递失败后最多从磁盘补发的次数
+
+        self.queue = None
+        self.worker_tasks = []
+        self.refill_task = None
+        self.running = False
+        self._deferred = {}  # 编号 -> (定时器, phone, message, attempts)
+        self._defer_ids = itertools.count()
+
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.enqueued = 0
+        self.delivered = 0
+        self.failed = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.spill_pending = 0
+        self.given_up = 0
+        self.deferred = 0
+        self.max_depth = 0
+        self.wait_total = 0.0     # 排队耗时累计
+        self.latency_total = 0.0  # 排队 + 投递耗时累计
+        self.latency_max = 0.0
+
+    async def start(self):
+        """启动投递协程 - 必须在全局事件循环中调用"""
+        if self.running:
+            return
+
+        self.queue = asyncio.Queue(maxsize=self.maxsize)
+        self._reset_stats()
+        self.running = True
+
+        self.worker_tasks = [asyncio.ensure_future(self._worker(i)) for i in range(self.worker_count)]
+        if self.overflow == 'spill':
+            self.spill_pending = self._count_spilled()
+            self.refill_task = asyncio.ensure_future(self._refill_loop())
+
+        self.app.root.after(0, lambda: self.app.log_message(
+            f"📮 转发队列已启动: {self.worker_count} 个投递协程, 容量 {self.maxsize}, 队满策略 {self.overflow}"))
+
+    async def stop(self):
+        """停止投递协程，未投递的消息在spill模式下写入磁盘"""
+        if not self.running:
+            return
+        self.running = False
+
+        tasks = list(self.worker_tasks)
+        if self.refill_task:
+            tasks.append(self.refill_task)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.worker_tasks = []
+        self.refill_task = None
+
+        leftover = []
+        for handle, phone, message, attempts in self._deferred.values():
+            handle.cancel()
+            leftover.append((None, phone, message, attempts))
+        self._deferred.clear()
+        while not self.queue.empty():
+            leftover.append(self.queue.get_nowait())
+        if leftover and self.overflow == 'spill':
+            for _, phone, message, attempts in leftover:
+                self._spill(phone, message, attempts)
+        elif leftover:
+            self.dropped += len(leftover)
+            self.app.root.after(0, lambda n=len(leftover): self.app.log_message(
+                f"⚠️ 转发队列已停止，丢弃 {n} 条未投递的消息"))
+
+    def put(self, message, phone, attempts=0):
+        """放入队列 - 不会阻塞事件处理器，返回是否成功入队
+
+        attempts为此前投递失败的次数（从磁盘补发时使用）
+        """
+        if not self.running:
+            self._reject(phone, message, attempts, "转发队列未运行")
+            return False
+
+        try:
+            self.queue.put_nowait((time.monotonic(), phone, message, attempts))
+        except asyncio.QueueFull:
+            self._reject(phone, message, attempts, "转发队列已满")
+            return False
+
+        self.enqueued += 1
+        depth = self.queue.qsize()
+        if depth > self.max_depth:
+            self.max_depth = depth
+        return True
+
+    async def _worker(self, index):
+        """投递协程 - 从队列取出消息并转发"""
+        while True:
+            enqueued_at, phone, message, attempts = await self.queue.get()
+            started_at = time.monotonic()
+            try:
+                await self.deliver(message, phone)
+                self.delivered += 1
+            except asyncio.CancelledError:
+                raise
+            except SendDeferred as e:
+                # 目标通道限流中，到期后重新入队，投递协程继续处理其他通道的消息
+                self.deferred += 1
+                self._defer(phone, message, attempts, e.delay)
+            except Exception as e:
+                # 限速调度器重试后仍然失败；spill模式下临时错误写入磁盘稍后补发，
+                # 请求本身有问题（如BadRequest）或补发次数用完的直接放弃
+                self.failed += 1
+                error_msg = str(e)
+                self.app.root.after(0, lambda msg=error_msg: self.app.log_message(f"❌ 转发失败: {msg}"))
+                self.app.event_logger.record('forward_failed', phone=phone, chat_id=message.chat_id,
+                                             message_id=message.id, error=error_msg, attempts=attempts + 1)
+                if self.overflow == 'spill' and is_retryable(e):
+                    if attempts + 1 < self.spill_max_attempts:
+                        self._spill(phone, message, attempts + 1)
+                    else:
+                        self.given_up += 1
+                        self.app.root.after(0, lambda n=attempts + 1: self.app.log_message(
+                            f"⚠️ 消息已失败 {n} 次，不再补发"))
+            finally:
+                finished_at = time.monotonic()
+                self.wait_total += started_at - enqueued_at
+                latency = finished_at - enqueued_at
+                self.latency_total += latency
+                if latency > self.latency_max:
+                    self.latency_max = latency
+                self.queue.task_done()
+
+    def _defer(self, phone, message, attempts, delay):
+        """延后delay秒重新入队（不计入失败次数）"""
+        key = next(self._defer_ids)
+        handle = asyncio.get_event_loop().call_later(delay, self._requeue_deferred, key)
+        self._deferred[key] = (handle, phone, message, attempts)
+
+    def _requeue_deferred(self, key):
+        _, phone, message, attempts = self._deferred.pop(key)
+        self.put(message, phone, attempts)
+
+    def _reject(self, phone, message, attempts, reason):
+        """无法入队的消息 - spill模式下写入磁盘，否则丢弃并记录日志"""
+        if self.overflow == 'spill':
+            self._spill(phone, message, attempts)
+            return
+        self.dropped += 1
+        if self.dropped % 100 == 1:
+            dropped = self.dropped
+            self.app.root.after(0, lambda: self.app.log_message(f"⚠️ {reason}，已丢弃 {dropped} 条消息"))
+
+    def _spill(self, phone, message, attempts=0):
+        """把无法入队或投递失败的消息定位信息追加到磁盘，稍后重新获取并投递"""
+        record = {'phone': phone, 'chat_id': message.chat_id, 'message_id': message.id, 'attempts': attempts}
+        if self._write_spill([record]):
+            self.spilled += 1
+
+    def _write_spill(self, records):
+        """追加溢写记录，返回是否成功"""
+        try:
+            with open(self.spill_file, 'a', encoding='utf-8') as f:
+                f.write(''.join(json.dumps(record) + '\n' for record in records))
+            self.spill_pending += len(records)
+            return True
+        except Exception as e:
+            self.dropped += len(records)
+            error_msg = str(e)
+            self.app.root.after(0, lambda msg=error_msg: self.app.log_message(f"❌ 转发队列溢写失败: {msg}"))
+            return False
+
+    def _count_spilled(self):
+        """统计磁盘上待补发的消息数量"""
+        if not os.path.exists(self.spill_file):
+            return 0
+        try:
+            with open(self.spill_file, 'r', encoding='utf-8') as f:
+                return sum(1 for line in f if line.strip())
+        except OSError:
+            return 0
+
+    async def _refill_loop(self):
+        """队列空闲时把溢写到磁盘的消息重新取回并入队"""
+        retry_at = 0.0
+        while True:
+            await asyncio.sleep(1)
+            if not self.spill_pending or self.queue.qsize() > self.maxsize // 2 or time.monotonic() < retry_at:
+                continue
+
+            try:
+                with open(self.spill_file, 'r', encoding='utf-8') as f:
+                    records = [json.loads(line) for line in f if line.strip()]
+                os.remove(self.spill_file)
+            except (OSError, ValueError):
+                continue
+
+            self.spill_pending = 0
+            refilled = 0
+            missing = 0
+            kept = []  # 暂时取不回的消息（账号未连接、请求失败），写回磁盘稍后再试
+            last_error = ''
+            for record in records:
+                client = self.app.clients.get(record['phone'])
+                if client is None:
+                    kept.append(record)
+                    continue
+                try:
+                    message = await client.get_messages(record['chat_id'], ids=record['message_id'])
+                except Exception as e:
+                    kept.append(record)
+                    last_error = str(e)
+                    continue
+                if message is None:
+                    # 原消息已被删除
+                    missing += 1
+                elif self.put(message, record['phone'], record.get('attempts', 0)):
+                    refilled += 1
+
+            if kept and self._write_spill(kept):
+                # 一条都没取回时放慢重试，避免账号重连期间每秒重读文件
+                retry_at = time.monotonic() + (30 if not refilled else 0)
+            if refilled:
+                self.app.root.after(0, lambda n=refilled: self.app.log_message(f"📮 已从磁盘补发 {n} 条消息"))
+            if kept or missing:
+                self.app.root.after(0, lambda k=len(kept), m=missing, err=last_error: self.app.log_message(
+                    f"⚠️ 磁盘补发: {k} 条暂时无法获取已写回磁盘, {m} 条原消息已删除"
+                    + (f" (最近错误: {err})" if err else '')))
+
+    def get_stats(self):
+        """获取队列统计"""
+        finished = self.delivered + self.failed + self.deferred
+        return {
+            'depth': self.queue.qsize() if self.queue is not None else 0,
+            'max_depth': self.max_depth,
+            'capacity': self.maxsize,
+            'workers': self.worker_count,
+            'enqueued': self.enqueued,
+            'delivered': self.delivered,
+            'failed': self.failed,
+            'dropped': self.dropped,
+            'spilled': self.spilled,
+            'spill_pending': self.spill_pending,
+            'given_up': self.given_up,
+            'deferred': self.deferred,
+            'deferred_pending': len(self._deferred),
+            'avg_wait': (self.wait_total / finished) if finished else 0.0,
+            'avg_latency': (self.latency_total / finished) if finished else 0.0,
+            'max_latency': self.latency_max,
+        }
+
+    def format_stats(self):
+        """格式化队列统计用于日志"""
+        stats = self.get_stats()
+        return (f"深度 {stats['depth']}/{stats['capacity']} (峰值 {stats['max_depth']}), "
+                f"入队 {stats['enqueued']}, 完成 {stats['delivered']}, 失败 {stats['failed']}, "
+                f"丢弃 {stats['dropped']}, 溢写 {stats['spilled']}, 放弃补发 {stats['given_up']}, "
+                f"延后 {stats['deferred']} (待重新入队 {stats['deferred_pending']}), "
+                f"平均排队 {stats['avg_wait'] * 1000:.0f}ms, 平均延迟 {stats['avg_latency'] * 1000:.0f}ms, "
+                f"最大延迟 {stats['max_latency'] * 1000:.0f}ms")
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+断线补收模块 - 记录每个账号在各监听群组中最后收到的消息ID
+重连成功后用 get_messages(min_id=...) 分批拉取断线期间的消息，按请求预算限速，
+拉到的消息送入与实时消息相同的去重/过滤流程
+"""
+
+import asyncio
+import time
+
+from telethon.errors import FloodWaitError
+
+from send_scheduler import TokenBucket
+
+
+class GapRecovery:
+    """断线补收 - 必须在全局事件循环中使用"""
+
+    def __init__(self, app, process, batch_size=100, max_messages=500, rate=1.0, burst=5):
+        self.app = app
+        self.process = process  # 协程函数 process(message, phone, received_at, recovered)
+        self.batch_size = max(1, min(100, int(batch_size)))  # 单次请求最多100条
+        self.max_messages = max(0, int(max_messages))
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+
+        self.last_seen = {}  # phone -> {带标记的chat_id: 最后消息ID}
+        self.buckets = {}    # phone -> 请求预算令牌桶
+        self._tasks = {}     # phone -> 正在进行的补收任务
+
+        # 统计
+        self.runs = 0
+        self.requests = 0
+        self.recovered = 0
+        self.truncated = 0
+        self.failed_chats = 0
+        self.last_gap = 0
+        self.last_elapsed = 0.0
+
+    @classmethod
+    def from_config(cls, app, config, process):
+        return cls(
+            app,
+            process,
+            batch_size=config.get('gap_recovery_batch', 100),
+            max_messages=config.get('gap_recovery_max_messages', 500),
+            rate=config.get('gap_recovery_rate', 1.0),
+            burst=config.get('gap_recovery_burst', 5),
+        )
+
+    def note(self, phone, chat_id, message_id):
+        """记录收到的消息 - 热路径，只做一次字典读写"""
+        chats = self.last_seen.get(phone)
+        if chats is None:
+            chats = self.last_seen[phone] = {}
+        if message_id > chats.get(chat_id, 0):
+            chats[chat_id] = message_id
+
+    def seed(self, phone, dialogs, allowed):
+        """开始监听时用对话列表中的最新消息初始化，没有消息的群组断线后也能补收"""
+        for dialog in dialogs:
+            if dialog.id in allowed and dialog.message is not None:
+                self.note(phone, dialog.id, dialog.message.id)
+
+    def forget(self, phone):
+        self.last_seen.pop(phone, None)
+        self.buckets.pop(phone, None)
+
+    def on_reconnected(self, phone, client, downtime):
+        """健康监控的重连回调 - 同一账号只保留一个补收任务"""
+        if not self.app.is_running or self.max_messages == 0:
+            return
+        task = self._tasks.pop(phone, None)
+        if task is not None:
+            task.cancel()
+        self._tasks[phone] = asyncio.ensure_future(self.recover(phone, client, downtime))
+
+    def stop(self):
+        """取消所有补收任务"""
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks.clear()
+
+    def _bucket(self, phone):
+        bucket = self.buckets.get(phone)
+        if bucket is None:
+            bucket = self.buckets[phone] = TokenBucket(self.rate, self.burst)
+        return bucket
+
+    async def recover(self, phone, client, downtime=0.0):
+        """补收一个账号所有监听群组的断线消息，返回补收条数"""
+        started_at = time.monotonic()
+        # 只补收当前仍在监听的群组
+        chat_filter = self.app.message_monitor.chat_filters.get(phone)
+        allowed = chat_filter.allowed if chat_filter is not None else ()
+        pending = {chat_id: last_id for chat_id, last_id in self.last_seen.get(phone, {}).items()
+                   if chat_id in allowed}
+
+        total = 0
+        chats = 0
+        try:
+            for chat_id, last_id in pending.items():
+                # 每个群组单独处理，一个群组出错（如已被踢出）不影响其他群组的补收
+                try:
+                    count = await self._recover_chat(phone, client, chat_id, last_id)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.failed_chats += 1
+                    self.app.log_message(f"❌ 账号 {phone} 群组 {chat_id} 断线补收失败: {str(e)}")
+                    continue
+                if count:
+                    total += count
+                    chats += 1
+        finally:
+            if self._tasks.get(phone) is asyncio.current_task():
+                del self._tasks[phone]
+
+        elapsed = time.monotonic() - started_at
+        self.runs += 1
+        self.recovered += total
+        self.last_gap = total
+        self.last_elapsed = elapsed
+
+        self.app.event_logger.record('gap_recovered', phone=phone, chats=chats, checked=len(pending),
+                                     messages=total, elapsed_ms=round(elapsed * 1000, 1),
+                                     downtime=round(downtime, 1))
+        if total:
+            self.app.log_message(f"🧩 账号 {phone} 补收断线消息 {total} 条 "
+                                 f"({chats}/{len(pending)} 个群组, 断线 {downtime:.1f} 秒, 用时 {elapsed:.1f} 秒)")
+        else:
+            self.app.log_debug("🧩 账号 %s 断线期间没有遗漏消息 (检查 %s 个群组)", phone, len(pending))
+        return total
+
+    async def _recover_chat(self, phone, client, chat_id, last_id):
+        """分批拉取一个群组中ID大于last_id的消息（从旧到新），返回补收条数"""
+        bucket = self._bucket(phone)
+        count = 0
+        min_id = last_id
+        while count < self.max_messages:
+            limit = min(self.batch_size, self.max_messages - count)
+            await bucket.acquire()
+            try:
+                batch = await client.get_messages(chat_id, limit=limit, min_id=min_id, reverse=True)
+            except FloodWaitError as e:
+                bucket.pause(e.seconds)
+                continue
+            self.requests += 1
+
+            received_at = time.monotonic()
+            for message in batch:
+                if not self.app.is_running:
+                    return count
+                self.note(phone, chat_id, message.id)
+                await self.process(message, phone, received_at, True)
+            count += len(batch)
+
+            if len(batch) < limit:
+                return count
+            min_id = batch[-1].id
+
+        # 达到上限，更早的遗漏消息放弃
+        self.truncated += 1
+        self.app.log_message(f"⚠️ 账号 {phone} 群组 {chat_id} 断线消息超过 {self.max_messages} 条，只补收最早的部分")
+        return count
+
+    def format_stats(self):
+        """格式化补收统计用于日志"""
+        tracked = sum(len(chats) for chats in self.last_seen.values())
+        return (f"跟踪 {tracked} 个群组, 补收 {self.runs} 次, 共 {self.recovered} 条, "
+                f"请求 {self.requests} 次, 截断 {self.truncated} 次, 失败 {self.failed_chats} 个群组, "
+                f"最近一次 {self.last_gap} 条/{self.last_elapsed:.1f}秒")
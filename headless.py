@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+无界面(headless)运行模式 - 不依赖tkinter，直接从配置文件运行监控核心
+所有功能在同一个asyncio事件循环中运行，日志输出到标准输出，适合服务器和容器
+
+用法: python headless.py [--config config.json]
+      python main.py --headless
+"""
+
+import argparse
+import asyncio
+import functools
+import signal
+import sys
+
+from monitor_core import MonitorCore
+
+
+class ConfigVar:
+    """代替tk变量 - 提供相同的get/set接口，直接读写配置字典"""
+
+    def __init__(self, config, key, default=''):
+        self.config = config
+        self.key = key
+        self.default = default
+
+    def get(self):
+        return self.config.get(self.key, self.default)
+
+    def set(self, value):
+        self.config[self.key] = value
+
+
+class LoopRoot:
+    """代替tk.Tk - root.after把回调投递到事件循环执行（可在任意线程调用）"""
+
+    def __init__(self, loop):
+        self.loop = loop
+
+    def after(self, ms, func=None, *args):
+        if func is None or self.loop.is_closed():
+            return None
+        callback = functools.partial(self._run, func, args)
+        if ms:
+            self.loop.call_soon_threadsafe(self.loop.call_later, ms / 1000, callback)
+        else:
+            self.loop.call_soon_threadsafe(callback)
+        return None
+
+    @staticmethod
+    def _run(func, args):
+        try:
+            func(*args)
+        except Exception as e:
+            print(f"回调执行失败: {e}")
+
+    def quit(self):
+        pass
+
+    def destroy(self):
+        pass
+
+
+class HeadlessApp(MonitorCore):
+    """无界面前端 - 配置来自文件，自动加载session并开始监控"""
+
+    # 各模块读取的界面变量 -> (配置项, 默认值)
+    CONFIG_VARS = {
+        'api_id_var': ('api_id', ''),
+        'api_hash_var': ('api_hash', ''),
+        'bot_token_var': ('bot_token', ''),
+        'use_proxy': ('use_proxy', True),
+        'proxy_host_var': ('proxy_host', '127.0.0.1'),
+        'proxy_port_var': ('proxy_port', '7890'),
+        'proxy_type_var': ('proxy_type', 'HTTP'),
+        'filter_keywords_var': ('filter_keywords', ''),
+        'target_keywords_var': ('target_keywords', ''),
+        'forward_to_var': ('forward_to', ''),
+        'whitelist_groups_var': ('whitelist_groups', ''),
+        'monitor_chats_var': ('monitor_chats', ''),
+    }
+
+    def __init__(self, config_file="config.json", config_overrides=None):
+        super().__init__(config_file, config_overrides)
+        self.root = LoopRoot(self.global_loop)
+        for attr, (key, default) in self.CONFIG_VARS.items():
+            setattr(self, attr, ConfigVar(self.config, key, default))
+
+        self._stop_event = None
+        self.log_prefix = ''
+
+    def update_account_list(self, phone, username):
+        """无界面时没有账号列表，加载结果已写入日志"""
+
+    def stop_monitoring(self):
+        """停止监控并结束运行 - 可在任意线程调用"""
+        if self.is_running:
+            self.is_running = False
+            self.processed_messages.clear()
+            self.content_dedup.clear()
+            self.message_monitor.stop_monitoring()
+            self.log_message("🛑 监控已停止")
+        self.request_stop()
+
+    def request_stop(self):
+        """请求退出主循环"""
+        if self._stop_event is not None and not self.global_loop.is_closed():
+            self.global_loop.call_soon_threadsafe(self._stop_event.set)
+
+    def reload_config(self):
+        """重新读取配置文件并更新过滤计划（SIGHUP）"""
+        config = self.config_manager.load_config()
+        self.config.clear()
+        self.config.update(config)
+        self.config.update(self.config_overrides)
+        self.message_monitor.refresh_filter_plan()
+        self.network_proxy.refresh_settings()
+        self.log_message("🔄 配置已重新加载")
+
+    def _install_signal_handlers(self):
+        loop = self.global_loop
+        handlers = [(signal.SIGINT, self.request_stop), (signal.SIGTERM, self.request_stop)]
+        if hasattr(signal, 'SIGHUP'):
+            handlers.append((signal.SIGHUP, self.reload_config))
+        for signum, handler in handlers:
+            try:
+                loop.add_signal_handler(signum, handler)
+            except (NotImplementedError, RuntimeError):
+                # Windows不支持add_signal_handler，Ctrl+C通过KeyboardInterrupt退出
+                pass
+
+    def _flush_log(self):
+        lines = self.log_sink.drain()
+        if lines:
+            sys.stdout.write("".join(f"{self.log_prefix}{line}\n" for line in lines))
+            sys.stdout.flush()
+
+    async def _log_pump(self):
+        """定时把日志缓冲输出到标准输出"""
+        interval = self.log_sink.flush_interval / 1000
+        while True:
+            self._flush_log()
+            await asyncio.sleep(interval)
+
+    async def _stats_loop(self, interval):
+        """定时输出运行统计"""
+        while True:
+            await asyncio.sleep(interval)
+            self.log_stats()
+
+    def _check_config(self):
+        """检查启动监控必需的配置"""
+        missing = [key for key in ('api_id', 'api_hash', 'bot_token', 'forward_to') if not self.config.get(key)]
+        if missing:
+            self.log_message(f"❌ 配置文件缺少: {', '.join(missing)}")
+            return False
+        return True
+
+    async def run_async(self):
+        """加载账号、启动监控，直到收到退出信号"""
+        self._stop_event = asyncio.Event()
+        self._install_signal_handlers()
+        background = [asyncio.ensure_future(self._log_pump())]
+
+        try:
+            self.log_message("🖥️ 无界面模式启动")
+            if not self._check_config():
+                return
+
+            # 加载已有session（账号需事先在图形界面中登录）
+            phones = self.config.get('headless_accounts') or self.account_manager.find_session_phones()
+            self.selected_accounts = await self.account_manager.load_sessions(phones)
+            if not self.selected_accounts:
+                self.log_message("❌ 没有可用的账号，请先在图形界面中登录")
+                return
+
+            # start_monitoring会阻塞等待转发队列在全局事件循环中启动完成，必须放到线程中执行，
+            # 在事件循环线程中直接调用会互相等待而卡死
+            self.is_running = True
+            await self.global_loop.run_in_executor(None, self.message_monitor.start_monitoring)
+
+            stats_interval = self.config.get('headless_stats_interval', 300)
+            if stats_interval:
+                background.append(asyncio.ensure_future(self._stats_loop(stats_interval)))
+
+            await self._stop_event.wait()
+
+        finally:
+            await self._shutdown(background)
+
+    async def _shutdown(self, background):
+        self.log_message("正在关闭程序...")
+
+        if self.is_running:
+            self.is_running = False
+            future = self.message_monitor.stop_monitoring()
+            if future is not None:
+                await asyncio.wrap_future(future)
+
+        for phone, client in list(self.clients.items()):
+            try:
+                await asyncio.wait_for(client.disconnect(), timeout=5)
+            except Exception:
+                pass
+        self.network_proxy.stop()
+        self.http_client.close()
+
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+
+        self.event_logger.stop()
+        self.forward_ledger.stop()
+        self.message_archive.stop()
+        self.log_message("程序关闭完成")
+        self._flush_log()
+
+    def run(self):
+        """在当前线程运行全局事件循环"""
+        asyncio.set_event_loop(self.global_loop)
+        try:
+            self.global_loop.run_until_complete(self.run_async())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.global_loop.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Telegram消息监控转发程序 - 无界面模式")
+    parser.add_argument('--config', default='config.json', help="配置文件路径")
+    parser.add_argument('--headless', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    HeadlessApp(args.config).run()
+
+
+if __name__ == "__main__":
+    main()
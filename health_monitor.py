@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+连接健康监控 - 在全局事件循环中等待Telethon的断开事件，断开后按指数退避+抖动重连
+记录每个账号的在线时长和重连次数，定时（以及状态变化时）发布状态快照
+取代原来分散的三个轮询线程
+"""
+
+import asyncio
+import random
+import time
+
+
+class AccountHealth:
+    """单个账号的连接状态"""
+
+    __slots__ = ('phone', 'state', 'connected_since', 'disconnected_at', 'uptime_total',
+                 'reconnects', 'failures', 'last_error', 'last_downtime', 'manual', 'ready')
+
+    def __init__(self, phone):
+        self.phone = phone
+        self.state = 'connecting'   # connecting / connected / reconnecting / failed
+        self.connected_since = None
+        self.disconnected_at = None
+        self.uptime_total = 0.0     # 以前各次连接的累计在线时长
+        self.reconnects = 0
+        self.failures = 0
+        self.last_error = ''
+        self.last_downtime = 0.0
+        self.manual = False         # 手动请求的重连，不等待退避
+        self.ready = asyncio.Event()  # 已连接时置位
+
+    def mark_connected(self, now):
+        if self.state != 'connected':
+            self.state = 'connected'
+            self.connected_since = now
+        self.ready.set()
+
+    def mark_disconnected(self, now):
+        self.ready.clear()
+        if self.connected_since is not None:
+            self.uptime_total += now - self.connected_since
+            self.connected_since = None
+        self.disconnected_at = now
+
+    def uptime(self, now):
+        """累计在线时长（包含当前这次连接）"""
+        current = now - self.connected_since if self.connected_since is not None else 0.0
+        return self.uptime_total + current
+
+
+class HealthMonitor:
+    """所有账号的连接监督 - 必须在全局事件循环中使用"""
+
+    def __init__(self, app, base_delay=1.0, max_delay=300.0, snapshot_interval=30.0, connect_timeout=30.0):
+        self.app = app
+        self.base_delay = float(base_delay)
+        self.max_delay = float(max_delay)
+        self.snapshot_interval = float(snapshot_interval)
+        self.connect_timeout = float(connect_timeout)
+
+        self.accounts = {}      # phone -> AccountHealth
+        self._tasks = {}        # phone -> 监督任务
+        self._publisher = None
+        self._listeners = []    # 快照回调（可能在事件循环线程中调用）
+        self._reconnect_listeners = []  # 重连成功回调 (phone, client, 断线秒数)
+
+        self.started_at = time.monotonic()
+        self.latest_snapshot = {}
+
+    @classmethod
+    def from_config(cls, app, config):
+        return cls(
+            app,
+            base_delay=config.get('reconnect_base_delay', 1.0),
+            max_delay=config.get('reconnect_max_delay', 300),
+            snapshot_interval=config.get('health_snapshot_interval', 30),
+            connect_timeout=config.get('reconnect_connect_timeout', 30),
+        )
+
+    def subscribe(self, callback):
+        """订阅状态快照 callback(snapshot)"""
+        self._listeners.append(callback)
+
+    def on_reconnected(self, callback):
+        """订阅重连成功事件 callback(phone, client, downtime) - 可以是协程函数"""
+        self._reconnect_listeners.append(callback)
+
+    def watch(self, phone, client):
+        """开始监督一个账号"""
+        self.unwatch(phone)
+        health = self.accounts.get(phone)
+        if health is None:
+            health = self.accounts[phone] = AccountHealth(phone)
+        self._tasks[phone] = asyncio.ensure_future(self._supervise(phone, client, health))
+
+        if self._publisher is None and self.snapshot_interval > 0:
+            self._publisher = asyncio.ensure_future(self._publish_loop())
+
+    def unwatch(self, phone):
+        task = self._tasks.pop(phone, None)
+        if task is not None:
+            task.cancel()
+
+    def stop(self):
+        """停止所有监督任务"""
+        for phone in list(self._tasks):
+            self.unwatch(phone)
+        if self._publisher is not None:
+            self._publisher.cancel()
+            self._publisher = None
+        self._publish()
+
+    async def wait_connected(self, phone):
+        """等待账号连接成功（需先watch）"""
+        await self.accounts[phone].ready.wait()
+
+    def request_reconnect(self, phone):
+        """手动重连 - 断开后由监督任务立即重连"""
+        client = self.app.clients.get(phone)
+        health = self.accounts.get(phone)
+        if client is None or health is None or phone not in self._tasks:
+            return False
+        health.manual = True
+        asyncio.ensure_future(client.disconnect())
+        return True
+
+    def _backoff(self, attempt):
+        """指数退避 + 全抖动"""
+        return random.uniform(self.base_delay, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def _supervise(self, phone, client, health):
+        """等待断开事件并重连"""
+        while True:
+            if not client.is_connected():
+                if not await self._reconnect(phone, client, health):
+                    return
+                continue
+
+            health.mark_connected(time.monotonic())
+            self._publish()
+
+            try:
+                # Telethon在连接彻底断开（自身重试也失败或主动断开）时完成这个future
+                await client.disconnected
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                health.last_error = str(e)
+
+            # 账号已被删除或替换时停止监督
+            if self.app.clients.get(phone) is not client:
+                self._tasks.pop(phone, None)
+                return
+
+            health.mark_disconnected(time.monotonic())
+            health.state = 'reconnecting'
+            if not health.manual:
+                self.app.log_message(f"⚠️ 账号 {phone} 连接断开，开始重连")
+            self._publish()
+
+    async def _reconnect(self, phone, client, health):
+        """按退避时间重连，直到成功（返回True）或会话失效（返回False）"""
+        attempt = 0
+        # 每轮重连开始时按DC延迟表重新选择路径，之后出错再由代理池切换
+        self.app.network_proxy.apply_best_path(phone, client)
+        while True:
+            if health.manual:
+                health.manual = False
+            else:
+                delay = self._backoff(attempt)
+                await asyncio.sleep(delay)
+            attempt += 1
+
+            try:
+                # 代理卡住时Telethon自身的重试会持续很久，超时后切换代理再试
+                await asyncio.wait_for(client.connect(), self.connect_timeout)
+                if not await client.is_user_authorized():
+                    health.state = 'failed'
+                    health.last_error = '会话已失效'
+                    self.app.log_message(f"❌ 账号 {phone} 会话已失效，需要重新登录")
+                    self._publish()
+                    return False
+                # 发起一次请求，确认连接可用并恢复更新接收
+                await client.get_me()
+                break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                health.failures += 1
+                health.last_error = str(e) or type(e).__name__
+                self.app.log_message(f"❌ 账号 {phone} 第 {attempt} 次重连失败: {health.last_error}")
+                # 使用代理池时换一个代理
+                self.app.network_proxy.failover(phone, client, health.last_error)
+
+        self.app.network_proxy.report_success(phone)
+        now = time.monotonic()
+        downtime = now - health.disconnected_at if health.disconnected_at is not None else 0.0
+        health.reconnects += 1 if health.disconnected_at is not None else 0
+        health.last_downtime = downtime
+        health.mark_connected(now)
+        self.app.log_message(f"🔄 账号 {phone} 重连成功 (断线 {downtime:.1f} 秒, 累计重连 {health.reconnects} 次)")
+        self._publish()
+
+        for callback in self._reconnect_listeners:
+            try:
+                result = callback(phone, client, downtime)
+                if asyncio.iscoroutine(result):
+                    asyncio.ensure_future(result)
+            except Exception as e:
+                self.app.log_message(f"❗ 重连回调失败: {str(e)}")
+        return True
+
+    def snapshot(self):
+        """当前状态快照"""
+        now = time.monotonic()
+        accounts = {}
+        for phone, health in self.accounts.items():
+            if phone not in self._tasks:
+                continue
+            accounts[phone] = {
+                'state': health.state,
+                'uptime': round(health.uptime(now), 1),
+                'reconnects': health.reconnects,
+                'failures': health.failures,
+                'last_downtime': round(health.last_downtime, 1),
+                'last_error': health.last_error,
+            }
+        online = sum(1 for item in accounts.values() if item['state'] == 'connected')
+        return {
+            'online': online,
+            'total': len(accounts),
+            'reconnects': sum(item['reconnects'] for item in accounts.values()),
+            'accounts': accounts,
+        }
+
+    def _publish(self):
+        self.latest_snapshot = self.snapshot()
+        for callback in self._listeners:
+            try:
+                callback(self.latest_snapshot)
+            except Exception as e:
+                print(f"发布状态快照失败: {e}")
+
+    async def _publish_loop(self):
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            self._publish()
+
+    def format_snapshot(self, snapshot=None):
+        """格式化快照用于日志，返回多行文本列表"""
+        snapshot = snapshot or self.latest_snapshot or self.snapshot()
+        lines = [f"{snapshot['online']}/{snapshot['total']} 账号在线, 累计重连 {snapshot['reconnects']} 次"]
+        for phone, item in snapshot['accounts'].items():
+            line = (f"  {phone}: {item['state']}, 在线 {item['uptime'] / 60:.1f} 分钟, "
+                    f"重连 {item['reconnects']} 次, 失败 {item['failures']} 次")
+            if item['last_error']:
+                line += f", 最近错误: {item['last_error']}"
+            lines.append(line)
+        return lines
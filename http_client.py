@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTTP客户端模块 - 所有HTTP请求共用的连接池
+每个代理（以及直连）一个requests.Session，保持长连接，重复请求不再重新做TCP/TLS/代理握手
+统计新建连接数和请求数，计算连接复用率
+Bot API使用python-telegram-bot自带的HTTPX连接池，经过同一个代理，请求数一并统计
+"""
+
+import importlib.util
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+def proxy_url(proxy_config):
+    """代理配置转换为requests使用的代理地址，直连时为None"""
+    if not proxy_config:
+        return None
+    scheme = 'socks5' if proxy_config['proxy_type'] == 'socks5' else 'http'
+    return f"{scheme}://{proxy_config['addr']}:{proxy_config['port']}"
+
+
+class HttpClient:
+    """按代理区分的共享会话 - 可在任意线程使用"""
+
+    def __init__(self, pool_connections=10, pool_maxsize=10):
+        self.pool_connections = max(1, int(pool_connections))
+        self.pool_maxsize = max(1, int(pool_maxsize))
+
+        self._sessions = {}  # 代理地址(直连为None) -> requests.Session
+        self._lock = threading.Lock()
+
+        # 统计
+        self.requests = 0
+        self.errors = 0
+        self.bot_pool_size = 0
+        self.bot_proxy = None
+        self.bot_requests = 0
+        self.bot_errors = 0
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            pool_connections=config.get('http_pool_connections', 10),
+            pool_maxsize=config.get('http_pool_maxsize', 10),
+        )
+
+    def session(self, proxy_config=None):
+        """获取（或创建）该代理的会话"""
+        url = proxy_url(proxy_config)
+        session = self._sessions.get(url)
+        if session is not None:
+            return session
+
+        with self._lock:
+            session = self._sessions.get(url)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                if url is not None:
+                    session.proxies = {'http': url, 'https': url}
+                self._sessions[url] = session
+            return session
+
+    def request(self, method, url, proxy_config=None, **kwargs):
+        """发送请求 - 参数与requests相同，proxy_config为NetworkProxy格式的代理配置"""
+        self.requests += 1
+        try:
+            return self.session(proxy_config).request(method, url, **kwargs)
+        except requests.RequestException:
+            self.errors += 1
+            raise
+
+    def get(self, url, proxy_config=None, **kwargs):
+        return self.request('GET', url, proxy_config, **kwargs)
+
+    def post(self, url, proxy_config=None, **kwargs):
+        return self.request('POST', url, proxy_config, **kwargs)
+
+    def close(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+
+    def _pools(self):
+        """所有会话下的urllib3连接池（直连和经代理的）"""
+        for session in list(self._sessions.values()):
+            for adapter in set(session.adapters.values()):
+                managers = [adapter.poolmanager] + list(adapter.proxy_manager.values())
+                for manager in managers:
+                    for key in list(manager.pools.keys()):
+                        pool = manager.pools.get(key)
+                        if pool is not None:
+                            yield pool
+
+    def connection_stats(self):
+        """返回 (新建连接数, 经过连接池的请求数)"""
+        connections = 0
+        pooled_requests = 0
+        for pool in self._pools():
+            connections += pool.num_connections
+            pooled_requests += pool.num_requests
+        return connections, pooled_requests
+
+    def bot_request(self, config, proxy_config=None):
+        """Bot API使用的HTTPX连接池 - 连接数不少于转发并发数，连接池满时排队等待而不是立即报错
+
+        proxy_config为NetworkProxy格式的代理配置；SOCKS5代理需要安装socksio，未安装时Bot改为直连
+        """
+        from telegram.request import HTTPXRequest
+
+        workers = int(config.get('forward_workers', 4))
+        pool_size = max(workers, int(config.get('bot_pool_size', 16)))
+        pool_timeout = float(config.get('bot_pool_timeout', 10))
+        url = proxy_url(proxy_config)
+        if url is not None and url.startswith('socks5') and importlib.util.find_spec('socksio') is None:
+            self.bot_proxy = f"直连, {url} 需要安装socksio"
+            url = None
+        else:
+            self.bot_proxy = url
+        request = HTTPXRequest(connection_pool_size=pool_size, pool_timeout=pool_timeout, proxy=url)
+
+        self.bot_pool_size = pool_size
+        self._track_bot(request)
+        return request
+
+    def _track_bot(self, request):
+        """统计Bot API请求 - 包装do_request，HTTP错误状态码和网络异常都计为失败"""
+        do_request = request.do_request
+
+        async def counted(*args, **kwargs):
+            self.bot_requests += 1
+            try:
+                code, payload = await do_request(*args, **kwargs)
+            except Exception:
+                self.bot_errors += 1
+                raise
+            if code >= 400:
+                self.bot_errors += 1
+            return code, payload
+
+        request.do_request = counted
+
+    def format_stats(self):
+        """格式化统计信息用于日志"""
+        connections, pooled_requests = self.connection_stats()
+        reuse = 1 - connections / pooled_requests if pooled_requests else 0.0
+        text = (f"会话 {len(self._sessions)} 个, 请求 {self.requests} 次 (失败 {self.errors}), "
+                f"新建连接 {connections} 个, 连接复用率 {reuse:.0%}")
+        if self.bot_pool_size:
+            text += (f"; Bot连接池 {self.bot_pool_size} 个连接 ({self.bot_proxy or '直连'}), "
+                     f"请求 {self.bot_requests} 次 (失败 {self.bot_errors})")
+        return text
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+关键词匹配模块 - 基于Aho-Corasick自动机的多关键词匹配
+一次扫描文本即可找出所有命中的关键词，不区分大小写，支持中英文
+"""
+
+from collections import deque
+
+
+def parse_keywords(keywords_text):
+    """解析逗号分隔的关键词设置"""
+    if not keywords_text:
+        return []
+    return [k.strip() for k in keywords_text.split(',') if k.strip()]
+
+
+class KeywordMatcher:
+    """编译后的关键词自动机 - 构建后只读，可在线程间共享"""
+
+    def __init__(self, keywords):
+        # 去重但保持原有顺序
+        self.keywords = tuple(dict.fromkeys(k for k in keywords if k))
+
+        self._goto = [{}]   # 每个节点的转移表
+        self._fail = [0]    # 失败指针
+        self._out = [()]    # 每个节点命中的关键词下标
+
+        for index, keyword in enumerate(self.keywords):
+            self._add(keyword.lower(), index)
+        self._build_fail_links()
+
+    @classmethod
+    def from_text(cls, keywords_text):
+        """从逗号分隔的关键词设置构建自动机"""
+        return cls(parse_keywords(keywords_text))
+
+    def __len__(self):
+        return len(self.keywords)
+
+    def __bool__(self):
+        return bool(self.keywords)
+
+    def _add(self, pattern, index):
+        """把一个关键词插入字典树"""
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            node = next_node
+        self._out[node] = self._out[node] + (index,)
+
+    def _build_fail_links(self):
+        """广度优先构建失败指针，并合并后缀节点的输出"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+
+                if self._out[self._fail[child]]:
+                    self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def _scan(self, text):
+        """逐字符扫描文本，产出命中的关键词下标"""
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+
+        node = 0
+        for char in text.lower():
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if out[node]:
+                yield out[node]
+
+    def search(self, text):
+        """返回第一个命中的关键词，没有命中返回None"""
+        if not text or not self.keywords:
+            return None
+        for hits in self._scan(text):
+            return self.keywords[hits[0]]
+        return None
+
+    def find_all(self, text):
+        """返回所有命中的关键词（按关键词设置中的顺序）"""
+        if not text or not self.keywords:
+            return []
+
+        hit_indexes = set()
+        for hits in self._scan(text):
+            hit_indexes.update(hits)
+            if len(hit_indexes) == len(self.keywords):
+                break
+        return [self.keywords[i] for i in sorted(hit_indexes)]
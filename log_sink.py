@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日志输出模块 - 批量、限速地把日志写入界面
+任意线程都可以直接写日志（只追加到环形缓冲区），
+由Tk定时器批量取出后一次性插入文本框，限制可见行数并合并重复行
+"""
+
+import time
+from collections import deque
+from datetime import datetime
+
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVEL_NAMES = {DEBUG: 'DEBUG', INFO: 'INFO', WARNING: 'WARNING', ERROR: 'ERROR'}
+LEVELS_BY_NAME = {name: level for level, name in LEVEL_NAMES.items()}
+
+
+class LogSink:
+    """日志环形缓冲区 + 界面批量刷新"""
+
+    def __init__(self, level=INFO, buffer_size=20000, max_lines=5000, flush_interval=100, max_batch=2000):
+        self.level = level
+        self.max_lines = max(100, int(max_lines))
+        self.flush_interval = max(10, int(flush_interval))
+        self.max_batch = max(1, int(max_batch))
+
+        # deque的append/popleft在CPython中是原子操作，生产者无需加锁
+        self._ring = deque(maxlen=max(100, int(buffer_size)))
+
+        self._root = None
+        self._widget = None
+        self._last_line = None   # 上一条显示的内容（用于合并重复行）
+        self._repeat = 0
+
+        # 统计
+        self.emitted = 0
+        self.overflowed = 0
+        self.collapsed = 0
+
+    @staticmethod
+    def parse_level(name, default=INFO):
+        """把级别名称转换为数值"""
+        return LEVELS_BY_NAME.get(str(name).upper(), default)
+
+    def set_level(self, level):
+        self.level = level
+
+    def is_enabled(self, level):
+        return level >= self.level
+
+    def emit(self, message, level=INFO, args=()):
+        """写入一条日志 - 线程安全，不访问Tk；被过滤的级别不会格式化"""
+        if level < self.level:
+            return
+        ring = self._ring
+        if len(ring) == ring.maxlen:
+            self.overflowed += 1
+        ring.append((time.time(), level, message, args))
+        self.emitted += 1
+
+    def drain(self, limit=None):
+        """取出缓冲区中的日志并格式化，连续重复的内容合并为一行"""
+        ring = self._ring
+        limit = limit or self.max_batch
+        lines = []
+
+        count = 0
+        while ring and count < limit:
+            created, level, message, args = ring.popleft()
+            count += 1
+            if args:
+                try:
+                    message = message % args
+                except (TypeError, ValueError):
+                    message = f"{message} {args}"
+
+            if message == self._last_line:
+                self._repeat += 1
+                self.collapsed += 1
+                continue
+
+            if self._repeat:
+                lines.append(f"    ↑ 上一条重复 {self._repeat} 次")
+                self._repeat = 0
+            self._last_line = message
+
+            timestamp = datetime.fromtimestamp(created).strftime("%Y-%m-%d %H:%M:%S")
+            if level >= WARNING:
+                lines.append(f"[{timestamp}] [{LEVEL_NAMES.get(level, level)}] {message}")
+            else:
+                lines.append(f"[{timestamp}] {message}")
+
+        # 缓冲区已取空时输出尚未显示的重复计数
+        if not ring and self._repeat:
+            lines.append(f"    ↑ 上一条重复 {self._repeat} 次")
+            self._repeat = 0
+            self._last_line = None
+
+        return lines
+
+    def attach(self, root, widget):
+        """绑定Tk文本框并启动定时刷新"""
+        self._root = root
+        self._widget = widget
+        root.after(self.flush_interval, self._flush)
+
+    def _flush(self):
+        """Tk定时器回调 - 一次插入一批日志"""
+        try:
+            lines = self.drain()
+            if lines:
+                import tkinter as tk
+
+                widget = self._widget
+                widget.insert(tk.END, "\n".join(lines) + "\n")
+
+                # 限制可见行数，删除最旧的行
+                line_count = int(widget.index('end-1c').split('.')[0])
+                excess = line_count - self.max_lines
+                if excess > 0:
+                    widget.delete('1.0', f'{excess + 1}.0')
+
+                widget.see(tk.END)
+        except Exception as e:
+            print(f"刷新日志失败: {e}")
+        finally:
+            # 缓冲区积压时加快刷新
+            delay = 10 if self._ring else self.flush_interval
+            self._root.after(delay, self._flush)
+
+    def format_stats(self):
+        """格式化统计信息"""
+        return (f"已记录 {self.emitted} 条, 待刷新 {len(self._ring)} 条, "
+                f"合并重复 {self.collapsed} 条, 缓冲区溢出 {self.overflowed} 条")
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+事件循环后端 - 根据配置选择默认asyncio循环或uvloop
+uvloop未安装或平台不支持（Windows）时自动回退到asyncio
+"""
+
+import asyncio
+import sys
+
+
+BACKENDS = ('asyncio', 'uvloop')
+
+
+def uvloop_available():
+    """当前环境是否可以使用uvloop"""
+    if sys.platform == 'win32':
+        return False
+    try:
+        import uvloop  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def new_event_loop(backend='asyncio'):
+    """创建事件循环，返回 (循环, 实际使用的后端名称)"""
+    if backend == 'uvloop' and uvloop_available():
+        import uvloop
+        return uvloop.new_event_loop(), 'uvloop'
+    return asyncio.new_event_loop(), 'asyncio'
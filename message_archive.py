@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+消息存档模块 - 把收到的群组消息保存到本地SQLite，并用FTS5建立全文索引
+SQLite自带的分词器不切分中文，入库前把中日韩文字切成相邻二字组（bigram），
+查询时用同样的方法切分，按短语匹配；单个汉字的查询退回LIKE扫描
+写入只入队，由后台线程批量提交；查询使用独立的只读连接，不影响写入
+
+用法: python message_archive.py 关键词 [--chat 群组] [--days 7] [--limit 20]
+"""
+
+import argparse
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    chat_id INTEGER NOT NULL,
+    message_id INTEGER NOT NULL,
+    date REAL NOT NULL,
+    chat_title TEXT NOT NULL,
+    sender_id INTEGER,
+    text TEXT NOT NULL,
+    UNIQUE (chat_id, message_id)
+);
+CREATE INDEX IF NOT EXISTS messages_date_idx ON messages (date);
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(terms, tokenize='unicode61');
+"""
+
+# 中日韩文字（假名、汉字、谚文）
+_CJK = r'\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff'
+_CJK_RE = re.compile(f'[{_CJK}]+')
+# 连续的中日韩文字，或不含中日韩文字的单词
+_WORD_RE = re.compile(f'[{_CJK}]+|[^\\W{_CJK}]+')
+
+
+def _bigrams(run):
+    if len(run) == 1:
+        return [run]
+    return [run[i:i + 2] for i in range(len(run) - 1)]
+
+
+def index_terms(text):
+    """把文本转换为索引用的词序列：中日韩文字切成二字组，其他按单词"""
+    terms = []
+    for word in _WORD_RE.findall(text.lower()):
+        if _CJK_RE.fullmatch(word):
+            terms.extend(_bigrams(word))
+        else:
+            terms.append(word)
+    return ' '.join(terms)
+
+
+def build_match(query):
+    """把查询转换为FTS5 MATCH表达式（各词为AND关系）
+
+    返回 (MATCH表达式或None, 单字词列表)：单个汉字等无法用二字组索引匹配的词
+    不放进MATCH表达式，由调用方对原文逐个用LIKE过滤
+    """
+    clauses = []
+    single_chars = []
+    for word in _WORD_RE.findall(query.lower()):
+        if _CJK_RE.fullmatch(word):
+            if len(word) == 1:
+                single_chars.append(word)
+                continue
+            # 二字组按顺序相邻出现 = 原文包含这个词
+            clauses.append('"' + ' '.join(_bigrams(word)) + '"')
+        else:
+            clauses.append('"' + word + '"')
+    return (' AND '.join(clauses) if clauses else None), single_chars
+
+
+class MessageArchive:
+    """消息存档 - 后台线程批量写入 + FTS5全文检索"""
+
+    def __init__(self, path='data/archive.db', retention=30 * 86400, flush_interval=1.0,
+                 prune_interval=3600, max_pending=100000):
+        self.path = path
+        self.retention = max(0, float(retention))  # 0表示永久保留
+        self.flush_interval = max(0.1, float(flush_interval))
+        self.prune_interval = max(60, float(prune_interval))
+        self.max_pending = max(1000, int(max_pending))
+
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self.running = False
+
+        self._reader = None
+        self._reader_lock = threading.Lock()
+
+        # 统计
+        self.stored = 0
+        self.skipped = 0
+        self.dropped = 0
+        self.pruned = 0
+        self.errors = 0
+        self.queries = 0
+        self.last_query_ms = 0.0
+
+    @classmethod
+    def from_config(cls, config):
+        """从配置创建消息存档"""
+        return cls(
+            path=config.get('archive_path', 'data/archive.db'),
+            retention=config.get('archive_days', 30) * 86400,
+        )
+
+    def _connect(self, check_same_thread=True):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=check_same_thread)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(SCHEMA)
+        return conn
+
+    def start(self):
+        """启动后台写入线程"""
+        if self.running:
+            return
+        self.running = True
+        self._thread = threading.Thread(target=self._run, name='message-archive', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """停止写入线程，提交队列中剩余的消息"""
+        if self.running:
+            self.running = False
+            self._queue.put(None)
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        with self._reader_lock:
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+
+    def add(self, message, chat, phone=None):
+        """存档一条消息 - 只取出需要的字段入队，不做I/O"""
+        if not self.running:
+            return
+        text = message.text or message.message
+        if not text:
+            self.skipped += 1
+            return
+        if self._queue.qsize() >= self.max_pending:
+            self.dropped += 1
+            return
+        date = message.date.timestamp() if message.date is not None else time.time()
+        self._queue.put((message.chat_id, message.id, date, getattr(chat, 'title', '') or '',
+                         message.sender_id, text))
+
+    def _run(self):
+        """后台线程 - 批量提交消息，定期删除过期消息"""
+        conn = None
+        next_prune = time.monotonic() + self.prune_interval
+        stopping = False
+
+        while not stopping:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = False
+
+            batch = []
+            while item is not False:
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    item = False
+
+            try:
+                if conn is None:
+                    conn = self._connect()
+                if batch:
+                    self._write(conn, batch)
+                if self.retention and time.monotonic() >= next_prune:
+                    self._prune(conn)
+                    next_prune = time.monotonic() + self.prune_interval
+            except sqlite3.Error as e:
+                self.errors += 1
+                print(f"写入消息存档失败: {e}")
+                if conn is not None:
+                    conn.close()
+                    conn = None
+
+        if conn is not None:
+            conn.close()
+
+    def _write(self, conn, batch):
+        """一个事务写入一批消息和对应的索引"""
+        with conn:
+            for row in batch:
+                cursor = conn.execute(
+                    'INSERT OR IGNORE INTO messages (chat_id, message_id, date, chat_title, sender_id, text) '
+                    'VALUES (?, ?, ?, ?, ?, ?)', row)
+                if cursor.rowcount:
+                    conn.execute('INSERT INTO messages_fts (rowid, terms) VALUES (?, ?)',
+                                 (cursor.lastrowid, index_terms(row[5])))
+                    self.stored += 1
+
+    def _prune(self, conn):
+        """删除保留期之外的消息和索引"""
+        cutoff = time.time() - self.retention
+        with conn:
+            conn.execute('DELETE FROM messages_fts WHERE rowid IN (SELECT id FROM messages WHERE date < ?)',
+                         (cutoff,))
+            self.pruned += conn.execute('DELETE FROM messages WHERE date < ?', (cutoff,)).rowcount
+
+    def search(self, query, chat=None, days=None, limit=50):
+        """全文检索 - 返回按入库顺序倒序（即大致按时间倒序）的结果列表（可在任意线程调用）
+
+        chat: 群组ID或标题的一部分；days: 只查最近几天
+        按rowid倒序时FTS5可以边扫描边返回，取到limit条就停止，不必对全部命中结果排序
+        """
+        started_at = time.perf_counter()
+        sql = 'SELECT m.chat_id, m.message_id, m.date, m.chat_title, m.sender_id, m.text FROM '
+        conditions = []
+        params = []
+
+        match, single_chars = build_match(query)
+        if match is not None:
+            sql += 'messages_fts f JOIN messages m ON m.id = f.rowid'
+            conditions.append('messages_fts MATCH ?')
+            params.append(match)
+        else:
+            sql += 'messages m'
+        for char in single_chars:
+            # 单个汉字无法走索引，在索引命中的结果上逐个过滤
+            conditions.append('m.text LIKE ?')
+            params.append(f"%{char}%")
+        if match is None and not single_chars and query.strip():
+            # 只有标点等没有可索引词的查询
+            conditions.append('m.text LIKE ?')
+            params.append(f"%{query.strip()}%")
+
+        if chat:
+            chat = str(chat).strip()
+            if chat.lstrip('-').isdigit():
+                conditions.append('m.chat_id = ?')
+                params.append(int(chat))
+            else:
+                conditions.append('m.chat_title LIKE ?')
+                params.append(f"%{chat}%")
+        if days:
+            conditions.append('m.date >= ?')
+            params.append(time.time() - float(days) * 86400)
+
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY f.rowid DESC LIMIT ?' if match is not None else ' ORDER BY m.id DESC LIMIT ?'
+        params.append(int(limit))
+
+        with self._reader_lock:
+            if self._reader is None:
+                self._reader = self._connect(check_same_thread=False)
+            rows = self._reader.execute(sql, params).fetchall()
+
+        self.queries += 1
+        self.last_query_ms = (time.perf_counter() - started_at) * 1000
+        return [
+            {
+                'chat_id': chat_id,
+                'message_id': message_id,
+                'date': date,
+                'chat_title': chat_title,
+                'sender_id': sender_id,
+                'text': text,
+            }
+            for chat_id, message_id, date, chat_title, sender_id, text in rows
+        ]
+
+    def format_stats(self):
+        """格式化统计信息用于日志"""
+        state = '运行中' if self.running else '已停止'
+        return (f"{state}, 已存档 {self.stored} 条, 待写入 {self._queue.qsize()} 条, "
+                f"无文本 {self.skipped} 条, 丢弃 {self.dropped} 条, 清理 {self.pruned} 条, "
+                f"查询 {self.queries} 次 (最近 {self.last_query_ms:.1f}ms), 错误 {self.errors} 次")
+
+
+def format_result(item):
+    """格式化一条检索结果"""
+    date = datetime.fromtimestamp(item['date']).strftime('%Y-%m-%d %H:%M')
+    text = item['text'].replace('\n', ' ')
+    return f"[{date}] {item['chat_title']} (ID:{item['chat_id']}): {text}"
+
+
+def main():
+    from config_manager import ConfigManager
+
+    parser = argparse.ArgumentParser(description="检索本地消息存档")
+    parser.add_argument('query', help="关键词（多个词用空格分隔，需同时出现）")
+    parser.add_argument('--chat', help="群组ID或标题的一部分")
+    parser.add_argument('--days', type=float, help="只查最近几天")
+    parser.add_argument('--limit', type=int, default=20, help="最多返回条数")
+    parser.add_argument('--config', default='config.json', help="配置文件路径")
+    args = parser.parse_args()
+
+    archive = MessageArchive.from_config(ConfigManager(args.config).load_config())
+    results = archive.search(args.query, chat=args.chat, days=args.days, limit=args.limit)
+    for item in results:
+        print(format_result(item))
+    print(f"\n共 {len(results)} 条, 用时 {archive.last_query_ms:.1f}ms")
+    archive.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,475 +1,602 @@
-#!/usr/bin/env python3
-# -*- coding: utf-8 -*-
-"""
-消息监控模块 - 核心的消息处理功能
-修复了消息接收和关键词匹配问题，增加了详细的调试日志
-"""
-
-import asyncio
-import threading
-import telegram
-from datetime import datetime
-from telethon import events
-from tkinter import messagebox
-from telethon import types
-
-
-
-class MessageMonitor:
-    def __init__(self, app):
-        self.app = app
-        self.monitoring_tasks = []
-        self.event_handlers = {}  # 存储每个客户端的事件处理器
-
-    # message_monitor.py
-
-    def start_monitoring(self):
-        """开始监控 - 使用全局事件循环"""
-        try:
-            self.app.log_message("🚀 启动消息监控系统...")
-
-            # 初始化Bot
-            bot_token = self.app.bot_token_var.get().strip()
-            self.app.bot = telegram.Bot(token=bot_token)
-
-            # 为每个选中的账号启动监控
-            active_count = 0
-            for phone in self.app.selected_accounts:
-                if phone in self.app.clients:
-                    client = self.app.clients[phone]
-
-                    # 检查连接状态
-                    if not client.is_connected():
-                        self.app.log_message(f"🔄 账号 {phone} 未连接，尝试重新连接...")
-                        self._reconnect_client(phone, client)
-
-                        # 等待重连
-                        import time
-                        for i in range(5):
-                            time.sleep(1)
-                            if client.is_connected():
-                                self.app.log_message(f"✅ 账号 {phone} 重连成功")
-                                break
-                        else:
-                            self.app.log_message(f"❌ 账号 {phone} 重连超时")
-                            continue
-
-                    # 如果连接正常，启动消息监听
-                    if client.is_connected():
-                        # 在全局事件循环中启动监控
-                        asyncio.run_coroutine_threadsafe(
-                            self._start_client_monitoring(phone, client),
-                            self.app.global_loop
-                        )
-                        active_count += 1
-                        self.app.log_message(f"✅ 账号 {phone} 监控已启动")
-                    else:
-                        self.app.log_message(f"❌ 账号 {phone} 连接失败")
-
-            if active_count == 0:
-                raise Exception("没有可用的已连接账号，请重新连接")
-
-            self.app.log_message(f"🎯 成功启动 {active_count} 个账号的监控")
-            self.app.log_message(f"📤 转发目标: {self.app.forward_to_var.get()}")
-
-            # 显示关键词设置
-            keywords = [k.strip() for k in self.app.target_keywords_var.get().split(',') if k.strip()]
-            if keywords:
-                self.app.log_message(f"🔍 监控关键词: {keywords}")
-            else:
-                self.app.log_message("📝 监控所有消息（无关键词限制）")
-
-            self.app.log_message("📱 监控运行中，等待消息...")
-
-            # 启动心跳检测
-            self._start_heartbeat_check()
-
-        except Exception as e:
-            error_msg = str(e)
-            self.app.log_message(f"❌ 监控启动失败: {error_msg}")
-            self.app.stop_monitoring()
-
-
-
-    # 修改 _start_client_monitoring 方法
-    def _start_client_monitoring(self, phone, client):
-        """为单个客户端启动监控"""
-        try:
-            asyncio.set_event_loop(self.app.global_loop)
-            # 移除旧的事件处理器
-            if phone in self.event_handlers:
-                try:
-                    client.remove_event_handler(self.event_handlers[phone])
-                except:
-                    pass
-
-            # 创建新的事件处理器 - 监听所有消息但只处理群组/频道
-            @client.on(events.NewMessage())
-            async def message_handler(event):
-                try:
-                    chat = await event.get_chat()
-                    if isinstance(chat, (types.Chat, types.Channel)):
-                        await self._handle_message(event, phone)
-                except Exception as e:
-                    self.app.root.after(0, lambda: self.app.log_message(f"处理消息错误: {str(e)}"))
-
-            self.event_handlers[phone] = message_handler
-            self.app.log_message(f"👂 账号 {phone} 开始监听消息...")
-
-
-
-        except Exception as e:
-            error_msg = str(e)
-            self.app.root.after(0, lambda msg=error_msg: self.app.log_message(f"❌ 启动账号 {phone} 监控失败: {msg}"))
-
-    def get_account_info(self, phone):
-        """获取账号信息 - 同步方式"""
-        if phone not in self.app.clients:
-            return None
-
-        try:
-            client = self.app.clients[phone]
-            if not client.is_connected():
-                return f"{phone} (未连接)"
-
-            # 使用简单的方式获取信息，避免事件循环冲突
-            return f"{phone} (已连接)"
-
-        except Exception as e:
-            return f"{phone} (状态未知: {str(e)})"
-
-    async def _handle_message(self, event, phone):
-        try:
-            message = event.message
-            if not message:
-                return
-
-            # 获取聊天信息
-            chat = await message.get_chat()
-            chat_title = getattr(chat, 'title', 'Private Chat')
-            chat_id = chat.id
-            message_text = message.text or '[非文本消息]'
-
-            # 调试日志 - 记录所有收到的消息
-            log_msg = f"📨 [{phone}] 收到消息: {chat_title}(ID:{chat_id}) | {message_text[:100]}"
-            self.app.root.after(0, lambda msg=log_msg: self.app.log_message(msg))
-
-            # 1. 检查是否是群组/频道消息
-            if not (chat.is_group or chat.is_channel):
-                self.app.root.after(0, lambda: self.app.log_message(f"⚪ 跳过私聊/非群组消息"))
-                return
-
-            # 2. 检查白名单
-            if self._is_in_whitelist(chat_title, getattr(chat, 'username', ''), chat_id):
-                self.app.root.after(0, lambda: self.app.log_message(f"⚪ 白名单过滤: {chat_title}"))
-                return
-
-            # 3. 检查过滤条件
-            if not self._should_forward_message(message):
-                return
-
-            # 4. 检查关键词
-            if not self._contains_target_keywords(message_text):
-                return
-
-            # 5. 转发消息
-            await self._forward_message(message, phone)
-
-        except Exception as e:
-            error_msg = str(e)  # 捕获错误信息
-            self.app.root.after(0, lambda msg=error_msg: self.app.log_message(f"❗ [{phone}] 处理消息错误: {msg}"))
-
-    def _is_in_whitelist(self, chat_title, chat_username, chat_id):
-        """检查是否在白名单中（需要跳过的群组）"""
-        whitelist_text = self.app.whitelist_groups_var.get().strip()
-        if not whitelist_text:
-            return False
-
-        whitelist = [item.strip() for item in whitelist_text.split(',') if item.strip()]
-
-        for item in whitelist:
-            # 检查用户名匹配
-            if item.startswith('@') and chat_username and item[1:] == chat_username:
-                return True
-            # 检查ID匹配
-            elif (item.startswith('-') or item.isdigit()) and str(chat_id) == item:
-                return True
-            # 检查标题包含匹配
-            elif item and chat_title and item.lower() in chat_title.lower():
-                return True
-
-        return False
-
-    def _should_forward_message(self, message):
-        """检查消息是否应该转发"""
-        # 检查发送者用户名过滤
-        if self.app.filter_username.get():
-            if message.sender and hasattr(message.sender, 'username') and message.sender.username:
-                return False
-
-        # 检查链接过滤
-        if self.app.filter_links.get():
-            text = message.text or ''
-            if 'http' in text or 't.me' in text or 'www.' in text:
-                return False
-
-        # 检查按钮过滤
-        if self.app.filter_buttons.get():
-            if message.reply_markup:
-                return False
-
-        # 检查媒体过滤
-        if self.app.filter_media.get():
-            if message.media or message.document or message.photo:
-                return False
-
-        # 检查转发消息过滤
-        if self.app.filter_forwarded.get():
-            if message.forward:
-                return False
-
-        # 检查过滤关键词
-        filter_keywords_text = self.app.filter_keywords_var.get().strip()
-        if filter_keywords_text and message.text:
-            filter_keywords = [k.strip().lower() for k in filter_keywords_text.split(',') if k.strip()]
-            text_lower = message.text.lower()
-
-            for keyword in filter_keywords:
-                if keyword in text_lower:
-                    return False
-
-        return True
-
-    def _contains_target_keywords(self, text):
-        """检查是否包含目标关键词 - 支持中英文"""
-        if not text:
-            return False
-
-        keywords_text = self.app.target_keywords_var.get().strip()
-        if not keywords_text:
-            return True  # 如果没有设置关键词，则转发所有消息
-
-        keywords = [k.strip() for k in keywords_text.split(',') if k.strip()]
-        if not keywords:
-            return True
-
-        # 准备两个版本用于匹配
-        text_original = text
-        text_lower = text.lower()
-
-        for keyword in keywords:
-            keyword_original = keyword
-            keyword_lower = keyword.lower()
-
-            # 同时检查原文和小写版本
-            if keyword_original in text_original or keyword_lower in text_lower:
-                return True
-
-        return False
-
-    def _is_duplicate_message(self, message, chat_id):
-        """检查是否为重复消息"""
-        message_id = f"{chat_id}_{message.id}"
-        if message_id in self.app.processed_messages:
-            return True
-
-        self.app.processed_messages.add(message_id)
-        return False
-
-    async def _forward_message(self, message, phone):
-        """转发消息 - 根据是否有用户名选择转发方式"""
-        try:
-            forward_to = self.app.forward_to_var.get().strip()
-            sender = message.sender
-
-            # 获取发送者信息
-            sender_info = "Unknown"
-            has_username = False
-
-            if sender:
-                if hasattr(sender, 'username') and sender.username:
-                    sender_info = f"@{sender.username}"
-                    has_username = True
-                elif hasattr(sender, 'first_name'):
-                    sender_info = sender.first_name or "Unknown"
-
-            # 根据需求：有用户名的用Bot发送，没有用户名的直接转发
-            if has_username:
-                # 通过Bot发送
-                chat = await message.get_chat()
-                chat_title = getattr(chat, 'title', 'Private')
-
-                full_message = f"来源: {sender_info}\n群组: {chat_title}\n\n{message.text or '[媒体消息]'}"
-
-                await self.app.bot.send_message(chat_id=forward_to, text=full_message)
-                self.app.root.after(0, lambda: self.app.log_message(f"📤 通过Bot转发成功 (来自 {sender_info})"))
-            else:
-                # 直接转发
-                client = self.app.clients[phone]
-                await client.forward_messages(forward_to, message)
-                self.app.root.after(0, lambda: self.app.log_message(f"📤 直接转发成功 (无用户名用户)"))
-
-        except Exception as e:
-            error_msg = str(e)
-            self.app.root.after(0, lambda msg=error_msg: self.app.log_message(f"❌ 转发失败: {msg}"))
-
-    # 修改 _reconnect_client 方法
-    def _reconnect_client(self, phone, client):
-        """重连客户端 - 使用客户端现有循环"""
-        try:
-            # 获取客户端的事件循环
-            loop = client.loop
-
-            async def reconnect():
-                try:
-                    # 先断开现有连接
-                    if client.is_connected():
-                        await client.disconnect()
-                        self.app.root.after(0, lambda: self.app.log_message(f"🔌 {phone} 已断开旧连接"))
-
-                    await asyncio.sleep(2)  # 等待断开完成
-
-                    # 重新连接
-                    await client.connect()
-
-                    # 验证连接
-                    me = await client.get_me()
-                    username = me.username or me.first_name or "Unknown"
-                    self.app.root.after(0, lambda: self.app.log_message(f"🔄 {phone} ({username}) 重连成功"))
-
-                except Exception as e:
-                    error_msg = str(e)
-                    self.app.root.after(0, lambda: self.app.log_message(f"❌ {phone} 重连失败: {error_msg}"))
-
-            # 在客户端已有的循环中运行
-            asyncio.run_coroutine_threadsafe(reconnect(), loop)
-
-        except Exception as e:
-            error_msg = str(e)  # 捕获错误信息
-            self.app.root.after(0, lambda msg=error_msg: self.app.log_message(f"❌ 重连过程失败: {msg}"))
-
-        # 在新线程中运行重连
-        threading.Thread(target=reconnect_in_thread, daemon=True).start()
-
-    def _start_heartbeat_check(self):
-        """启动心跳检测"""
-
-        def heartbeat_check():
-            import time
-            while self.app.is_running:
-                try:
-                    connected_count = sum(1 for phone in self.app.selected_accounts
-                                          if phone in self.app.clients and self.app.clients[phone].is_connected())
-
-                    if connected_count < len(self.app.selected_accounts):
-                        self.app.root.after(0, lambda: self.app.log_message(
-                            f"⚠️ 连接检查: {connected_count}/{len(self.app.selected_accounts)} 账号在线"))
-
-                    time.sleep(60)  # 每分钟检查一次
-                except Exception as e:
-                    self.app.root.after(0, lambda: self.app.log_message(f"❗ 心跳检查错误: {str(e)}"))
-                    break
-
-        threading.Thread(target=heartbeat_check, daemon=True).start()
-
-    def stop_monitoring(self):
-        """停止监控"""
-        try:
-            # 移除所有事件处理器
-            for phone, handler in self.event_handlers.items():
-                if phone in self.app.clients:
-                    try:
-                        client = self.app.clients[phone]
-                        client.remove_event_handler(handler)
-                        self.app.log_message(f"🛑 停止 {phone} 监控")
-                    except Exception as e:
-                        # 忽略移除处理器时的错误
-                        pass
-
-            self.event_handlers.clear()
-            self.monitoring_tasks.clear()
-
-        except Exception as e:
-            self.app.log_message(f"❌ 停止监控时出错: {str(e)}")
-
-    def send_test_message(self):
-        """发送测试消息"""
-        try:
-            forward_to = self.app.forward_to_var.get().strip()
-            if not forward_to:
-                messagebox.showwarning("警告", "请先设置转发目标群")
-                return
-
-            test_message = "🧪 这是一条测试消息，用于验证Bot转发功能\n时间: " + str(datetime.now())
-
-            def send_test():
-                try:
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-
-                    async def send():
-                        bot_token = self.app.bot_token_var.get().strip()
-                        bot = telegram.Bot(token=bot_token)
-                        await bot.send_message(chat_id=forward_to, text=test_message)
-
-                    loop.run_until_complete(send())
-                    self.app.root.after(0, lambda: self.app.log_message("✅ 测试消息发送成功"))
-
-                except Exception as e:
-                    error_msg = str(e)
-                    self.app.root.after(0, lambda: self.app.log_message(f"❌ 测试消息发送失败: {error_msg}"))
-                finally:
-                    try:
-                        loop.close()
-                    except:
-                        pass
-
-            threading.Thread(target=send_test, daemon=True).start()
-            self.app.log_message("🧪 正在发送测试消息...")
-
-        except Exception as e:
-            self.app.log_message(f"❌ 发送测试消息错误: {str(e)}")
-
-    def test_chinese_keywords(self):
-        """测试中文关键词匹配"""
-        from tkinter import messagebox
-
-        self.app.log_message("=== 测试中文关键词匹配 ===")
-
-        # 获取当前关键词设置
-        keywords_setting = self.app.target_keywords_var.get().strip()
-        keywords = [k.strip() for k in keywords_setting.split(',') if k.strip()]
-
-        self.app.log_message(f"关键词设置: '{keywords_setting}'")
-        self.app.log_message(f"解析结果: {keywords}")
-
-        # 测试各种消息
-        test_cases = [
-            "日本",
-            "今天去日本",
-            "日本料理很好吃",
-            "JAPAN",
-            "japan",
-            "I love Japan",
-            "这是普通消息",
-            "日本精聊群欢迎你",
-            "Hello world",
-            "测试消息"
-        ]
-
-        matched_count = 0
-        for test_msg in test_cases:
-            # 使用相同的匹配逻辑
-            has_match = self._contains_target_keywords(test_msg)
-
-            if has_match:
-                matched_count += 1
-
-            result = "✅匹配" if has_match else "❌无匹配"
-            self.app.log_message(f"  '{test_msg}' -> {result}")
-
-        self.app.log_message(f"=== 测试完成: {matched_count}/{len(test_cases)} 条消息匹配 ===")
-
-        # 显示结果对话框
-        messagebox.showinfo("关键词测试结果",
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+消息监控模块 - 核心的消息处理功能
+修复了消息接收和关键词匹配问题，增加了详细的调试日志
+"""
+
+import asyncio
+import threading
+import time
+import telegram
+from datetime import datetime
+from telethon import events
+try:
+    from tkinter import messagebox
+except ImportError:  # headless模式下没有图形界面
+    messagebox = None
+from telethon import types
+from telethon import utils
+
+from filter_plan import FilterPlan
+from dedup_store import content_fingerprint
+from forward_queue import ForwardQueue
+from send_scheduler import SendScheduler
+from digest_batcher import DigestBatcher
+from entity_cache import EntityCache
+from chat_filter import ChatFilter
+from health_monitor import HealthMonitor
+from gap_recovery import GapRecovery
+from log_sink import ERROR
+
+
+def message_ref(message, phone):
+    """转发记录用的消息定位信息 (chat_id, message_id, phone, 发送时间戳) - 可跨进程传递"""
+    sent_at = message.date.timestamp() if message.date is not None else None
+    return message.chat_id, message.id, phone, sent_at
+
+
+class MessageMonitor:
+    def __init__(self, app):
+        self.app = app
+        self.monitoring_tasks = []
+        self.event_handlers = {}  # 存储每个客户端的事件处理器
+
+        # 编译后的过滤计划 - 设置变化时整体替换，热路径只读
+        self.filter_plan = FilterPlan.from_config(self.app.config)
+
+        # 发送调度器 - 限速、FloodWait处理和失败重试
+        self.send_scheduler = SendScheduler.from_config(self.app, self.app.config)
+
+        # 转发队列 - 匹配与投递解耦
+        self.forward_queue = self._create_forward_queue(self.app.config)
+
+        # 合并发送（可选）- 为None时逐条发送
+        self.digest_batcher = None
+
+        # 每个账号的实体缓存
+        self.entity_caches = {}
+
+        # 连接健康监控 - 断开后自动重连并发布状态快照
+        self.health_monitor = HealthMonitor.from_config(self.app, self.app.config)
+
+        # 断线补收 - 重连成功后拉取断线期间的消息
+        self.gap_recovery = GapRecovery.from_config(self.app, self.app.config, self._process_message)
+        self.health_monitor.on_reconnected(self.gap_recovery.on_reconnected)
+
+        # 每个账号的监听群组集合，以及跟踪加入/退出群组的处理器
+        self.chat_filters = {}
+        self.membership_handlers = {}
+
+    # message_monitor.py
+
+    def start_monitoring(self):
+        """开始监控 - 使用全局事件循环"""
+        try:
+            self.app.log_message("🚀 启动消息监控系统...")
+
+            # 编译过滤计划，更新代理设置快照
+            self.refresh_filter_plan()
+            self.app.network_proxy.refresh_settings()
+
+            # 初始化Bot
+            bot_token = self.app.bot_token_var.get().strip()
+            self.app.bot = telegram.Bot(token=bot_token, request=self.app.http_client.bot_request(
+                self.app.get_current_config(), self.app.network_proxy.get_proxy_config()))
+
+            # 启动转发队列和投递协程
+            if not self.forward_queue.running:
+                config = self.app.get_current_config()
+                self.send_scheduler = SendScheduler.from_config(self.app, config)
+                self.forward_queue = self._create_forward_queue(config)
+                self.digest_batcher = self._create_digest_batcher(config)
+            # 等队列启动完成再注册事件处理器，否则启动期间收到的消息会被拒绝
+            asyncio.run_coroutine_threadsafe(self.forward_queue.start(), self.app.global_loop).result(timeout=10)
+
+            # 为每个选中的账号启动监控（未连接的账号由健康监控在后台重连后再开始监听）
+            active_count = 0
+            for phone in self.app.selected_accounts:
+                client = self.app.clients.get(phone)
+                if client is None:
+                    continue
+
+                if not client.is_connected():
+                    self.app.log_message(f"🔄 账号 {phone} 未连接，将在重连成功后开始监听")
+
+                # 在全局事件循环中启动监控
+                asyncio.run_coroutine_threadsafe(
+                    self._start_client_monitoring(phone, client),
+                    self.app.global_loop
+                )
+                active_count += 1
+                self.app.log_message(f"✅ 账号 {phone} 监控已启动")
+
+            if active_count == 0:
+                raise Exception("没有可用的账号，请先登录")
+
+            self.app.log_message(f"🎯 成功启动 {active_count} 个账号的监控")
+            self.app.log_message(f"📤 转发目标: {self.filter_plan.forward_to}")
+
+            # 显示关键词设置
+            keywords = list(self.filter_plan.target_matcher.keywords)
+            if keywords:
+                self.app.log_message(f"🔍 监控关键词: {keywords}")
+            else:
+                self.app.log_message("📝 监控所有消息（无关键词限制）")
+
+            self.app.log_message("📱 监控运行中，等待消息...")
+
+        except Exception as e:
+            error_msg = str(e)
+            self.app.log_message(f"❌ 监控启动失败: {error_msg}")
+            self.app.stop_monitoring()
+
+
+
+    def get_entity_cache(self, phone):
+        """获取账号的实体缓存"""
+        cache = self.entity_caches.get(phone)
+        if cache is None:
+            cache = EntityCache(
+                ttl=self.app.config.get('entity_cache_ttl', 3600),
+                max_entries=self.app.config.get('entity_cache_size', 5000)
+            )
+            self.entity_caches[phone] = cache
+        return cache
+
+    # 修改 _start_client_monitoring 方法
+    async def _start_client_monitoring(self, phone, client):
+        """为单个客户端启动监控 - 在全局事件循环中运行"""
+        try:
+            # 由健康监控负责断线重连；未连接时等待重连成功
+            self.health_monitor.watch(phone, client)
+            if not client.is_connected():
+                await self.health_monitor.wait_connected(phone)
+
+            cache = self.get_entity_cache(phone)
+
+            # 移除旧的事件处理器
+            self._remove_client_handlers(phone, client)
+
+            # 一次获取对话列表，同时用于预热实体缓存和构建监听群组集合
+            dialogs = [dialog async for dialog in client.iter_dialogs()]
+            warmed = cache.warm_dialogs(dialogs)
+
+            chat_filter = ChatFilter()
+            chat_filter.load_dialogs(dialogs, self.filter_plan)
+            self.chat_filters[phone] = chat_filter
+            self.gap_recovery.seed(phone, dialogs, chat_filter.allowed)
+
+            # 创建新的事件处理器 - 只接收监听集合中的群组/频道，其他更新由Telethon直接丢弃
+            builder = events.NewMessage(chats=chat_filter.initial_chats())
+
+            async def message_handler(event):
+                if not event.is_private:
+                    await self._process_message(event.message, phone, time.monotonic())
+
+            client.add_event_handler(message_handler, builder)
+            await builder.resolve(client)
+            chat_filter.bind(builder)
+            self.event_handlers[phone] = message_handler
+
+            # 加入/退出群组时增量更新监听集合
+            await self._add_membership_handlers(phone, client, chat_filter)
+
+            self.app.root.after(0, lambda: self.app.log_message(
+                f"👂 账号 {phone} 开始监听 {len(chat_filter)}/{len(dialogs)} 个对话 (实体缓存预热 {warmed})"))
+
+        except Exception as e:
+            error_msg = str(e)
+            self.app.root.after(0, lambda msg=error_msg: self.app.log_message(f"❌ 启动账号 {phone} 监控失败: {msg}"))
+
+    async def _add_membership_handlers(self, phone, client, chat_filter):
+        """注册跟踪群组加入/退出和改名的处理器"""
+        me = await client.get_me(input_peer=True)
+        my_id = me.user_id
+        cache = self.get_entity_cache(phone)
+
+        def track(chat):
+            marked_id = utils.get_peer_id(chat)
+            cache.put(marked_id, chat)
+            if chat_filter.add(marked_id, getattr(chat, 'title', ''), getattr(chat, 'username', None),
+                               chat.id, self.filter_plan):
+                self.app.root.after(0, lambda: self.app.log_message(
+                    f"➕ 账号 {phone} 开始监听: {getattr(chat, 'title', marked_id)}"))
+
+        def untrack(marked_id):
+            chat_filter.remove(marked_id)
+            cache.invalidate(marked_id)
+            self.app.root.after(0, lambda: self.app.log_message(f"➖ 账号 {phone} 停止监听: {marked_id}"))
+
+        async def chat_action_handler(event):
+            try:
+                if event.new_title:
+                    # 改名可能影响白名单判断
+                    cache.invalidate(event.chat_id)
+                    track(await event.get_chat())
+                elif my_id in (event.user_ids or []):
+                    if event.user_joined or event.user_added:
+                        track(await event.get_chat())
+                    elif event.user_left or event.user_kicked:
+                        untrack(event.chat_id)
+            except Exception as e:
+                error_msg = str(e)
+                self.app.root.after(0, lambda msg=error_msg: self.app.log_message(f"⚠️ 更新监听群组失败: {msg}"))
+
+        async def channel_update_handler(update):
+            # 加入/退出频道时没有服务消息，只有UpdateChannel
+            try:
+                channel = await client.get_entity(types.PeerChannel(update.channel_id))
+                if getattr(channel, 'left', False):
+                    untrack(utils.get_peer_id(channel))
+                else:
+                    track(channel)
+            except Exception as e:
+                error_msg = str(e)
+                self.app.root.after(0, lambda msg=error_msg: self.app.log_message(f"⚠️ 更新监听频道失败: {msg}"))
+
+        client.add_event_handler(chat_action_handler, events.ChatAction())
+        client.add_event_handler(channel_update_handler, events.Raw(types.UpdateChannel))
+        self.membership_handlers[phone] = [chat_action_handler, channel_update_handler]
+
+    def _remove_client_handlers(self, phone, client):
+        """移除账号的消息处理器和群组跟踪处理器"""
+        handlers = list(self.membership_handlers.pop(phone, []))
+        if phone in self.event_handlers:
+            handlers.append(self.event_handlers.pop(phone))
+        for handler in handlers:
+            try:
+                client.remove_event_handler(handler)
+            except:
+                pass
+
+    def _rebuild_chat_filters(self):
+        """过滤计划变化后重新计算各账号的监听集合（不访问网络）"""
+        plan = self.filter_plan
+        for chat_filter in list(self.chat_filters.values()):
+            chat_filter.rebuild(plan)
+
+    def get_account_info(self, phone):
+        """获取账号信息 - 同步方式"""
+        if phone not in self.app.clients:
+            return None
+
+        try:
+            client = self.app.clients[phone]
+            if not client.is_connected():
+                return f"{phone} (未连接)"
+
+            # 使用简单的方式获取信息，避免事件循环冲突
+            return f"{phone} (已连接)"
+
+        except Exception as e:
+            return f"{phone} (状态未知: {str(e)})"
+
+    async def _process_message(self, message, phone, received_at, recovered=False):
+        """实时消息和断线补收的消息共用的入口"""
+        try:
+            self.gap_recovery.note(phone, message.chat_id, message.id)
+            self._record_event('recovered' if recovered else 'received', message, phone,
+                               age_ms=self._message_age_ms(message))
+
+            # 多个账号在同一个群时，同一条消息只处理一次（无需网络请求）
+            if self._is_duplicate_message(message, message.chat_id):
+                self._record_event('filtered', message, phone, reason='duplicate')
+                return
+            # 重启前已经转发过的消息（断线补收或重新开始监控时可能再次收到）
+            if self.app.forward_ledger.contains(message.chat_id, message.id):
+                self._record_event('filtered', message, phone, reason='forwarded')
+                return
+
+            chat = await self.get_entity_cache(phone).get_chat(message)
+            if isinstance(chat, (types.Chat, types.Channel)):
+                await self._handle_message(message, phone, chat, received_at)
+                # 存档所有群组消息（未开启时直接返回）
+                self.app.message_archive.add(message, chat, phone)
+        except Exception as e:
+            self.app.log_message(f"处理消息错误: {str(e)}", ERROR)
+
+    async def _handle_message(self, message, phone, chat=None, received_at=None):
+        if received_at is None:
+            received_at = time.monotonic()
+        try:
+            if not message:
+                return
+
+            # 获取聊天信息（优先使用实体缓存）
+            cache = self.get_entity_cache(phone)
+            if chat is None:
+                chat = await cache.get_chat(message)
+            chat_title = getattr(chat, 'title', 'Private Chat')
+            chat_id = chat.id
+            message_text = message.text or '[非文本消息]'
+
+            # 调试日志 - 记录所有收到的消息（调试级别关闭时不格式化）
+            self.app.log_debug("📨 [%s] 收到消息: %s(ID:%s) | %s", phone, chat_title, chat_id, message_text[:100])
+
+            # 1. 检查是否是群组/频道消息
+            if not (message.is_group or message.is_channel):
+                self.app.log_debug("⚪ 跳过私聊/非群组消息")
+                self._record_event('filtered', message, phone, reason='not_group')
+                return
+
+            # 同一条消息使用同一份过滤计划快照
+            plan = self.filter_plan
+
+            # 2. 检查白名单
+            if plan.is_in_whitelist(chat_title, getattr(chat, 'username', ''), chat_id):
+                self.app.log_debug("⚪ 白名单过滤: %s", chat_title)
+                self._record_event('filtered', message, phone, reason='whitelist')
+                return
+
+            # 3. 检查过滤条件（只有按用户名过滤时才需要解析发送者）
+            sender = await cache.get_sender(message) if plan.filter_username else None
+            if not plan.should_forward(message, sender):
+                self._record_event('filtered', message, phone, reason='filter')
+                return
+
+            # 4. 检查关键词
+            if not plan.contains_target_keywords(message_text):
+                self._record_event('filtered', message, phone, reason='keywords')
+                return
+
+            # 5. 跨群内容去重（可选）
+            if plan.dedup_content and self._is_duplicate_content(message):
+                self.app.log_debug("⚪ 重复内容已跳过: %s", chat_title)
+                self._record_event('filtered', message, phone, reason='content_duplicate')
+                return
+
+            # 6. 放入转发队列，由投递协程异步转发
+            queued = self.forward_queue.put(message, phone)
+            self._record_event('matched', message, phone, queued=queued,
+                               process_ms=round((time.monotonic() - received_at) * 1000, 2))
+
+        except Exception as e:
+            self.app.log_message(f"❗ [{phone}] 处理消息错误: {str(e)}", ERROR)
+
+    def _create_forward_queue(self, config):
+        """根据配置创建转发队列"""
+        return ForwardQueue(
+            self.app,
+            self._forward_message,
+            workers=config.get('forward_workers', 4),
+            maxsize=config.get('forward_queue_size', 1000),
+            overflow=config.get('forward_overflow', 'drop'),
+            spill_max_attempts=config.get('forward_spill_max_attempts', 3),
+        )
+
+    def _create_digest_batcher(self, config):
+        """根据配置创建合并发送器，未开启时返回None"""
+        if not config.get('digest_mode', False):
+            return None
+        return DigestBatcher(
+            self.app,
+            self.send_scheduler,
+            window=config.get('digest_window', 2.0),
+            max_messages=config.get('digest_max_messages', 20),
+        )
+
+    async def _stop_delivery(self):
+        """停止投递 - 先停止队列，再发出合并缓冲中的剩余消息"""
+        await self.forward_queue.stop()
+        if self.digest_batcher is not None:
+            await self.digest_batcher.flush_all()
+
+    def refresh_filter_plan(self, config=None):
+        """重新编译过滤计划 - 需在主线程调用（读取界面变量）"""
+        if config is None:
+            config = self.app.get_current_config()
+        self.filter_plan = FilterPlan.from_config(config)
+
+        # 白名单可能变化，在事件循环中更新监听群组集合
+        if self.chat_filters:
+            self.app.global_loop.call_soon_threadsafe(self._rebuild_chat_filters)
+        return self.filter_plan
+
+    def get_keyword_matcher(self):
+        """获取当前过滤计划中的目标关键词自动机"""
+        return self.filter_plan.target_matcher
+
+    def _record_event(self, name, message, phone, **fields):
+        """写入结构化事件日志（只入队，不阻塞事件循环）"""
+        self.app.event_logger.record(name, phone=phone, chat_id=message.chat_id, message_id=message.id, **fields)
+
+    def _mark_forwarded(self, message, phone, route):
+        """记录转发成功 - 写入事件日志和持久转发记录"""
+        self.app.mark_forwarded(message_ref(message, phone), route)
+
+    @staticmethod
+    def _message_age_ms(message):
+        """消息从发出到现在经过的毫秒数（端到端延迟）"""
+        if message.date is None:
+            return None
+        return round((time.time() - message.date.timestamp()) * 1000, 1)
+
+    def _is_duplicate_message(self, message, chat_id):
+        """检查是否为重复消息 - 与账号无关，按(chat_id, message_id)判断"""
+        return self.app.processed_messages.check_and_add((int(chat_id), int(message.id)))
+
+    def _is_duplicate_content(self, message):
+        """检查是否为其他群组已转发过的相同内容"""
+        fingerprint = content_fingerprint(message)
+        if fingerprint is None:
+            return False
+        return self.app.content_dedup.check_and_add(fingerprint)
+
+    async def _forward_message(self, message, phone):
+        """转发消息 - 根据是否有用户名选择转发方式
+
+        发送经过限速调度器，限流和临时错误会自动重试；最终失败时抛出异常，由转发队列处理
+        """
+        forward_to = self.filter_plan.forward_to
+        cache = self.get_entity_cache(phone)
+        sender = await cache.get_sender(message)
+
+        # 获取发送者信息
+        sender_info = "Unknown"
+        has_username = False
+
+        if sender:
+            if hasattr(sender, 'username') and sender.username:
+                sender_info = f"@{sender.username}"
+                has_username = True
+            elif hasattr(sender, 'first_name'):
+                sender_info = sender.first_name or "Unknown"
+
+        batcher = self.digest_batcher
+
+        # 根据需求：有用户名的用Bot发送，没有用户名的直接转发
+        if has_username:
+            # 通过Bot发送
+            chat = await cache.get_chat(message)
+            chat_title = getattr(chat, 'title', 'Private')
+
+            # 合并发送模式下，相册消息收齐后作为一组媒体发送
+            if batcher is not None and message.grouped_id and (message.photo or message.document):
+                header = f"来源: {sender_info}\n群组: {chat_title}"
+                batcher.add_album_item(forward_to, header, message, phone, message_ref(message, phone))
+                return
+
+            full_message = f"来源: {sender_info}\n群组: {chat_title}\n\n{message.text or '[媒体消息]'}"
+
+            # 合并发送模式下先缓冲，窗口到期后一起发送（发出后由合并发送器写入转发记录）
+            if batcher is not None:
+                batcher.add_text(forward_to, full_message, message_ref(message, phone))
+                return
+
+            if await self._deliver_bot(message, phone, forward_to, full_message):
+                self.app.log_message(f"📤 通过Bot转发成功 (来自 {sender_info})")
+                self._mark_forwarded(message, phone, 'bot')
+        else:
+            # 直接转发
+            if await self._deliver_direct(message, phone, forward_to):
+                self.app.log_message("📤 直接转发成功 (无用户名用户)")
+                self._mark_forwarded(message, phone, 'user')
+
+    async def _deliver_bot(self, message, phone, forward_to, text):
+        """通过Bot发送一条转发文本，返回是否已发出（分片模式下由投递进程发送并记录）"""
+        await self.send_scheduler.send(
+            'bot', 'bot', forward_to,
+            lambda: self.app.bot.send_message(chat_id=forward_to, text=text),
+            defer=True
+        )
+        return True
+
+    async def _deliver_direct(self, message, phone, forward_to):
+        """用收到消息的账号直接转发，返回是否已发出（分片模式下先经投递进程去重）"""
+        client = self.app.clients[phone]
+        await self.send_scheduler.send(
+            'user', phone, forward_to,
+            lambda: client.forward_messages(forward_to, message),
+            defer=True
+        )
+        return True
+
+    def stop_monitoring(self):
+        """停止监控 - 返回停止转发队列的future（队列未运行时为None）"""
+        try:
+            # 移除所有事件处理器
+            for phone in set(self.event_handlers) | set(self.membership_handlers):
+                if phone in self.app.clients:
+                    self._remove_client_handlers(phone, self.app.clients[phone])
+                    self.app.log_message(f"🛑 停止 {phone} 监控")
+
+            self.event_handlers.clear()
+            self.membership_handlers.clear()
+            self.chat_filters.clear()
+            self.monitoring_tasks.clear()
+
+            # 停止连接健康监控和断线补收
+            self.app.global_loop.call_soon_threadsafe(self.health_monitor.stop)
+            self.app.global_loop.call_soon_threadsafe(self.gap_recovery.stop)
+
+            # 停止转发队列
+            if self.forward_queue.running:
+                return asyncio.run_coroutine_threadsafe(self._stop_delivery(), self.app.global_loop)
+
+        except Exception as e:
+            self.app.log_message(f"❌ 停止监控时出错: {str(e)}")
+
+    def send_test_message(self):
+        """发送测试消息"""
+        try:
+            forward_to = self.app.forward_to_var.get().strip()
+            if not forward_to:
+                messagebox.showwarning("警告", "请先设置转发目标群")
+                return
+
+            test_message = "🧪 这是一条测试消息，用于验证Bot转发功能\n时间: " + str(datetime.now())
+
+            def send_test():
+                try:
+                    loop = asyncio.new_event_loop()
+                    asyncio.set_event_loop(loop)
+
+                    async def send():
+                        bot_token = self.app.bot_token_var.get().strip()
+                        bot = telegram.Bot(token=bot_token, request=self.app.http_client.bot_request(
+                            self.app.get_current_config(), self.app.network_proxy.get_proxy_config()))
+                        await bot.send_message(chat_id=forward_to, text=test_message)
+
+                    loop.run_until_complete(send())
+                    self.app.root.after(0, lambda: self.app.log_message("✅ 测试消息发送成功"))
+
+                except Exception as e:
+                    error_msg = str(e)
+                    self.app.root.after(0, lambda: self.app.log_message(f"❌ 测试消息发送失败: {error_msg}"))
+                finally:
+                    try:
+                        loop.close()
+                    except:
+                        pass
+
+            threading.Thread(target=send_test, daemon=True).start()
+            self.app.log_message("🧪 正在发送测试消息...")
+
+        except Exception as e:
+            self.app.log_message(f"❌ 发送测试消息错误: {str(e)}")
+
+    def test_chinese_keywords(self):
+        """测试中文关键词匹配"""
+        from tkinter import messagebox
+
+        self.app.log_message("=== 测试中文关键词匹配 ===")
+
+        # 获取当前关键词设置
+        plan = self.refresh_filter_plan()
+        keywords_setting = self.app.target_keywords_var.get().strip()
+        keywords = list(plan.target_matcher.keywords)
+
+        self.app.log_message(f"关键词设置: '{keywords_setting}'")
+        self.app.log_message(f"解析结果: {keywords}")
+
+        # 测试各种消息
+        test_cases = [
+            "日本",
+            "今天去日本",
+            "日本料理很好吃",
+            "JAPAN",
+            "japan",
+            "I love Japan",
+            "这是普通消息",
+            "日本精聊群欢迎你",
+            "Hello world",
+            "测试消息"
+        ]
+
+        matched_count = 0
+        for test_msg in test_cases:
+            # 使用相同的匹配逻辑
+            has_match = plan.contains_target_keywords(test_msg)
+
+            if has_match:
+                matched_count += 1
+
+            result = "✅匹配" if has_match else "❌无匹配"
+            self.app.log_message(f"  '{test_msg}' -> {result}")
+
+        self.app.log_message(f"=== 测试完成: {matched_count}/{len(test_cases)} 条消息匹配 ===")
+
+        # 显示结果对话框
+        messagebox.showinfo("关键词测试结果",
                             f"测试完成！\n\n关键词: {keywords}\n匹配: {matched_count}/{len(test_cases)} 条消息\n\n详细结果请查看日志")
\ No newline at end of file
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+监控核心 - 图形界面和无界面(headless)模式共用的状态与功能模块
+配置、去重表、日志、账号管理和消息监控都在这里创建，界面只是其上的一层前端
+"""
+
+import asyncio
+import sys
+import time
+
+from network_proxy import NetworkProxy
+from account_manager import AccountManager
+from message_monitor import MessageMonitor
+from config_manager import ConfigManager
+from dedup_store import DedupStore
+from log_sink import LogSink, DEBUG, INFO
+from event_logger import EventLogger
+from forward_ledger import ForwardLedger
+from message_archive import MessageArchive
+from http_client import HttpClient
+from loop_backend import new_event_loop
+
+
+class MonitorCore:
+    """监控核心 - 子类需要提供root（带after方法）"""
+
+    def __init__(self, config_file="config.json", config_overrides=None):
+        # 如果是Windows系统，设置事件循环策略
+        if sys.platform == 'win32':
+            asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+        # 数据存储
+        self.clients = {}  # 存储已登录的客户端
+        self.selected_accounts = []  # 选中的账号列表
+        self.is_running = False
+        self.bot = None
+
+        # 初始化功能模块
+        self.config_manager = ConfigManager(config_file)
+        self.config = self.config_manager.load_config()
+        # 覆盖项（例如分片工作进程的账号列表）优先于配置文件
+        self.config_overrides = dict(config_overrides or {})
+        self.config.update(self.config_overrides)
+
+        # 创建全局事件循环（可选uvloop）
+        self.global_loop, self.loop_backend = new_event_loop(self.config.get('event_loop', 'asyncio'))
+
+        # 防重复转发 - 有界去重表
+        self.processed_messages = DedupStore(
+            ttl=self.config.get('dedup_ttl', 3600),
+            max_entries=self.config.get('dedup_max_entries', 100000)
+        )
+        # 跨群内容去重 - 相同内容的转载只转发一次
+        self.content_dedup = DedupStore(
+            ttl=self.config.get('dedup_content_ttl', 600),
+            max_entries=self.config.get('dedup_max_entries', 100000)
+        )
+
+        # 已转发消息的持久记录 - 重启后不重复转发
+        self.forward_ledger = ForwardLedger.from_config(self.config)
+        if self.config.get('forward_ledger_enabled', True):
+            self.forward_ledger.start()
+
+        # 本地消息存档（可选）- 收到的群组消息写入全文索引
+        self.message_archive = MessageArchive.from_config(self.config)
+        if self.config.get('archive_enabled', False):
+            self.message_archive.start()
+
+        # 日志缓冲 - 任意线程写入，由前端定时批量输出
+        self.log_sink = LogSink(
+            level=LogSink.parse_level(self.config.get('log_level', 'INFO')),
+            max_lines=self.config.get('log_max_lines', 5000),
+            flush_interval=self.config.get('log_flush_interval', 100)
+        )
+
+        # 结构化事件日志（JSON Lines，后台线程写入）
+        self.event_logger = EventLogger.from_config(self.config)
+        if self.config.get('event_log_enabled', True):
+            self.event_logger.start()
+
+        # 共享HTTP连接池 - Bot API查询、代理测试和网络诊断复用长连接
+        self.http_client = HttpClient.from_config(self.config)
+
+        self.network_proxy = NetworkProxy(self)
+        self.account_manager = AccountManager(self)
+        self.message_monitor = MessageMonitor(self)
+
+        requested = self.config.get('event_loop', 'asyncio')
+        if requested != self.loop_backend:
+            self.log_message(f"⚠️ 事件循环 {requested} 不可用，已回退到 {self.loop_backend}")
+        else:
+            self.log_message(f"⚙️ 事件循环: {self.loop_backend}")
+
+    def log_message(self, message, level=INFO):
+        """添加日志消息 - 线程安全，由日志缓冲定时批量输出"""
+        self.log_sink.emit(message, level)
+
+    def log_debug(self, message, *args):
+        """调试日志 - 参数在刷新时才格式化，调试级别关闭时直接丢弃"""
+        self.log_sink.emit(message, DEBUG, args)
+
+    def get_current_config(self):
+        """当前生效的配置"""
+        return dict(self.config)
+
+    def mark_forwarded(self, ref, route):
+        """记录转发成功 - 写入持久转发记录和事件日志，必须在消息真正发出后调用
+
+        ref为(chat_id, message_id, phone, 消息发送时间戳或None)，见message_monitor.message_ref
+        """
+        chat_id, message_id, phone, sent_at = ref
+        self.forward_ledger.record(chat_id, message_id, route)
+        age_ms = round((time.time() - sent_at) * 1000, 1) if sent_at is not None else None
+        self.event_logger.record('forwarded', phone=phone, chat_id=chat_id, message_id=message_id,
+                                 route=route, age_ms=age_ms)
+
+    def log_stats(self):
+        """输出各模块的运行统计"""
+        self.log_message(f"🔁 去重统计: {self.processed_messages.format_stats()}")
+        self.log_message(f"🔁 内容去重: {self.content_dedup.format_stats()}")
+        self.log_message(f"📒 转发记录: {self.forward_ledger.format_stats()}")
+        if self.message_archive.running:
+            self.log_message(f"🗄️ 消息存档: {self.message_archive.format_stats()}")
+        self.log_message(f"📮 转发队列: {self.message_monitor.forward_queue.format_stats()}")
+        self.log_message(f"🚦 发送调度: {self.message_monitor.send_scheduler.format_stats()}")
+        for phone, cache in self.message_monitor.entity_caches.items():
+            self.log_message(f"🗂️ 实体缓存 {phone}: {cache.format_stats()}")
+        if self.message_monitor.digest_batcher is not None:
+            self.log_message(f"📦 合并发送: {self.message_monitor.digest_batcher.format_stats()}")
+        self.log_message(f"📝 日志缓冲: {self.log_sink.format_stats()}")
+        self.log_message(f"🗒️ 事件日志: {self.event_logger.format_stats()}")
+        self.log_message(f"🧩 断线补收: {self.message_monitor.gap_recovery.format_stats()}")
+        if self.network_proxy.proxy_pool is not None:
+            for line in self.network_proxy.proxy_pool.format_stats():
+                self.log_message(f"🌐 代理池: {line}")
+        self.log_message(f"🔌 HTTP连接池: {self.http_client.format_stats()}")
+        for line in self.network_proxy.dc_latency.format_stats():
+            self.log_message(f"🛰️ DC延迟: {line}")
+        for line in self.message_monitor.health_monitor.format_snapshot():
+            self.log_message(f"💓 连接状态: {line}")
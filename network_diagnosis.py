@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+网络诊断模块 - 并发运行所有互不依赖的探测，生成带每项往返时间的诊断报告
+报告按TTL缓存：重复点击诊断或启动检查直接复用，正在进行的诊断由所有调用方共享
+"""
+
+import asyncio
+import time
+
+from proxy_probe import tcp_connect
+from dc_latency import DC_ADDRESSES
+from http_client import HttpClient
+
+
+BASIC_URLS = ['https://www.baidu.com']
+TELEGRAM_URLS = [
+    'https://api.telegram.org',
+    'https://web.telegram.org',
+    'https://core.telegram.org',
+]
+# Telegram的MTProto数据中心
+MTPROTO_SERVERS = [(f'DC{dc_id}', host, port) for dc_id, (host, port) in DC_ADDRESSES.items()]
+
+
+class ProbeResult:
+    """一项探测结果"""
+
+    __slots__ = ('category', 'name', 'ok', 'rtt', 'detail')
+
+    def __init__(self, category, name, ok, rtt=None, detail=''):
+        self.category = category  # basic / telegram / dns / proxy_port / proxy / mtproto
+        self.name = name
+        self.ok = ok
+        self.rtt = rtt            # 秒，失败时为None
+        self.detail = detail
+
+    def as_dict(self):
+        return {
+            'category': self.category,
+            'name': self.name,
+            'ok': self.ok,
+            'rtt_ms': round(self.rtt * 1000, 1) if self.rtt is not None else None,
+            'detail': self.detail,
+        }
+
+    def format(self):
+        mark = '✓' if self.ok else '✗'
+        rtt = f" ({self.rtt * 1000:.0f}ms)" if self.rtt is not None else ''
+        detail = f": {self.detail}" if self.detail else ''
+        return f"{mark} {self.name}{rtt}{detail}"
+
+
+class DiagnosisReport:
+    """一次诊断的全部结果和结论"""
+
+    def __init__(self, results, proxy, started_at, elapsed):
+        self.results = results
+        self.proxy = proxy            # (host, port) 或 None
+        self.created_at = started_at  # monotonic
+        self.timestamp = time.time()
+        self.elapsed = elapsed
+
+    def by_category(self, category):
+        return [result for result in self.results if result.category == category]
+
+    def any_ok(self, category):
+        return any(result.ok for result in self.by_category(category))
+
+    def best_proxy_type(self):
+        """能连接Telegram的代理类型中延迟最低的一个"""
+        working = [result for result in self.by_category('proxy') if result.ok]
+        if not working:
+            return None
+        return min(working, key=lambda result: result.rtt).name.split()[0]
+
+    def conclusions(self):
+        """根据各项结果给出结论"""
+        lines = []
+        if not self.any_ok('basic'):
+            lines.append("✗ 基本网络连接失败")
+        if not self.any_ok('dns'):
+            lines.append("✗ DNS解析失败，可能需要更换DNS或使用代理")
+        if self.any_ok('telegram'):
+            lines.append("✓ 部分Telegram服务可直连，但可能需要特定配置")
+        else:
+            lines.append("✗ 无法直连任何Telegram服务，必须使用代理")
+        if self.proxy is not None:
+            if not self.any_ok('proxy_port'):
+                lines.append(f"✗ 代理端口 {self.proxy[0]}:{self.proxy[1]} 无法访问，请检查Clash是否运行，端口是否正确")
+            else:
+                best = self.best_proxy_type()
+                lines.append(f"建议使用: {best} 代理" if best else "所有代理配置都无法连接Telegram")
+        if self.any_ok('mtproto'):
+            lines.append("MTProto连接正常，可能是Telethon配置问题")
+        else:
+            lines.append("所有MTProto服务器都无法直连，必须使用代理")
+        return lines
+
+    def format_lines(self):
+        """格式化报告，返回多行文本列表"""
+        lines = [f"=== 网络诊断报告 (并发探测 {len(self.results)} 项, 用时 {self.elapsed:.1f} 秒) ==="]
+        lines.extend(result.format() for result in self.results)
+        lines.append("--- 结论 ---")
+        lines.extend(self.conclusions())
+        return lines
+
+    def as_dict(self):
+        return {
+            'timestamp': self.timestamp,
+            'elapsed': round(self.elapsed, 3),
+            'proxy': list(self.proxy) if self.proxy else None,
+            'results': [result.as_dict() for result in self.results],
+            'conclusions': self.conclusions(),
+        }
+
+
+def _proxy_config(proxy_type, host, port):
+    return {'proxy_type': proxy_type.lower(), 'addr': host, 'port': port}
+
+
+async def _timed(category, name, probe):
+    """运行一项探测并计时 - probe为协程，返回(是否成功, 说明)"""
+    started_at = time.perf_counter()
+    try:
+        ok, detail = await probe
+    except Exception as e:
+        return ProbeResult(category, name, False, None, str(e) or type(e).__name__)
+    rtt = time.perf_counter() - started_at
+    return ProbeResult(category, name, ok, rtt if ok else None, detail)
+
+
+async def run_diagnosis(proxy=None, timeout=10.0, http_client=None):
+    """并发运行所有探测，返回DiagnosisReport；proxy为(host, port)时同时测试代理"""
+    loop = asyncio.get_running_loop()
+    started_at = time.monotonic()
+    http_client = http_client or HttpClient()
+
+    async def http_get(url, proxy_config=None):
+        # requests是阻塞调用，放到线程池中并发执行
+        response = await loop.run_in_executor(
+            None, lambda: http_client.get(url, proxy_config, timeout=timeout))
+        return response.status_code < 500, f"HTTP {response.status_code}"
+
+    async def resolve(host):
+        infos = await asyncio.wait_for(loop.getaddrinfo(host, 443, proto=6), timeout)
+        addresses = sorted({info[4][0] for info in infos})
+        return True, ', '.join(addresses)
+
+    async def connect(host, port):
+        await tcp_connect(host, port, timeout)
+        return True, ''
+
+    probes = [_timed('basic', f"基本网络 {url}", http_get(url)) for url in BASIC_URLS]
+    probes += [_timed('telegram', f"直连 {url}", http_get(url)) for url in TELEGRAM_URLS]
+    probes.append(_timed('dns', "DNS解析 api.telegram.org", resolve('api.telegram.org')))
+    probes += [_timed('mtproto', f"MTProto {dc} {host}:{port}", connect(host, port))
+               for dc, host, port in MTPROTO_SERVERS]
+
+    if proxy is not None:
+        host, port = proxy
+        probes.append(_timed('proxy_port', f"代理端口 {host}:{port}", connect(host, port)))
+        for proxy_type in ('HTTP', 'SOCKS5'):
+            probes.append(_timed('proxy', f"{proxy_type} 代理连接Telegram",
+                                 http_get('https://api.telegram.org', _proxy_config(proxy_type, host, port))))
+
+    results = await asyncio.gather(*probes)
+    return DiagnosisReport(list(results), proxy, started_at, time.monotonic() - started_at)
+
+
+class NetworkDiagnosis:
+    """带TTL缓存的网络诊断 - 必须在全局事件循环中使用"""
+
+    def __init__(self, ttl=300.0, timeout=10.0, http_client=None):
+        self.ttl = float(ttl)
+        self.timeout = float(timeout)
+        self.http_client = http_client
+        self.report = None
+        self._running = None        # 正在进行的诊断任务
+        self._running_proxy = None
+
+        # 统计
+        self.runs = 0
+        self.cache_hits = 0
+
+    @classmethod
+    def from_config(cls, config, http_client=None):
+        return cls(
+            ttl=config.get('diagnosis_cache_ttl', 300),
+            timeout=config.get('diagnosis_timeout', 10),
+            http_client=http_client,
+        )
+
+    def cached(self, proxy=None):
+        """未过期且代理设置相同的报告，没有时返回None"""
+        report = self.report
+        if report is None or report.proxy != proxy:
+            return None
+        if time.monotonic() - report.created_at > self.ttl:
+            return None
+        return report
+
+    async def get_report(self, proxy=None, force=False):
+        """获取诊断报告 - 优先使用缓存，同时发起的请求共用一次诊断"""
+        if not force:
+            report = self.cached(proxy)
+            if report is not None:
+                self.cache_hits += 1
+                return report
+
+        task = self._running
+        if task is None or task.done() or self._running_proxy != proxy:
+            task = asyncio.ensure_future(run_diagnosis(proxy, self.timeout, self.http_client))
+            self._running = task
+            self._running_proxy = proxy
+            self.runs += 1
+        else:
+            self.cache_hits += 1
+
+        report = await asyncio.shield(task)
+        self.report = report
+        return report
@@ -1,307 +1,325 @@
-#!/usr/bin/env python3
-# -*- coding: utf-8 -*-
-"""
-网络代理模块 - 处理代理相关功能
-"""
-
-import threading
-import socket
-import requests
-from tkinter import messagebox
-
-
-class NetworkProxy:
-    def __init__(self, app):
-        self.app = app
-
-    def get_proxy_config(self):
-        """获取代理配置"""
-        if not self.app.use_proxy.get():
-            return None
-
-        proxy_type = self.app.proxy_type_var.get()
-        proxy_host = self.app.proxy_host_var.get().strip()
-        proxy_port = self.app.proxy_port_var.get().strip()
-
-        if not proxy_host or not proxy_port:
-            return None
-
-        try:
-            port = int(proxy_port)
-            if proxy_type == 'HTTP':
-                return {
-                    'proxy_type': 'http',
-                    'addr': proxy_host,
-                    'port': port
-                }
-            elif proxy_type == 'SOCKS5':
-                return {
-                    'proxy_type': 'socks5',
-                    'addr': proxy_host,
-                    'port': port
-                }
-        except ValueError:
-            return None
-
-        return None
-
-    def test_proxy(self):
-        """测试代理连接"""
-        proxy_config = self.get_proxy_config()
-        if not proxy_config:
-            messagebox.showwarning("警告", "请先配置代理信息")
-            return
-
-        self.app.log_message(f"正在测试代理连接 {proxy_config['addr']}:{proxy_config['port']}...")
-        threading.Thread(target=self._test_proxy_async, args=(proxy_config,)).start()
-
-    def _test_proxy_async(self, proxy_config):
-        """异步测试代理"""
-        try:
-            proxies = {}
-            if proxy_config['proxy_type'] == 'http':
-                proxies = {
-                    'http': f"http://{proxy_config['addr']}:{proxy_config['port']}",
-                    'https': f"http://{proxy_config['addr']}:{proxy_config['port']}"
-                }
-            elif proxy_config['proxy_type'] == 'socks5':
-                proxies = {
-                    'http': f"socks5://{proxy_config['addr']}:{proxy_config['port']}",
-                    'https': f"socks5://{proxy_config['addr']}:{proxy_config['port']}"
-                }
-
-            response = requests.get('https://api.telegram.org', proxies=proxies, timeout=10)
-            if response.status_code == 200:
-                self.app.root.after(0, lambda: self.app.log_message("代理连接测试成功！"))
-                self.app.root.after(0, lambda: messagebox.showinfo("成功", "代理连接测试成功！"))
-            else:
-                self.app.root.after(0, lambda: self.app.log_message(f"代理连接测试失败，状态码: {response.status_code}"))
-
-        except Exception as e:
-            error_msg = str(e)  # 捕获错误信息
-            self.app.root.after(0, lambda msg=error_msg: self.app.log_message(f"代理连接测试失败: {msg}"))
-            self.app.root.after(0, lambda msg=error_msg: messagebox.showerror("测试失败", f"代理连接测试失败:\n{msg}"))
-
-    def scan_proxy_ports(self):
-        """扫描常见的代理端口"""
-        self.app.log_message("开始扫描常见代理端口...")
-        threading.Thread(target=self._scan_proxy_ports_async).start()
-
-    def _scan_proxy_ports_async(self):
-        """异步扫描代理端口"""
-        common_ports = [7890, 7891, 7892, 7893, 8080, 8081, 1080, 1081, 3128, 8888, 9090]
-        working_ports = []
-
-        self.app.root.after(0, lambda: self.app.log_message("=== 开始端口扫描 ==="))
-
-        for port in common_ports:
-            try:
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                sock.settimeout(2)
-                result = sock.connect_ex(('127.0.0.1', port))
-                sock.close()
-
-                if result == 0:
-                    self.app.root.after(0, lambda p=port: self.app.log_message(f"✓ 端口 {p} 开放"))
-
-                    # 测试HTTP代理
-                    try:
-                        proxies = {
-                            'http': f'http://127.0.0.1:{port}',
-                            'https': f'http://127.0.0.1:{port}'
-                        }
-                        response = requests.get('https://api.telegram.org', proxies=proxies, timeout=5)
-                        if response.status_code == 200:
-                            working_ports.append(('HTTP', port))
-                            self.app.root.after(0, lambda p=port: self.app.log_message(f"✓ 端口 {p} - HTTP代理可用"))
-                    except:
-                        pass
-
-                    # 测试SOCKS5代理
-                    try:
-                        proxies = {
-                            'http': f'socks5://127.0.0.1:{port}',
-                            'https': f'socks5://127.0.0.1:{port}'
-                        }
-                        response = requests.get('https://api.telegram.org', proxies=proxies, timeout=5)
-                        if response.status_code == 200:
-                            working_ports.append(('SOCKS5', port))
-                            self.app.root.after(0, lambda p=port: self.app.log_message(f"✓ 端口 {p} - SOCKS5代理可用"))
-                    except:
-                        pass
-
-                else:
-                    self.app.root.after(0, lambda p=port: self.app.log_message(f"✗ 端口 {p} 未开放"))
-
-            except Exception as e:
-                self.app.root.after(0, lambda p=port, err=str(e): self.app.log_message(f"✗ 端口 {p} 测试失败: {err}"))
-
-        # 显示结果
-        if working_ports:
-            best_proxy = working_ports[0]
-            self.app.root.after(0, lambda: self.app.log_message(f"=== 找到可用代理: {best_proxy[0]} 端口 {best_proxy[1]} ==="))
-
-            # 自动设置最佳代理
-            self.app.proxy_type_var.set(best_proxy[0])
-            self.app.proxy_port_var.set(str(best_proxy[1]))
-
-            proxy_list = ", ".join([f"{ptype}:{port}" for ptype, port in working_ports])
-            self.app.root.after(0, lambda pl=proxy_list: messagebox.showinfo("扫描结果",
-                                                                         f"找到可用代理:\n{pl}\n\n已自动设置为最佳配置"))
-        else:
-            self.app.root.after(0, lambda: self.app.log_message("=== 未找到可用的代理端口 ==="))
-            self.app.root.after(0,
-                            lambda: messagebox.showwarning("扫描结果", "未找到可用的代理端口\n请检查Clash是否正在运行"))
-
-    def diagnose_network(self):
-        """诊断网络连接"""
-        self.app.log_message("开始网络诊断...")
-        threading.Thread(target=self._diagnose_network_async).start()
-
-    def _diagnose_network_async(self):
-        """异步网络诊断"""
-        try:
-            self.app.root.after(0, lambda: self.app.log_message("=== 网络诊断开始 ==="))
-
-            # 1. 测试基本网络连接
-            try:
-                response = requests.get('https://www.baidu.com', timeout=10)
-                self.app.root.after(0, lambda: self.app.log_message("✓ 基本网络连接正常"))
-            except:
-                self.app.root.after(0, lambda: self.app.log_message("✗ 基本网络连接失败"))
-                return
-
-            # 2. 测试是否能直连Telegram
-            telegram_urls = [
-                'https://api.telegram.org',
-                'https://web.telegram.org',
-                'https://core.telegram.org'
-            ]
-
-            telegram_accessible = False
-            for url in telegram_urls:
-                try:
-                    response = requests.get(url, timeout=10)
-                    self.app.root.after(0, lambda u=url: self.app.log_message(f"✓ 可以访问 {u}"))
-                    telegram_accessible = True
-                except Exception as e:
-                    self.app.root.after(0, lambda u=url, err=str(e): self.app.log_message(f"✗ 无法访问 {u}: {err}"))
-
-            if telegram_accessible:
-                self.app.root.after(0, lambda: self.app.log_message("✓ 部分Telegram服务可访问，但可能需要特定配置"))
-            else:
-                self.app.root.after(0, lambda: self.app.log_message("✗ 无法访问任何Telegram服务，必须使用代理"))
-
-            # 3. 测试DNS解析
-            try:
-                telegram_ips = socket.gethostbyname_ex('api.telegram.org')[2]
-                self.app.root.after(0, lambda ips=telegram_ips: self.app.log_message(f"✓ DNS解析成功: {ips}"))
-            except Exception as e:
-                error_msg = str(e)
-                self.app.root.after(0, lambda err=error_msg: self.app.log_message(f"✗ DNS解析失败: {err}"))
-                self.app.root.after(0, lambda: messagebox.showerror("DNS问题", "DNS解析失败，可能需要更换DNS或使用代理"))
-                return
-
-            # 4. 测试代理端口是否开放
-            proxy_host = self.app.proxy_host_var.get().strip()
-            proxy_port = self.app.proxy_port_var.get().strip()
-
-            if proxy_host and proxy_port:
-                try:
-                    port = int(proxy_port)
-                    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                    sock.settimeout(5)
-                    result = sock.connect_ex((proxy_host, port))
-                    sock.close()
-
-                    if result == 0:
-                        self.app.root.after(0, lambda: self.app.log_message(f"✓ 代理端口 {proxy_host}:{proxy_port} 可访问"))
-                    else:
-                        self.app.root.after(0, lambda: self.app.log_message(f"✗ 代理端口 {proxy_host}:{proxy_port} 无法访问"))
-                        self.app.root.after(0, lambda: messagebox.showerror("代理问题",
-                                                                        f"代理端口 {proxy_host}:{proxy_port} 无法访问\n请检查Clash是否运行，端口是否正确"))
-                        return
-
-                except ValueError:
-                    self.app.root.after(0, lambda: self.app.log_message("✗ 代理端口格式错误"))
-                    return
-
-            # 5. 测试不同类型的代理
-            proxy_types = ['HTTP', 'SOCKS5']
-            working_configs = []
-
-            for ptype in proxy_types:
-                try:
-                    if ptype == 'HTTP':
-                        proxies = {
-                            'http': f'http://{proxy_host}:{proxy_port}',
-                            'https': f'http://{proxy_host}:{proxy_port}'
-                        }
-                    else:  # SOCKS5
-                        proxies = {
-                            'http': f'socks5://{proxy_host}:{proxy_port}',
-                            'https': f'socks5://{proxy_host}:{proxy_port}'
-                        }
-
-                    response = requests.get('https://api.telegram.org', proxies=proxies, timeout=10)
-                    if response.status_code == 200:
-                        working_configs.append(ptype)
-                        self.app.root.after(0, lambda t=ptype: self.app.log_message(f"✓ {t} 代理可以连接Telegram"))
-                    else:
-                        self.app.root.after(0, lambda t=ptype: self.app.log_message(f"✗ {t} 代理无法连接Telegram"))
-
-                except Exception as e:
-                    self.app.root.after(0, lambda t=ptype, err=str(e): self.app.log_message(f"✗ {t} 代理测试失败: {err}"))
-
-            # 6. 给出建议
-            if working_configs:
-                best_config = working_configs[0]
-                self.app.root.after(0, lambda: self.app.log_message(f"建议使用: {best_config} 代理"))
-                self.app.root.after(0, lambda cfg=best_config: messagebox.showinfo("诊断结果", f"建议使用 {cfg} 代理类型"))
-
-                # 自动设置为最佳配置
-                self.app.proxy_type_var.set(best_config)
-            else:
-                self.app.root.after(0, lambda: self.app.log_message("所有代理配置都无法连接Telegram"))
-                self.app.root.after(0, lambda: messagebox.showerror("诊断结果",
-                                                                "所有代理配置都无法连接Telegram\n请检查Clash配置或尝试其他代理端口"))
-
-            # 7. MTProto连接测试
-            self.app.root.after(0, lambda: self.app.log_message("=== 开始MTProto连接测试 ==="))
-
-            # 测试Telegram的MTProto端口
-            telegram_servers = [
-                ('149.154.167.50', 443),  # DC2
-                ('149.154.175.53', 443),  # DC4
-                ('91.108.56.130', 443),   # DC5
-            ]
-
-            mtproto_working = False
-            for server, port in telegram_servers:
-                try:
-                    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                    sock.settimeout(10)
-                    result = sock.connect_ex((server, port))
-                    sock.close()
-
-                    if result == 0:
-                        self.app.root.after(0, lambda s=server: self.app.log_message(f"✓ MTProto服务器 {s}:443 可连接"))
-                        mtproto_working = True
-                    else:
-                        self.app.root.after(0, lambda s=server: self.app.log_message(f"✗ MTProto服务器 {s}:443 无法连接"))
-
-                except Exception as e:
-                    self.app.root.after(0, lambda s=server, err=str(e): self.app.log_message(
-                        f"✗ MTProto服务器 {s}:443 测试失败: {err}"))
-
-            if not mtproto_working:
-                self.app.root.after(0, lambda: self.app.log_message("所有MTProto服务器都无法直连"))
-                self.app.root.after(0, lambda: messagebox.showwarning("MTProto问题",
-                                                                  "MTProto协议被阻止\n必须使用代理连接Telegram"))
-            else:
-                self.app.root.after(0, lambda: self.app.log_message("MTProto连接正常，可能是Telethon配置问题"))
-
-            self.app.root.after(0, lambda: self.app.log_message("=== 网络诊断完成 ==="))
-
-        except Exception as e:
-            self.app.root.after(0, lambda: self.app.log_message(f"网络诊断失败: {str(e)}"))
\ No newline at end of file
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+网络代理模块 - 处理代理相关功能
+"""
+
+import asyncio
+import threading
+import time
+import python_socks
+try:
+    from tkinter import messagebox
+except ImportError:  # headless模式下没有图形界面
+    messagebox = None
+
+from proxy_probe import DEFAULT_PORTS, parse_port_range, parse_target, scan_ports
+from proxy_pool import ProxyPool
+from network_diagnosis import NetworkDiagnosis
+from dc_latency import DcLatency, DC_ADDRESSES, path_key
+
+
+class NetworkProxy:
+    def __init__(self, app):
+        self.app = app
+        self.diagnosis = NetworkDiagnosis.from_config(app.config, app.http_client)
+
+        # 代理池（可选）- 配置了proxy_pool时按账号分配代理并自动切换
+        try:
+            self.proxy_pool = ProxyPool.from_config(app, app.config)
+        except ValueError as e:
+            self.proxy_pool = None
+            app.log_message(f"⚠️ 代理池配置错误，使用单个代理: {str(e)}")
+
+        # 各路径到Telegram数据中心的延迟表 - 按账号所在DC选择路径
+        self.dc_latency = DcLatency.from_config(app, app.config)
+
+        # 代理设置快照 - 重连、故障切换等在事件循环线程中运行，不能读取界面变量
+        self.settings = {}
+        self.refresh_settings(app.config)
+
+    def refresh_settings(self, config=None):
+        """在主线程读取代理设置并整体替换快照（开始监控和代理设置变化时调用）"""
+        if config is None:
+            config = self.app.get_current_config()
+        self.settings = {
+            'use_proxy': bool(config.get('use_proxy', True)),
+            'proxy_type': str(config.get('proxy_type', 'HTTP')),
+            'proxy_host': str(config.get('proxy_host', '127.0.0.1')).strip(),
+            'proxy_port': str(config.get('proxy_port', '7890')).strip(),
+        }
+
+    def pool_active(self):
+        """是否使用代理池"""
+        return self.proxy_pool is not None and self.settings['use_proxy']
+
+    def get_proxy_config(self, phone=None):
+        """获取代理配置 - 使用代理池时返回分配给该账号的代理"""
+        if not self.settings['use_proxy']:
+            return None
+
+        if self.proxy_pool is not None:
+            return self.proxy_pool.assign(phone)
+        return self._configured_proxy()
+
+    def _configured_proxy(self):
+        """界面中配置的单个代理（读取快照）"""
+        settings = self.settings
+        proxy_type = settings['proxy_type']
+        proxy_host = settings['proxy_host']
+        proxy_port = settings['proxy_port']
+
+        if not proxy_host or not proxy_port:
+            return None
+
+        try:
+            port = int(proxy_port)
+            if proxy_type == 'HTTP':
+                return {
+                    'proxy_type': 'http',
+                    'addr': proxy_host,
+                    'port': port
+                }
+            elif proxy_type == 'SOCKS5':
+                return {
+                    'proxy_type': 'socks5',
+                    'addr': proxy_host,
+                    'port': port
+                }
+        except ValueError:
+            return None
+
+        return None
+
+    def stop(self):
+        """停止代理池和DC延迟的后台探测"""
+        if self.proxy_pool is not None:
+            self.proxy_pool.stop()
+        self.dc_latency.stop()
+
+    def path_candidates(self):
+        """账号可以选择的连接路径 [代理配置，None表示直连]"""
+        if not self.settings['use_proxy']:
+            return []
+        if self.proxy_pool is not None:
+            paths = [endpoint.as_config() for endpoint in self.proxy_pool.endpoints if endpoint.healthy]
+        else:
+            proxy_config = self._configured_proxy()
+            paths = [proxy_config] if proxy_config else []
+        # 直连TCP可达不代表MTProto不被干扰，默认不自动选择直连
+        if self.app.config.get('dc_allow_direct', False):
+            paths.append(None)
+        return paths
+
+    def probe_paths(self):
+        """测量延迟的路径 - 候选路径加上直连（直连始终测量，便于对比）"""
+        paths = self.path_candidates()
+        if None not in paths:
+            paths.append(None)
+        return paths
+
+    async def prepare(self):
+        """加载账号前探测一轮代理池和DC延迟，用于给账号分配代理和路径"""
+        if self.pool_active():
+            await self.proxy_pool.probe_all()
+        if self.app.config.get('dc_probe_enabled', True):
+            if len(self.path_candidates()) > 1:
+                await self.dc_latency.probe(self.probe_paths(), samples=1)
+            self.dc_latency.ensure_probing(self.probe_paths)
+
+    def apply_best_path(self, phone, client):
+        """按账号所在DC选择延迟最低的路径，下次连接生效；返回是否有可选路径
+
+        每次重连都在事件循环线程中调用，候选路径只读代理设置快照
+        """
+        if not self.app.config.get('dc_probe_enabled', True):
+            return False
+        candidates = {path_key(proxy_config): proxy_config for proxy_config in self.path_candidates()}
+        if len(candidates) < 2:
+            return False
+        dc_id = getattr(client.session, 'dc_id', None)
+        best = self.dc_latency.best_path(dc_id, candidates) if dc_id in DC_ADDRESSES else None
+        if best is None:
+            return False
+
+        proxy_config = candidates[best]
+        if self.proxy_pool is not None:
+            if proxy_config is None:
+                self.proxy_pool.release(phone)
+            else:
+                self.proxy_pool.assign_to(phone, proxy_config)
+        client.set_proxy(self.to_telethon(proxy_config))
+
+        stats = self.dc_latency.stats(best, dc_id)
+        self.app.log_debug("🛰️ 账号 %s 位于DC%s，使用路径 %s (%.0f±%.0fms)", phone, dc_id, best,
+                           stats.median() * 1000, stats.jitter() * 1000)
+        return True
+
+    @staticmethod
+    def to_telethon(proxy_config):
+        """代理配置转换为TelegramClient的proxy参数"""
+        if not proxy_config:
+            return None
+        if proxy_config['proxy_type'] == 'http':
+            return (python_socks.ProxyType.HTTP, proxy_config['addr'], proxy_config['port'])
+        if proxy_config['proxy_type'] == 'socks5':
+            return (python_socks.ProxyType.SOCKS5, proxy_config['addr'], proxy_config['port'])
+        return None
+
+    def failover(self, phone, client, error=None):
+        """账号连接出错时切换到代理池中的下一个代理，下次重连生效；返回是否切换"""
+        if not self.pool_active():
+            return False
+        proxy_config, old, new = self.proxy_pool.failover(phone, error)
+        if new is old:
+            return False
+        client.set_proxy(self.to_telethon(proxy_config))
+        self.app.log_message(f"🌐 账号 {phone} 代理切换: {old or '无'} -> {new}")
+        return True
+
+    def report_success(self, phone):
+        """账号通过分配的代理连接成功"""
+        if self.pool_active():
+            self.proxy_pool.report_success(phone)
+
+    def test_proxy(self):
+        """测试代理连接"""
+        proxy_config = self.get_proxy_config()
+        if not proxy_config:
+            messagebox.showwarning("警告", "请先配置代理信息")
+            return
+
+        self.app.log_message(f"正在测试代理连接 {proxy_config['addr']}:{proxy_config['port']}...")
+        threading.Thread(target=self._test_proxy_async, args=(proxy_config,)).start()
+
+    def _test_proxy_async(self, proxy_config):
+        """异步测试代理"""
+        try:
+            response = self.app.http_client.get('https://api.telegram.org', proxy_config, timeout=10)
+            if response.status_code == 200:
+                self.app.root.after(0, lambda: self.app.log_message("代理连接测试成功！"))
+                self.app.root.after(0, lambda: messagebox.showinfo("成功", "代理连接测试成功！"))
+            else:
+                self.app.root.after(0, lambda: self.app.log_message(f"代理连接测试失败，状态码: {response.status_code}"))
+
+        except Exception as e:
+            error_msg = str(e)  # 捕获错误信息
+            self.app.root.after(0, lambda msg=error_msg: self.app.log_message(f"代理连接测试失败: {msg}"))
+            self.app.root.after(0, lambda msg=error_msg: messagebox.showerror("测试失败", f"代理连接测试失败:\n{msg}"))
+
+    def scan_proxy_ports(self):
+        """并发扫描代理端口 - 在全局事件循环中运行，结果逐条输出到日志"""
+        config = self.app.config
+        try:
+            ports = parse_port_range(config.get('proxy_scan_ports', DEFAULT_PORTS))
+            target = parse_target(config.get('proxy_scan_target', 'api.telegram.org:443'))
+        except ValueError as e:
+            self.app.log_message(f"端口范围配置错误: {str(e)}")
+            return
+        if not ports:
+            self.app.log_message("没有需要扫描的端口")
+            return
+
+        host = self.app.proxy_host_var.get().strip() or '127.0.0.1'
+        self.app.log_message(f"开始扫描 {host} 的 {len(ports)} 个代理端口...")
+        asyncio.run_coroutine_threadsafe(self._scan_proxy_ports(host, ports, target), self.app.global_loop)
+
+    async def _scan_proxy_ports(self, host, ports, target):
+        """并发探测所有端口，总时限内按延迟排序选出最佳代理"""
+        config = self.app.config
+        log = self.app.log_message
+        started_at = time.perf_counter()
+
+        def on_result(proxy_type, port, latency, error):
+            # 每个探测结果出来就输出，不等整个扫描结束
+            if latency is not None:
+                log(f"✓ 端口 {port} - {proxy_type}代理可用 ({latency * 1000:.0f}ms)")
+            elif proxy_type == 'TCP':
+                self.app.log_debug("✗ 端口 %s 未开放", port)
+            else:
+                self.app.log_debug("✗ 端口 %s - %s握手失败: %s", port, proxy_type, str(error) or '超时')
+
+        log("=== 开始端口扫描 ===")
+        try:
+            working_ports = await scan_ports(
+                host, ports, target,
+                timeout=config.get('proxy_probe_timeout', 3),
+                deadline=config.get('proxy_scan_deadline', 10),
+                concurrency=config.get('proxy_scan_concurrency', 64),
+                on_result=on_result,
+            )
+        except Exception as e:
+            log(f"✗ 端口扫描失败: {str(e)}")
+            return
+
+        elapsed = time.perf_counter() - started_at
+
+        # 显示结果
+        if working_ports:
+            best_type, best_port, best_latency = working_ports[0]
+            log(f"=== 扫描完成 ({elapsed:.1f}秒)，找到可用代理: {best_type} 端口 {best_port} ({best_latency * 1000:.0f}ms) ===")
+
+            # 自动设置最佳代理（界面变量只能在主线程修改）
+            def apply():
+                self.app.proxy_type_var.set(best_type)
+                self.app.proxy_port_var.set(str(best_port))
+
+            self.app.root.after(0, apply)
+
+            proxy_list = "\n".join(f"{ptype}:{port} ({latency * 1000:.0f}ms)" for ptype, port, latency in working_ports)
+            if messagebox is not None:
+                self.app.root.after(0, lambda: messagebox.showinfo(
+                    "扫描结果", f"找到可用代理（按延迟排序）:\n{proxy_list}\n\n已自动设置为最佳配置"))
+        else:
+            log(f"=== 扫描完成 ({elapsed:.1f}秒)，未找到可用的代理端口 ===")
+            if messagebox is not None:
+                self.app.root.after(0, lambda: messagebox.showwarning(
+                    "扫描结果", "未找到可用的代理端口\n请检查Clash是否正在运行"))
+
+    def diagnose_network(self):
+        """诊断网络连接 - 并发探测，短时间内重复点击复用上次的报告"""
+        self.app.log_message("开始网络诊断...")
+        asyncio.run_coroutine_threadsafe(self._diagnose_network(), self.app.global_loop)
+
+    def _diagnosis_proxy(self):
+        """诊断时测试的代理 (host, port)，未配置时为None"""
+        proxy_host = self.settings['proxy_host']
+        proxy_port = self.settings['proxy_port']
+        if not proxy_host or not proxy_port:
+            return None
+        try:
+            return proxy_host, int(proxy_port)
+        except ValueError:
+            self.app.log_message("✗ 代理端口格式错误")
+            return None
+
+    async def get_diagnosis(self, force=False):
+        """获取（可能是缓存的）诊断报告 - 在全局事件循环中调用"""
+        return await self.diagnosis.get_report(self._diagnosis_proxy(), force=force)
+
+    async def _diagnose_network(self):
+        """运行诊断并输出报告"""
+        try:
+            report = await self.get_diagnosis()
+        except Exception as e:
+            self.app.log_message(f"网络诊断失败: {str(e)}")
+            return
+
+        age = time.monotonic() - report.created_at - report.elapsed
+        if age > 1:
+            self.app.log_message(f"（使用 {age:.0f} 秒前的诊断结果，{self.diagnosis.ttl:.0f} 秒内不重复探测）")
+        for line in report.format_lines():
+            self.app.log_message(line)
+
+        best = report.best_proxy_type()
+        if best:
+            # 自动设置为最佳配置（界面变量只能在主线程修改）
+            self.app.root.after(0, lambda: self.app.proxy_type_var.set(best))
+
+        if messagebox is None:
+            return
+        summary = "\n".join(report.conclusions())
+        if best:
+            self.app.root.after(0, lambda: messagebox.showinfo("诊断结果", summary))
+        else:
+            self.app.root.after(0, lambda: messagebox.showwarning("诊断结果", summary))
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+代理池模块 - 多个HTTP/SOCKS5代理，后台定时探测延迟和错误率
+每个账号从池中分配一个代理；连接出错时切换到下一个健康的代理，无需重启
+"""
+
+import asyncio
+import threading
+import time
+
+from proxy_probe import HANDSHAKES, parse_target
+
+
+class ProxyEndpoint:
+    """池中的一个代理及其探测统计"""
+
+    __slots__ = ('proxy_type', 'addr', 'port', 'latency', 'error_rate', 'probes', 'failures',
+                 'last_error', 'checked_at', 'accounts')
+
+    def __init__(self, proxy_type, addr, port):
+        self.proxy_type = proxy_type  # 'http' / 'socks5'
+        self.addr = addr
+        self.port = int(port)
+        self.latency = None        # 握手延迟的滑动平均（秒），未探测时为None
+        self.error_rate = 0.0      # 错误率的滑动平均
+        self.probes = 0
+        self.failures = 0
+        self.last_error = ''
+        self.checked_at = 0.0
+        self.accounts = set()      # 分配到这个代理的账号
+
+    @classmethod
+    def parse(cls, spec):
+        """解析 "socks5://127.0.0.1:7891" 或 "http://127.0.0.1:7890" """
+        scheme, sep, rest = str(spec).strip().partition('://')
+        scheme = scheme.lower()
+        if not sep or scheme not in ('http', 'socks5'):
+            raise ValueError(f"不支持的代理地址: {spec}")
+        addr, port = parse_target(rest.rstrip('/'))
+        return cls(scheme, addr, port)
+
+    def __str__(self):
+        return f"{self.proxy_type}://{self.addr}:{self.port}"
+
+    def as_config(self):
+        """与NetworkProxy.get_proxy_config相同格式的配置"""
+        return {'proxy_type': self.proxy_type, 'addr': self.addr, 'port': self.port}
+
+    @property
+    def healthy(self):
+        return self.error_rate < 0.5
+
+    def score(self):
+        """越小越好 - 未探测的按1秒计，错误率放大延迟"""
+        latency = self.latency if self.latency is not None else 1.0
+        return latency * (1 + 4 * self.error_rate)
+
+
+class ProxyPool:
+    """代理池 - 分配、故障切换和后台探测（分配可在任意线程调用）"""
+
+    def __init__(self, app, endpoints, probe_interval=60, probe_timeout=3.0,
+                 target=('api.telegram.org', 443), smoothing=0.3):
+        self.app = app
+        self.endpoints = list(endpoints)
+        self.probe_interval = max(5.0, float(probe_interval))
+        self.probe_timeout = float(probe_timeout)
+        self.target = target
+        self.smoothing = float(smoothing)
+
+        self.assignments = {}  # phone -> ProxyEndpoint
+        self._lock = threading.Lock()
+        self._prober = None
+
+        # 统计
+        self.failovers = 0
+
+    @classmethod
+    def from_config(cls, app, config):
+        """从配置创建代理池，没有配置代理池时返回None"""
+        specs = config.get('proxy_pool', [])
+        if isinstance(specs, str):
+            specs = specs.replace('，', ',').split(',')
+        endpoints = [ProxyEndpoint.parse(spec) for spec in specs if str(spec).strip()]
+        if not endpoints:
+            return None
+        return cls(
+            app,
+            endpoints,
+            probe_interval=config.get('proxy_probe_interval', 60),
+            probe_timeout=config.get('proxy_probe_timeout', 3),
+            target=parse_target(config.get('proxy_scan_target', 'api.telegram.org:443')),
+        )
+
+    def __len__(self):
+        return len(self.endpoints)
+
+    def _rank(self, exclude=None):
+        """按健康状况、得分和已分配账号数排序"""
+        candidates = [endpoint for endpoint in self.endpoints if endpoint is not exclude] or self.endpoints
+        return sorted(candidates, key=lambda e: (not e.healthy, e.score(), len(e.accounts)))
+
+    def _move(self, phone, endpoint):
+        old = self.assignments.get(phone)
+        if old is not None:
+            old.accounts.discard(phone)
+        endpoint.accounts.add(phone)
+        self.assignments[phone] = endpoint
+
+    def assign(self, phone=None):
+        """为账号分配代理（已分配且健康时保持不变），返回代理配置"""
+        self.ensure_probing()
+        with self._lock:
+            current = self.assignments.get(phone)
+            if current is not None and current.healthy:
+                return current.as_config()
+            endpoint = self._rank()[0]
+            if phone is not None:
+                self._move(phone, endpoint)
+            return endpoint.as_config()
+
+    def assign_to(self, phone, proxy_config):
+        """把账号分配到指定的代理（按DC延迟选择路径时使用）"""
+        with self._lock:
+            for endpoint in self.endpoints:
+                if endpoint.as_config() == proxy_config:
+                    self._move(phone, endpoint)
+                    return True
+        return False
+
+    def failover(self, phone, error=None):
+        """账号连接出错 - 记一次错误并切换到下一个代理，返回新的代理配置"""
+        with self._lock:
+            current = self.assignments.get(phone)
+            if current is not None:
+                self._record(current, None, str(error) if error else '连接错误')
+            endpoint = self._rank(exclude=current)[0]
+            self._move(phone, endpoint)
+            if endpoint is not current:
+                self.failovers += 1
+            return endpoint.as_config(), current, endpoint
+
+    def report_success(self, phone):
+        """账号通过当前代理连接成功"""
+        with self._lock:
+            endpoint = self.assignments.get(phone)
+            if endpoint is not None:
+                endpoint.error_rate *= 1 - self.smoothing
+
+    def release(self, phone):
+        with self._lock:
+            endpoint = self.assignments.pop(phone, None)
+            if endpoint is not None:
+                endpoint.accounts.discard(phone)
+
+    def _record(self, endpoint, latency, error=''):
+        """更新滑动平均（调用方持有锁或在事件循环中）"""
+        alpha = self.smoothing
+        endpoint.probes += 1
+        endpoint.checked_at = time.time()
+        if latency is None:
+            endpoint.failures += 1
+            endpoint.last_error = error
+            endpoint.error_rate = endpoint.error_rate * (1 - alpha) + alpha
+        else:
+            endpoint.error_rate *= 1 - alpha
+            endpoint.latency = latency if endpoint.latency is None else \
+                endpoint.latency * (1 - alpha) + latency * alpha
+
+    def ensure_probing(self):
+        """在全局事件循环中启动后台探测（只启动一次）"""
+        if self._prober is None and self.app.global_loop.is_running():
+            self._prober = asyncio.run_coroutine_threadsafe(self._probe_loop(), self.app.global_loop)
+
+    def stop(self):
+        if self._prober is not None:
+            self._prober.cancel()
+            self._prober = None
+
+    async def probe_all(self):
+        """并发探测池中所有代理"""
+        async def probe(endpoint):
+            handshake = HANDSHAKES[endpoint.proxy_type.upper()]
+            try:
+                latency = await handshake(endpoint.addr, endpoint.port, self.target, self.probe_timeout)
+                error = ''
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, UnicodeError) as e:
+                latency = None
+                error = str(e) or '超时'
+            with self._lock:
+                was_healthy = endpoint.healthy
+                self._record(endpoint, latency, error)
+                changed = was_healthy != endpoint.healthy
+            if changed:
+                state = '恢复' if endpoint.healthy else '不可用'
+                self.app.log_message(f"🌐 代理 {endpoint} {state}" + (f": {error}" if error else ''))
+
+        await asyncio.gather(*(probe(endpoint) for endpoint in self.endpoints))
+
+    async def _probe_loop(self):
+        while True:
+            try:
+                await self.probe_all()
+            except Exception as e:
+                self.app.log_message(f"❗ 代理池探测失败: {str(e)}")
+            await asyncio.sleep(self.probe_interval)
+
+    def format_stats(self):
+        """格式化统计信息用于日志，返回多行文本列表"""
+        healthy = sum(1 for endpoint in self.endpoints if endpoint.healthy)
+        lines = [f"{healthy}/{len(self.endpoints)} 个代理可用, 故障切换 {self.failovers} 次"]
+        for endpoint in self._rank():
+            latency = f"{endpoint.latency * 1000:.0f}ms" if endpoint.latency is not None else '未探测'
+            line = (f"  {endpoint}: 延迟 {latency}, 错误率 {endpoint.error_rate:.0%}, "
+                    f"探测 {endpoint.probes} 次, 账号 {len(endpoint.accounts)} 个")
+            if endpoint.last_error and not endpoint.healthy:
+                line += f", 最近错误: {endpoint.last_error}"
+            lines.append(line)
+        return lines
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+代理探测模块 - 用asyncio并发探测代理端口
+对每个端口先建立TCP连接，再分别做HTTP CONNECT和SOCKS5握手（经代理连到目标地址），
+握手成功才算可用，以握手完成的耗时作为延迟
+"""
+
+import asyncio
+import struct
+import time
+
+
+# 默认扫描的常见代理端口（Clash、V2Ray、Shadowsocks等）
+DEFAULT_PORTS = '7890-7893,8080,8081,1080,1081,3128,8888,9090'
+
+
+def parse_port_range(text):
+    """解析端口范围，例如 "7890-7893,8080,1080" -> [7890, 7891, 7892, 7893, 8080, 1080]"""
+    ports = []
+    for part in str(text).replace('，', ',').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            start, end = (int(value) for value in part.split('-', 1))
+            if start > end:
+                start, end = end, start
+            ports.extend(range(start, end + 1))
+        else:
+            ports.append(int(part))
+
+    seen = set()
+    result = []
+    for port in ports:
+        if not 0 < port < 65536:
+            raise ValueError(f"端口超出范围: {port}")
+        if port not in seen:
+            seen.add(port)
+            result.append(port)
+    return result
+
+
+def parse_target(text):
+    """解析握手目标 "host:port" """
+    host, _, port = str(text).rpartition(':')
+    return host, int(port)
+
+
+async def _open(host, port, timeout):
+    return await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+
+
+async def _close(writer):
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except Exception:
+        pass
+
+
+async def tcp_connect(host, port, timeout=2.0):
+    """TCP连接测试，返回耗时（秒）；失败时抛出异常"""
+    started_at = time.perf_counter()
+    _, writer = await _open(host, port, timeout)
+    elapsed = time.perf_counter() - started_at
+    await _close(writer)
+    return elapsed
+
+
+async def http_connect_handshake(host, port, target, timeout=3.0):
+    """HTTP CONNECT握手 - 代理返回2xx即成功，返回耗时（秒）"""
+    target_host, target_port = target
+    started_at = time.perf_counter()
+    reader, writer = await _open(host, port, timeout)
+    try:
+        writer.write((f"CONNECT {target_host}:{target_port} HTTP/1.1\r\n"
+                      f"Host: {target_host}:{target_port}\r\n\r\n").encode('ascii'))
+        await writer.drain()
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+        parts = status_line.decode('latin-1').split()
+        if len(parts) < 2 or not parts[0].startswith('HTTP/'):
+            raise ConnectionError("不是HTTP代理")
+        if not parts[1].startswith('2'):
+            raise ConnectionError(f"CONNECT被拒绝: {' '.join(parts[1:])}")
+        return time.perf_counter() - started_at
+    finally:
+        await _close(writer)
+
+
+async def socks5_handshake(host, port, target, timeout=3.0):
+    """SOCKS5握手（无认证）+ CONNECT - 返回耗时（秒）"""
+    target_host, target_port = target
+    started_at = time.perf_counter()
+    reader, writer = await _open(host, port, timeout)
+    try:
+        writer.write(b'\x05\x01\x00')
+        await writer.drain()
+        reply = await asyncio.wait_for(reader.readexactly(2), timeout)
+        if reply[0] != 5:
+            raise ConnectionError("不是SOCKS5代理")
+        if reply[1] != 0:
+            raise ConnectionError("SOCKS5代理需要认证")
+
+        address = target_host.encode('idna')
+        writer.write(b'\x05\x01\x00\x03' + bytes([len(address)]) + address + struct.pack('!H', target_port))
+        await writer.drain()
+        reply = await asyncio.wait_for(reader.readexactly(4), timeout)
+        if reply[1] != 0:
+            raise ConnectionError(f"SOCKS5 CONNECT失败 (代码 {reply[1]})")
+        return time.perf_counter() - started_at
+    finally:
+        await _close(writer)
+
+
+HANDSHAKES = {
+    'HTTP': http_connect_handshake,
+    'SOCKS5': socks5_handshake,
+}
+
+
+async def probe_port(host, port, target, timeout=3.0, on_result=None):
+    """探测一个端口 - 端口开放时并发尝试两种握手
+
+    返回可用的 (代理类型, 端口, 延迟秒) 列表；on_result(类型, 端口, 延迟或None, 错误)在每项结果出来时调用
+    """
+    try:
+        await tcp_connect(host, port, timeout)
+    except (OSError, asyncio.TimeoutError) as e:
+        if on_result is not None:
+            on_result('TCP', port, None, e)
+        return []
+
+    async def attempt(proxy_type):
+        try:
+            latency = await HANDSHAKES[proxy_type](host, port, target, timeout)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, UnicodeError) as e:
+            if on_result is not None:
+                on_result(proxy_type, port, None, e)
+            return None
+        if on_result is not None:
+            on_result(proxy_type, port, latency, None)
+        return proxy_type, port, latency
+
+    results = await asyncio.gather(*(attempt(proxy_type) for proxy_type in HANDSHAKES))
+    return [result for result in results if result is not None]
+
+
+async def scan_ports(host, ports, target, timeout=3.0, deadline=10.0, concurrency=64, on_result=None):
+    """并发扫描多个端口，在总时限内返回按延迟排序的可用代理 [(类型, 端口, 延迟秒)]
+
+    超过总时限仍未完成的端口视为不可用
+    """
+    semaphore = asyncio.Semaphore(max(1, int(concurrency)))
+    found = []
+
+    async def run(port):
+        async with semaphore:
+            found.extend(await probe_port(host, port, target, timeout, on_result))
+
+    tasks = [asyncio.ensure_future(run(port)) for port in ports]
+    if tasks:
+        _, pending = await asyncio.wait(tasks, timeout=deadline)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    found.sort(key=lambda item: item[2])
+    return found
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+发送调度模块 - 基于令牌桶的发送限速与重试
+按发送方（Bot / 各个用户账号）和目标群分通道限速，
+遇到FloodWait / RetryAfter时只暂停受影响的通道，临时错误按抖动退避重试
+共享投递协程中的发送可以选择在通道长时间暂停时抛出SendDeferred，由调用方延后重新入队
+"""
+
+import asyncio
+import random
+import time
+
+from telethon.errors import FloodWaitError, SlowModeWaitError, ServerError
+from telegram.error import RetryAfter, NetworkError, BadRequest
+
+
+# 默认限速（每秒速率, 突发容量）
+# Bot API: 全局约30条/秒，同一群组约20条/分钟
+# 用户账号(MTProto): 官方未公开，按保守值设置
+DEFAULT_LIMITS = {
+    'bot_global': (30.0, 30),
+    'bot_chat': (20.0 / 60, 3),
+    'user_global': (10.0, 10),
+    'user_chat': (1.0, 5),
+}
+
+# 调度器会退避重试的错误（限流、网络错误、超时）
+RETRYABLE_ERRORS = (FloodWaitError, SlowModeWaitError, RetryAfter,
+                    NetworkError, ServerError, ConnectionError, asyncio.TimeoutError, OSError)
+
+
+def is_retryable(error):
+    """是否为临时错误 - BadRequest等请求本身的问题重试无意义"""
+    return isinstance(error, RETRYABLE_ERRORS) and not isinstance(error, BadRequest)
+
+
+class SendDeferred(Exception):
+    """通道暂停时间超过阈值，本次不等待 - delay为距通道恢复的秒数"""
+
+    def __init__(self, delay):
+        super().__init__(f"发送通道暂停中，{delay:.0f} 秒后恢复")
+        self.delay = delay
+
+
+class TokenBucket:
+    """令牌桶 - 支持预约式获取和整体暂停"""
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now):
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated_at = now
+
+    def reserve(self):
+        """预约一个令牌，返回需要等待的秒数"""
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens -= 1
+        wait = 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+        return max(wait, self.paused_until - now)
+
+    def pause(self, seconds):
+        """暂停该通道（FloodWait / RetryAfter）"""
+        until = time.monotonic() + seconds
+        if until > self.paused_until:
+            self.paused_until = until
+
+    async def acquire(self):
+        """等待直到可以发送"""
+        wait = self.reserve()
+        while wait > 0:
+            await asyncio.sleep(wait)
+            # 等待期间可能又被暂停
+            wait = self.paused_until - time.monotonic()
+
+
+class SendScheduler:
+    """发送调度器 - 全局通道 + 每个目标群一个通道"""
+
+    def __init__(self, app, limits=None, max_attempts=5, base_delay=1.0, max_delay=60.0, defer_after=5.0):
+        self.app = app
+        self.limits = dict(DEFAULT_LIMITS)
+        if limits:
+            self.limits.update(limits)
+        self.max_attempts = max(1, int(max_attempts))
+        self.base_delay = float(base_delay)
+        self.max_delay = float(max_delay)
+        self.defer_after = float(defer_after)  # defer=True时通道暂停超过该秒数则抛出SendDeferred
+
+        self.buckets = {}
+
+        # 统计
+        self.sent = 0
+        self.retried = 0
+        self.flood_waits = 0
+        self.gave_up = 0
+        self.deferred = 0
+
+    @classmethod
+    def from_config(cls, app, config):
+        """从配置创建调度器"""
+        limits = {}
+        for name in DEFAULT_LIMITS:
+            value = config.get(f'rate_{name}')
+            if value:
+                limits[name] = tuple(value)
+        return cls(app, limits, max_attempts=config.get('send_max_attempts', 5),
+                   defer_after=config.get('send_defer_after', 5.0))
+
+    def _bucket(self, kind, sender, chat_id):
+        """获取（或创建）通道令牌桶 - kind为'bot'或'user'"""
+        key = (sender, chat_id)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            limit_name = f"{kind}_global" if chat_id is None else f"{kind}_chat"
+            bucket = TokenBucket(*self.limits[limit_name])
+            self.buckets[key] = bucket
+        return bucket
+
+    def _backoff(self, attempt):
+        """指数退避 + 全抖动"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def send(self, kind, sender, chat_id, send_func, defer=False):
+        """按限速发送，失败时重试 - send_func为无参协程函数
+
+        defer=True时，通道因FloodWait / RetryAfter暂停超过defer_after秒则抛出SendDeferred，
+        不在调用方（如转发队列的投递协程）中长时间等待
+        """
+        global_bucket = self._bucket(kind, sender, None)
+        chat_bucket = self._bucket(kind, sender, chat_id)
+
+        attempt = 0
+        while True:
+            if defer:
+                delay = chat_bucket.paused_until - time.monotonic()
+                if delay > self.defer_after:
+                    self.deferred += 1
+                    raise SendDeferred(delay)
+
+            await global_bucket.acquire()
+            await chat_bucket.acquire()
+
+            try:
+                result = await send_func()
+                self.sent += 1
+                return result
+
+            except (FloodWaitError, SlowModeWaitError) as e:
+                # 只暂停当前通道，其他目标和其他账号不受影响
+                self.flood_waits += 1
+                chat_bucket.pause(e.seconds + random.uniform(0, 1))
+                self._log(f"⏳ [{sender}] 触发FloodWait，通道暂停 {e.seconds} 秒")
+                attempt = self._count_attempt(attempt)
+
+            except RetryAfter as e:
+                self.flood_waits += 1
+                seconds = e.retry_after
+                if hasattr(seconds, 'total_seconds'):
+                    seconds = seconds.total_seconds()
+                chat_bucket.pause(float(seconds) + random.uniform(0, 1))
+                self._log(f"⏳ [{sender}] Bot触发限流，通道暂停 {seconds} 秒")
+                attempt = self._count_attempt(attempt)
+
+            except BadRequest:
+                # 请求本身有问题，重试无意义
+                raise
+
+            except (NetworkError, ServerError, ConnectionError, asyncio.TimeoutError, OSError) as e:
+                attempt = self._count_attempt(attempt)
+                delay = self._backoff(attempt)
+                self._log(f"🔁 [{sender}] 发送失败，{delay:.1f} 秒后第 {attempt} 次重试: {str(e)}")
+                await asyncio.sleep(delay)
+
+    def _count_attempt(self, attempt):
+        """记录一次失败，超过最大次数时放弃（重新抛出当前异常）"""
+        attempt += 1
+        if attempt >= self.max_attempts:
+            self.gave_up += 1
+            raise
+        self.retried += 1
+        return attempt
+
+    def _log(self, message):
+        self.app.root.after(0, lambda: self.app.log_message(message))
+
+    def format_stats(self):
+        """格式化统计信息用于日志"""
+        paused = sum(1 for bucket in self.buckets.values() if bucket.paused_until > time.monotonic())
+        return (f"已发送 {self.sent}, 重试 {self.retried}, 限流 {self.flood_waits}, "
+                f"放弃 {self.gave_up}, 延后 {self.deferred}, 暂停中通道 {paused}/{len(self.buckets)}")
@@ -0,0 +1,461 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多进程分片模式 - 账号很多时把session分配到多个工作进程，每个进程有自己的事件循环
+工作进程负责接收和过滤消息，匹配结果通过本地队列发给唯一的投递进程：
+投递进程做跨分片去重、Bot限速和合并发送；直接转发仍由持有该账号的工作进程执行
+监督进程检查各进程心跳，退出或无响应时按退避时间重启
+
+限制: 分片模式下相册不会合并成媒体组发送，每个相册项按普通消息单独转发；
+      digest_mode只合并Bot发送的文字消息
+
+用法: python shard_supervisor.py --shards 4 [--config config.json]
+      python main.py --shards 4
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from datetime import datetime, timezone
+
+import telegram
+
+from headless import HeadlessApp
+from message_monitor import MessageMonitor, message_ref
+from account_manager import AccountManager
+from config_manager import ConfigManager
+from dedup_store import content_fingerprint
+from send_scheduler import SendScheduler
+from digest_batcher import DigestBatcher
+from forward_queue import ForwardQueue
+
+
+DELIVERY = 'delivery'
+
+
+def assign_shards(phones, count):
+    """把账号按顺序轮流分配到各分片（同一组session每次分配结果相同）"""
+    phones = sorted(phones)
+    count = max(1, min(int(count), len(phones)))
+    return [phones[i::count] for i in range(count)]
+
+
+def job_ref(job):
+    """投递任务对应的转发记录定位信息，见message_monitor.message_ref"""
+    return job['chat_id'], job['message_id'], job['phone'], job.get('sent_at')
+
+
+class DirectJob:
+    """投递进程交回的直接转发任务 - 只有转发和溢写需要的消息定位字段"""
+
+    __slots__ = ('chat_id', 'id', 'date')
+
+    def __init__(self, job):
+        self.chat_id = job['chat_id']
+        self.id = job['message_id']
+        sent_at = job.get('sent_at')
+        self.date = datetime.fromtimestamp(sent_at, timezone.utc) if sent_at is not None else None
+
+
+class ShardMessageMonitor(MessageMonitor):
+    """工作进程中的消息监控 - 匹配结果交给投递进程
+
+    任务只是提交，尚未发出：成功日志和转发记录在真正发出后由投递进程（Bot）
+    或执行直接转发的工作进程写入
+    """
+
+    async def _deliver_bot(self, message, phone, forward_to, text):
+        self.app.submit_job('bot', message, phone, forward_to, text=text)
+        return False
+
+    async def _deliver_direct(self, message, phone, forward_to):
+        self.app.submit_job('direct', message, phone, forward_to)
+        return False
+
+
+class ShardWorkerApp(HeadlessApp):
+    """分片工作进程 - 只加载分配到的账号"""
+
+    def __init__(self, shard_id, phones, config_file, job_queue, inbox, status_queue):
+        log_dir = ConfigManager(config_file).load_config().get('event_log_dir', 'logs')
+        super().__init__(config_file, {
+            'headless_accounts': phones,
+            'digest_mode': False,  # 合并发送由投递进程统一处理
+            'event_log_dir': os.path.join(log_dir, f'shard-{shard_id}'),
+        })
+        self.message_monitor = ShardMessageMonitor(self)
+        self.log_prefix = f"[shard-{shard_id}] "
+
+        self.shard_id = shard_id
+        self.job_queue = job_queue
+        self.inbox = inbox
+        self.status_queue = status_queue
+
+        # 直接转发失败时和单进程模式一样按forward_overflow重试/溢写，各分片使用自己的溢写文件
+        self.direct_queue = ForwardQueue(
+            self,
+            self._forward_direct,
+            workers=self.config.get('forward_workers', 4),
+            maxsize=self.config.get('forward_queue_size', 1000),
+            overflow=self.config.get('forward_overflow', 'drop'),
+            spill_file=f'forward_spill-shard-{shard_id}.jsonl',
+            spill_max_attempts=self.config.get('forward_spill_max_attempts', 3),
+        )
+
+        # 统计
+        self.jobs_submitted = 0
+        self.direct_forwarded = 0
+
+    def submit_job(self, kind, message, phone, forward_to, text=None):
+        """提交投递任务 - Queue.put由后台线程写入管道，不阻塞事件循环"""
+        chat_id, message_id, _, sent_at = message_ref(message, phone)
+        job = {
+            'type': kind,
+            'shard': self.shard_id,
+            'phone': phone,
+            'chat_id': chat_id,
+            'message_id': message_id,
+            'sent_at': sent_at,
+            'forward_to': forward_to,
+        }
+        if text is not None:
+            job['text'] = text
+        if self.message_monitor.filter_plan.dedup_content:
+            fingerprint = content_fingerprint(message)
+            if fingerprint is not None:
+                job['fingerprint'] = fingerprint
+        self.job_queue.put(job)
+        self.jobs_submitted += 1
+
+    def _inbox_reader(self):
+        """后台线程 - 接收投递进程确认过（未重复）的直接转发任务"""
+        while True:
+            job = self.inbox.get()
+            self.global_loop.call_soon_threadsafe(self.direct_queue.put, DirectJob(job), job['phone'])
+
+    async def _forward_direct(self, message, phone):
+        """直接转发队列的投递函数 - 失败时抛出异常，由队列决定重试或放弃"""
+        client = self.clients.get(phone)
+        if client is None:
+            raise ConnectionError(f"账号 {phone} 未连接")
+
+        forward_to = self.message_monitor.filter_plan.forward_to
+        await self.message_monitor.send_scheduler.send(
+            'user', phone, forward_to,
+            lambda: client.forward_messages(forward_to, message.id, from_peer=message.chat_id),
+            defer=True
+        )
+        self.direct_forwarded += 1
+        self.log_message("📤 直接转发成功 (无用户名用户)")
+        self.mark_forwarded(message_ref(message, phone), 'user')
+
+    def log_stats(self):
+        super().log_stats()
+        self.log_message(f"📮 直接转发队列: {self.direct_queue.format_stats()}")
+
+    async def _heartbeat_loop(self, interval):
+        """定时向监督进程报告状态"""
+        while True:
+            connected = sum(1 for client in self.clients.values() if client.is_connected())
+            self.status_queue.put(('heartbeat', self.shard_id, {
+                'accounts': len(self.selected_accounts),
+                'connected': connected,
+                'submitted': self.jobs_submitted,
+                'direct': self.direct_forwarded,
+            }))
+            await asyncio.sleep(interval)
+
+    async def run_async(self):
+        await self.direct_queue.start()
+        threading.Thread(target=self._inbox_reader, daemon=True).start()
+        heartbeat = asyncio.ensure_future(self._heartbeat_loop(self.config.get('shard_heartbeat_interval', 10)))
+        try:
+            await super().run_async()
+        finally:
+            heartbeat.cancel()
+            await self.direct_queue.stop()
+
+
+class DeliveryApp(HeadlessApp):
+    """投递进程 - 跨分片去重后用Bot发送，直接转发任务交回对应工作进程"""
+
+    def __init__(self, config_file, job_queue, inboxes, status_queue):
+        log_dir = ConfigManager(config_file).load_config().get('event_log_dir', 'logs')
+        super().__init__(config_file, {
+            'headless_accounts': [],
+            'event_log_dir': os.path.join(log_dir, DELIVERY),
+            'archive_enabled': False,  # 消息存档由各工作进程写入；Bot转发的记录在这里发出后写入
+        })
+        self.log_prefix = f"[{DELIVERY}] "
+
+        self.job_queue = job_queue
+        self.inboxes = inboxes
+        self.status_queue = status_queue
+
+        self.scheduler = None
+        self.batcher = None
+
+        # 统计
+        self.received = 0
+        self.duplicates = 0
+        self.sent = 0
+        self.failed = 0
+        self.routed = 0
+
+    def _job_reader(self):
+        """后台线程 - 把工作进程提交的任务转到事件循环处理"""
+        while True:
+            job = self.job_queue.get()
+            self.global_loop.call_soon_threadsafe(self._dispatch, job)
+
+    def _dispatch(self, job):
+        self.received += 1
+
+        # 多个分片的账号在同一个群时，同一条消息只投递一次
+        if self.processed_messages.check_and_add((job['chat_id'], job['message_id'])):
+            self.duplicates += 1
+            return
+        fingerprint = job.get('fingerprint')
+        if fingerprint is not None and self.content_dedup.check_and_add(tuple(fingerprint)):
+            self.duplicates += 1
+            return
+
+        if job['type'] == 'direct':
+            self.inboxes[job['shard']].put(job)
+            self.routed += 1
+        elif self.batcher is not None:
+            self.batcher.add_text(job['forward_to'], job['text'], job_ref(job))
+        else:
+            asyncio.ensure_future(self._send_bot(job))
+
+    async def _send_bot(self, job):
+        forward_to = job['forward_to']
+        try:
+            await self.scheduler.send(
+                'bot', 'bot', forward_to,
+                lambda: self.bot.send_message(chat_id=forward_to, text=job['text'])
+            )
+            self.sent += 1
+        except Exception as e:
+            self.failed += 1
+            self.log_message(f"❌ 转发失败: {str(e)}")
+            return
+        self.log_message("📤 通过Bot转发成功")
+        self.mark_forwarded(job_ref(job), 'bot')
+
+    async def _heartbeat_loop(self, interval):
+        while True:
+            self.status_queue.put(('heartbeat', DELIVERY, {
+                'received': self.received,
+                'duplicates': self.duplicates,
+                'sent': self.sent,
+                'failed': self.failed,
+                'routed': self.routed,
+            }))
+            await asyncio.sleep(interval)
+
+    async def run_async(self):
+        self._stop_event = asyncio.Event()
+        self._install_signal_handlers()
+        background = [
+            asyncio.ensure_future(self._log_pump()),
+            asyncio.ensure_future(self._heartbeat_loop(self.config.get('shard_heartbeat_interval', 10))),
+        ]
+
+        try:
+            self.bot = telegram.Bot(token=self.config.get('bot_token', ''), request=self.http_client.bot_request(
+                self.config, self.network_proxy.get_proxy_config()))
+            self.scheduler = SendScheduler.from_config(self, self.config)
+            if self.config.get('digest_mode', False):
+                self.batcher = DigestBatcher(
+                    self, self.scheduler,
+                    window=self.config.get('digest_window', 2.0),
+                    max_messages=self.config.get('digest_max_messages', 20)
+                )
+            threading.Thread(target=self._job_reader, daemon=True).start()
+            self.log_message(f"📮 投递进程已启动 ({len(self.inboxes)} 个分片)")
+
+            await self._stop_event.wait()
+
+        finally:
+            if self.batcher is not None:
+                await self.batcher.flush_all()
+            for task in background:
+                task.cancel()
+            await asyncio.gather(*background, return_exceptions=True)
+            self.http_client.close()
+            self.event_logger.stop()
+            self.forward_ledger.stop()
+            self.message_archive.stop()
+            self._flush_log()
+
+
+def run_worker(shard_id, phones, config_file, job_queue, inbox, status_queue):
+    """工作进程入口"""
+    ShardWorkerApp(shard_id, phones, config_file, job_queue, inbox, status_queue).run()
+
+
+def run_delivery(config_file, job_queue, inboxes, status_queue):
+    """投递进程入口"""
+    DeliveryApp(config_file, job_queue, inboxes, status_queue).run()
+
+
+class ShardSupervisor:
+    """监督进程 - 启动投递进程和各分片工作进程，检查心跳并在异常时重启"""
+
+    def __init__(self, config_file="config.json", shard_count=None):
+        self.config_file = config_file
+        self.config = ConfigManager(config_file).load_config()
+
+        phones = self.config.get('headless_accounts') or AccountManager.find_session_phones()
+        count = shard_count or self.config.get('shard_count') or os.cpu_count() or 1
+        self.shards = assign_shards(phones, count) if phones else []
+
+        self.heartbeat_timeout = float(self.config.get('shard_heartbeat_timeout', 60))
+        self.restart_base_delay = 1.0
+        self.restart_max_delay = float(self.config.get('shard_restart_max_delay', 300))
+        self.stable_period = 600  # 稳定运行这么久后重置重启退避
+        self.status_interval = float(self.config.get('headless_stats_interval', 300))
+
+        # spawn方式启动，避免fork时复制事件循环和后台线程的状态
+        self.ctx = multiprocessing.get_context('spawn')
+        self.job_queue = self.ctx.Queue()
+        self.status_queue = self.ctx.Queue()
+        self.inboxes = [self.ctx.Queue() for _ in self.shards]
+
+        self.slots = {}
+        self.stopping = False
+
+    @staticmethod
+    def _log(message):
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        print(f"[{timestamp}] [supervisor] {message}", flush=True)
+
+    def _add_slot(self, name, target, args):
+        self.slots[name] = {
+            'target': target,
+            'args': args,
+            'process': None,
+            'started_at': 0.0,
+            'last_seen': 0.0,
+            'restarts': 0,
+            'next_start': 0.0,
+            'status': {},
+        }
+
+    def _spawn(self, name):
+        slot = self.slots[name]
+        process = self.ctx.Process(target=slot['target'], args=slot['args'], name=f"jkong-{name}")
+        process.start()
+        now = time.monotonic()
+        slot['process'] = process
+        slot['started_at'] = now
+        slot['last_seen'] = now
+        self._log(f"▶️ 已启动 {name} (pid {process.pid})")
+
+    def _check(self, name, slot, now):
+        """检查一个进程的健康状态，需要时安排重启"""
+        process = slot['process']
+        if process is None:
+            if now >= slot['next_start']:
+                self._spawn(name)
+            return
+
+        if process.is_alive():
+            if now - slot['last_seen'] <= self.heartbeat_timeout:
+                if slot['restarts'] and now - slot['started_at'] > self.stable_period:
+                    slot['restarts'] = 0
+                return
+            self._log(f"⚠️ {name} {now - slot['last_seen']:.0f} 秒无心跳，强制结束")
+            process.kill()
+
+        process.join(timeout=5)
+        delay = min(self.restart_max_delay, self.restart_base_delay * (2 ** slot['restarts']))
+        slot['restarts'] += 1
+        slot['process'] = None
+        slot['next_start'] = now + delay
+        self._log(f"🔁 {name} 已退出 (exitcode {process.exitcode})，{delay:.0f} 秒后第 {slot['restarts']} 次重启")
+
+    def _drain_status(self, timeout):
+        """接收心跳（最多等待timeout秒）"""
+        try:
+            item = self.status_queue.get(timeout=timeout)
+        except queue.Empty:
+            return
+        while True:
+            kind, name, status = item
+            slot = self.slots.get(name if name == DELIVERY else f'shard-{name}')
+            if kind == 'heartbeat' and slot is not None:
+                slot['last_seen'] = time.monotonic()
+                slot['status'] = status
+            try:
+                item = self.status_queue.get_nowait()
+            except queue.Empty:
+                return
+
+    def _log_status(self):
+        for name, slot in self.slots.items():
+            state = '运行中' if slot['process'] is not None and slot['process'].is_alive() else '已停止'
+            self._log(f"📊 {name}: {state}, 重启 {slot['restarts']} 次, {slot['status']}")
+
+    def _request_stop(self, *args):
+        self.stopping = True
+
+    def run(self):
+        if not self.shards:
+            self._log("❌ 没有可用的session文件，请先在图形界面中登录")
+            return
+
+        signal.signal(signal.SIGINT, self._request_stop)
+        signal.signal(signal.SIGTERM, self._request_stop)
+
+        self._add_slot(DELIVERY, run_delivery, (self.config_file, self.job_queue, self.inboxes, self.status_queue))
+        for shard_id, phones in enumerate(self.shards):
+            self._add_slot(f'shard-{shard_id}', run_worker, (
+                shard_id, phones, self.config_file, self.job_queue, self.inboxes[shard_id], self.status_queue))
+            self._log(f"🧩 shard-{shard_id}: {len(phones)} 个账号")
+
+        last_status = time.monotonic()
+        while not self.stopping:
+            self._drain_status(timeout=1.0)
+            now = time.monotonic()
+            for name, slot in self.slots.items():
+                self._check(name, slot, now)
+            if self.status_interval and now - last_status >= self.status_interval:
+                self._log_status()
+                last_status = now
+
+        self._shutdown()
+
+    def _shutdown(self):
+        """先停工作进程，再停投递进程，让已提交的任务发送完"""
+        self._log("正在停止所有进程...")
+        names = [name for name in self.slots if name != DELIVERY] + [DELIVERY]
+        for group in (names[:-1], names[-1:]):
+            processes = [self.slots[name]['process'] for name in group if self.slots[name]['process'] is not None]
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+            for process in processes:
+                process.join(timeout=15)
+                if process.is_alive():
+                    process.kill()
+        self._log("所有进程已停止")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Telegram消息监控转发程序 - 多进程分片模式")
+    parser.add_argument('--shards', type=int, default=0, help="工作进程数量（默认按配置或CPU核数）")
+    parser.add_argument('--config', default='config.json', help="配置文件路径")
+    args = parser.parse_args()
+
+    ShardSupervisor(args.config, args.shards).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+from types import SimpleNamespace
+
+import dedup_store
+from dedup_store import DedupStore, content_fingerprint
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+def make_store(monkeypatch, **kwargs):
+    clock = FakeClock()
+    monkeypatch.setattr(dedup_store, 'time', clock)
+    return DedupStore(**kwargs), clock
+
+
+def test_check_and_add_reports_duplicates(monkeypatch):
+    store, _ = make_store(monkeypatch)
+    assert store.check_and_add((1, 2)) is False
+    assert store.check_and_add((1, 2)) is True
+    assert store.check_and_add((1, 3)) is False
+    assert (store.hits, store.misses) == (1, 2)
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    store, clock = make_store(monkeypatch, ttl=10)
+    store.check_and_add((1, 1))
+    clock.now += 9
+    assert (1, 1) in store
+    clock.now += 1
+    assert (1, 1) not in store
+    assert store.expired == 1
+    assert store.check_and_add((1, 1)) is False
+
+
+def test_lookup_does_not_extend_ttl(monkeypatch):
+    store, clock = make_store(monkeypatch, ttl=10)
+    store.check_and_add((1, 1))
+    clock.now += 5
+    assert store.check_and_add((1, 1)) is True
+    clock.now += 5
+    assert store.check_and_add((1, 1)) is False
+
+
+def test_expired_entries_are_purged_on_insert(monkeypatch):
+    store, clock = make_store(monkeypatch, ttl=10)
+    store.check_and_add((1, 1))
+    store.check_and_add((1, 2))
+    clock.now += 11
+    store.check_and_add((1, 3))
+    assert len(store) == 1
+    assert store.expired == 2
+
+
+def test_capacity_evicts_least_recently_used(monkeypatch):
+    store, _ = make_store(monkeypatch, max_entries=2)
+    store.check_and_add((1, 1))
+    store.check_and_add((1, 2))
+    # 命中后移到队尾，下一次淘汰的是(1, 2)
+    assert store.check_and_add((1, 1)) is True
+    store.check_and_add((1, 3))
+    assert len(store) == 2
+    assert (1, 1) in store
+    assert (1, 2) not in store
+    assert store.evicted == 1
+
+
+def test_add_discard_and_clear(monkeypatch):
+    store, _ = make_store(monkeypatch)
+    store.add((5, 5))
+    assert store.check_and_add((5, 5)) is True
+    store.discard((5, 5))
+    assert (5, 5) not in store
+    store.clear()
+    assert len(store) == 0
+    assert store.get_stats()['hits'] == 0
+
+
+def message(text='', photo=None):
+    return SimpleNamespace(text=text, message=text, photo=photo, document=None)
+
+
+def test_content_fingerprint_normalizes_text():
+    assert content_fingerprint(message('Hello   World\n')) == content_fingerprint(message('hello world'))
+    assert content_fingerprint(message('hello')) != content_fingerprint(message('world'))
+
+
+def test_content_fingerprint_uses_media_id():
+    photo_a = SimpleNamespace(id=1)
+    photo_b = SimpleNamespace(id=2)
+    assert content_fingerprint(message(photo=photo_a)) != content_fingerprint(message(photo=photo_b))
+    assert content_fingerprint(message()) is None
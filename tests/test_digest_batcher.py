@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from digest_batcher import pack_digest, pack_digest_indexed
+
+
+def test_short_entries_are_merged():
+    assert pack_digest(['a', 'b', 'c'], limit=100, separator='|') == ['a|b|c']
+
+
+def test_chunks_respect_limit():
+    chunks = pack_digest(['aaaa', 'bbbb', 'cccc'], limit=9, separator='|')
+    assert chunks == ['aaaa|bbbb', 'cccc']
+    assert all(len(chunk) <= 9 for chunk in chunks)
+
+
+def test_oversized_entry_is_split():
+    chunks = pack_digest(['x' * 10], limit=4, separator='|')
+    assert chunks == ['xxxx', 'xxxx', 'xx']
+
+
+def test_indexes_track_entries_per_chunk():
+    packed = pack_digest_indexed(['aaaa', 'b' * 6, 'c'], limit=5, separator='|')
+    assert [chunk for chunk, _ in packed] == ['aaaa', 'bbbbb', 'b|c']
+    assert [indexes for _, indexes in packed] == [{0}, {1}, {1, 2}]
+
+
+def test_empty_input():
+    assert pack_digest([]) == []
+    assert pack_digest(['']) == []
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+import sqlite3
+import time
+
+from forward_ledger import ForwardLedger
+
+
+def test_records_survive_restart(tmp_path):
+    path = str(tmp_path / 'forwarded.db')
+    ledger = ForwardLedger(path=path)
+    ledger.start()
+    ledger.record(-100, 1, 'bot')
+    ledger.record(-100, 2, 'user')
+    assert ledger.contains(-100, 1)
+    ledger.stop()
+    assert ledger.written == 2
+
+    restarted = ForwardLedger(path=path)
+    restarted.start()
+    try:
+        assert restarted.loaded == 2
+        assert restarted.contains(-100, 2)
+        assert not restarted.contains(-100, 3)
+        assert restarted.hits == 1
+    finally:
+        restarted.stop()
+
+
+def test_expired_records_are_not_loaded(tmp_path):
+    path = str(tmp_path / 'forwarded.db')
+    ledger = ForwardLedger(path=path, retention=3600)
+    ledger.start()
+    ledger.stop()
+
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute('INSERT INTO forwarded VALUES (?, ?, ?, ?)', (-100, 1, time.time() - 7200, 'bot'))
+        conn.execute('INSERT INTO forwarded VALUES (?, ?, ?, ?)', (-100, 2, time.time(), 'bot'))
+    conn.close()
+
+    ledger = ForwardLedger(path=path, retention=3600)
+    ledger.start()
+    try:
+        assert not ledger.contains(-100, 1)
+        assert ledger.contains(-100, 2)
+    finally:
+        ledger.stop()
+
+
+def test_prune_removes_old_records(tmp_path):
+    ledger = ForwardLedger(path=str(tmp_path / 'forwarded.db'), retention=3600)
+    ledger.record(-100, 1, 'bot')
+    ledger.record(-100, 2, 'bot')
+    ledger._index[(-100, 1)] = time.time() - 7200
+
+    conn = ledger._connect()
+    try:
+        with conn:
+            conn.execute('INSERT INTO forwarded VALUES (?, ?, ?, ?)', (-100, 1, time.time() - 7200, 'bot'))
+        ledger._prune(conn)
+    finally:
+        conn.close()
+
+    assert ledger.pruned == 1
+    assert not ledger.contains(-100, 1)
+    assert ledger.contains(-100, 2)
+
+
+def test_record_before_start_is_kept_in_memory(tmp_path):
+    ledger = ForwardLedger(path=str(tmp_path / 'forwarded.db'))
+    ledger.record(-100, 5, 'bot')
+    ledger.start()
+    try:
+        assert ledger.contains(-100, 5)
+    finally:
+        ledger.stop()
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+from keyword_matcher import KeywordMatcher, parse_keywords
+
+
+def test_parse_keywords_strips_and_skips_empty():
+    assert parse_keywords(' 招聘, ,Python ,') == ['招聘', 'Python']
+    assert parse_keywords('') == []
+    assert parse_keywords(None) == []
+
+
+def test_search_is_case_insensitive():
+    matcher = KeywordMatcher(['Python', '招聘'])
+    assert matcher.search('we use PYTHON here') == 'Python'
+    assert matcher.search('上海招聘前端') == '招聘'
+    assert matcher.search('nothing relevant') is None
+
+
+def test_search_returns_first_hit_in_text():
+    matcher = KeywordMatcher(['world', 'hello'])
+    assert matcher.search('hello world') == 'hello'
+
+
+def test_find_all_keeps_keyword_order():
+    matcher = KeywordMatcher(['c', 'ab', 'b'])
+    assert matcher.find_all('xabcx') == ['c', 'ab', 'b']
+
+
+def test_overlapping_and_suffix_keywords():
+    matcher = KeywordMatcher(['he', 'she', 'his', 'hers'])
+    assert matcher.find_all('ushers') == ['he', 'she', 'hers']
+
+
+def test_failure_links_across_partial_matches():
+    matcher = KeywordMatcher(['abcd', 'bce'])
+    assert matcher.find_all('abce') == ['bce']
+
+
+def test_duplicates_and_empty_keywords_are_dropped():
+    matcher = KeywordMatcher(['a', '', 'a', 'b'])
+    assert matcher.keywords == ('a', 'b')
+    assert len(matcher) == 2
+
+
+def test_empty_matcher_and_text():
+    assert not KeywordMatcher([])
+    assert KeywordMatcher([]).search('anything') is None
+    assert KeywordMatcher(['a']).find_all('') == []
+
+
+def test_from_text():
+    matcher = KeywordMatcher.from_text('买, 卖')
+    assert matcher.find_all('买卖') == ['买', '卖']
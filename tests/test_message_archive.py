@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from message_archive import MessageArchive, build_match, index_terms
+
+
+def test_index_terms_splits_cjk_into_bigrams():
+    assert index_terms('招聘Python工程师') == '招聘 python 工程 程师'
+    assert index_terms('日 Japan') == '日 japan'
+
+
+def test_build_match():
+    assert build_match('工程师 python') == ('"工程 程师" AND "python"', [])
+    assert build_match('日 japan') == ('"japan"', ['日'])
+    assert build_match('!!') == (None, [])
+
+
+def message(message_id, text, chat_id=-100):
+    return SimpleNamespace(chat_id=chat_id, id=message_id, text=text, message=text,
+                           sender_id=1, date=datetime.now(timezone.utc))
+
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = MessageArchive(path=str(tmp_path / 'archive.db'))
+    archive.start()
+    chat = SimpleNamespace(title='测试群')
+    for message_id, text in enumerate(['上海招聘Python工程师', '日本 Japan 旅游', '北京招聘前端', '工程师周末聚会'], 1):
+        archive.add(message(message_id, text), chat)
+    archive.add(message(9, 'other chat 招聘', chat_id=-200), SimpleNamespace(title='别的群'))
+    archive.stop()
+    yield archive
+    archive.stop()
+
+
+def ids(results):
+    return [item['message_id'] for item in results]
+
+
+def test_cjk_phrase_search(archive):
+    assert ids(archive.search('工程师')) == [4, 1]
+    assert ids(archive.search('招聘 python')) == [1]
+
+
+def test_cjk_phrase_must_be_contiguous(archive):
+    assert ids(archive.search('上海工程师')) == []
+
+
+def test_single_cjk_character_falls_back_to_like(archive):
+    assert ids(archive.search('日 japan')) == [2]
+    assert ids(archive.search('京')) == [3]
+
+
+def test_chat_filter_and_limit(archive):
+    assert ids(archive.search('招聘')) == [9, 3, 1]
+    assert ids(archive.search('招聘', chat='-200')) == [9]
+    assert ids(archive.search('招聘', chat='测试')) == [3, 1]
+    assert ids(archive.search('招聘', limit=1)) == [9]
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from proxy_pool import ProxyEndpoint
+
+
+def test_parse_socks5_and_http():
+    endpoint = ProxyEndpoint.parse('socks5://127.0.0.1:7891')
+    assert endpoint.as_config() == {'proxy_type': 'socks5', 'addr': '127.0.0.1', 'port': 7891}
+    endpoint = ProxyEndpoint.parse(' HTTP://proxy.local:7890/ ')
+    assert endpoint.as_config() == {'proxy_type': 'http', 'addr': 'proxy.local', 'port': 7890}
+
+
+def test_str_round_trip():
+    assert str(ProxyEndpoint.parse('http://10.0.0.1:3128')) == 'http://10.0.0.1:3128'
+
+
+@pytest.mark.parametrize('spec', ['127.0.0.1:7890', 'https://127.0.0.1:7890', 'socks4://127.0.0.1:1080'])
+def test_unsupported_specs_are_rejected(spec):
+    with pytest.raises(ValueError):
+        ProxyEndpoint.parse(spec)
+
+
+def test_missing_port_is_rejected():
+    with pytest.raises(ValueError):
+        ProxyEndpoint.parse('socks5://127.0.0.1')
+
+
+def test_score_penalizes_errors():
+    fast_but_flaky = ProxyEndpoint('http', 'a', 1)
+    fast_but_flaky.latency = 0.1
+    fast_but_flaky.error_rate = 0.5
+    steady = ProxyEndpoint('http', 'b', 2)
+    steady.latency = 0.2
+    assert steady.score() < fast_but_flaky.score()
+    assert not fast_but_flaky.healthy
+    assert steady.healthy
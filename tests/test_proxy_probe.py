@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from proxy_probe import parse_port_range, parse_target
+
+
+def test_single_ports_and_ranges():
+    assert parse_port_range('7890-7893,8080,1080') == [7890, 7891, 7892, 7893, 8080, 1080]
+
+
+def test_reversed_range_and_fullwidth_comma():
+    assert parse_port_range('7892-7890，1080') == [7890, 7891, 7892, 1080]
+
+
+def test_duplicates_and_blanks_are_skipped():
+    assert parse_port_range(' 8080, ,8080-8081, ') == [8080, 8081]
+
+
+def test_integer_input():
+    assert parse_port_range(1080) == [1080]
+
+
+@pytest.mark.parametrize('text', ['0', '65536', '70000-70001'])
+def test_out_of_range_ports_are_rejected(text):
+    with pytest.raises(ValueError):
+        parse_port_range(text)
+
+
+def test_garbage_is_rejected():
+    with pytest.raises(ValueError):
+        parse_port_range('abc')
+
+
+def test_parse_target():
+    assert parse_target('api.telegram.org:443') == ('api.telegram.org', 443)
+    assert parse_target('[::1]:8080') == ('[::1]', 8080)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+白名单索引模块 - 把白名单编译成哈希索引和标题自动机
+同一个群组的重复消息只需一次字典查询即可得到结果
+"""
+
+from keyword_matcher import KeywordMatcher
+
+
+class WhitelistIndex:
+    """白名单索引 - 按ID、用户名、标题片段三种方式匹配"""
+
+    # 单个索引最多缓存的群组数量，超过后整体清空
+    MAX_CACHED_CHATS = 20000
+
+    def __init__(self, items):
+        self.items = tuple(items)
+
+        self.ids = {}           # 数字ID -> 白名单条目
+        self.usernames = set()  # 小写用户名（不含@）
+        for item in self.items:
+            if item.startswith('@') and len(item) > 1:
+                self.usernames.add(item[1:].lower())
+            elif item.startswith('-') or item.isdigit():
+                try:
+                    self.ids[int(item)] = item
+                except ValueError:
+                    pass
+
+        # 所有条目都参与标题包含匹配（与逐条比较时的行为一致）
+        self.title_matcher = KeywordMatcher(self.items)
+
+        # chat_id -> (标题, 用户名, 结果)；标题或用户名变化时重新计算
+        self._verdicts = {}
+
+    def __bool__(self):
+        return bool(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def contains(self, chat_title, chat_username, chat_id):
+        """检查群组是否在白名单中"""
+        if not self.items:
+            return False
+
+        cached = self._verdicts.get(chat_id)
+        if cached is not None and cached[0] == chat_title and cached[1] == chat_username:
+            return cached[2]
+
+        verdict = self._match(chat_title, chat_username, chat_id)
+
+        if len(self._verdicts) >= self.MAX_CACHED_CHATS:
+            self._verdicts.clear()
+        self._verdicts[chat_id] = (chat_title, chat_username, verdict)
+        return verdict
+
+    def invalidate(self, chat_id=None):
+        """清除缓存的判断结果"""
+        if chat_id is None:
+            self._verdicts.clear()
+        else:
+            self._verdicts.pop(chat_id, None)
+
+    def _match(self, chat_title, chat_username, chat_id):
+        """不使用缓存的实际匹配"""
+        # 检查ID匹配
+        if chat_id in self.ids:
+            return True
+
+        # 检查用户名匹配
+        if chat_username and chat_username.lower() in self.usernames:
+            return True
+
+        # 检查标题包含匹配
+        if chat_title and self.title_matcher.search(chat_title) is not None:
+            return True
+
+        return False